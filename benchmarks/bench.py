@@ -0,0 +1,345 @@
+"""
+Benchmark suite for the simulator's hot paths.
+
+    python -m benchmarks.bench                          # default scales, JSON to stdout
+    python -m benchmarks.bench --scales 1000,100000 --out results.json
+    python -m benchmarks.bench --out new.json --compare baseline.json --threshold 0.25
+
+Each benchmark reports the best of --repeat runs as microseconds per operation.
+With --compare, any benchmark slower than the baseline by more than the
+threshold is flagged and the exit status is 1.
+"""
+import argparse
+import io
+import json
+import platform
+import sys
+import time
+from src.block import mine_block, disconnect_block
+from src.history import AddressHistory
+from src.mempool import Mempool
+from src.transaction import Transaction
+from src.utxo_manager import UTXOManager
+from src.sqlite_utxo import SQLiteUTXOManager
+from src.validate import Validator
+from src.wire import encode_transaction, dump_transactions, iter_transactions
+from benchmarks.workload import Workload
+
+DEFAULT_SCALES = (1_000, 10_000, 100_000)
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    ops = fn()
+    return time.perf_counter() - start, ops
+
+
+def bench_get_balance(workload, txs):
+    utxo_manager = workload.populate(UTXOManager())
+    owners = workload.owners
+
+    def run():
+        for owner in owners:
+            utxo_manager.get_balance(owner)
+        return len(owners)
+    return _timed(run)
+
+
+def bench_validate(workload, txs):
+    utxo_manager = workload.populate(UTXOManager())
+    mempool = Mempool()
+
+    def run():
+        for tx in txs:
+            Validator.validate_transaction(tx, utxo_manager, mempool)
+        return len(txs)
+    return _timed(run)
+
+
+def bench_add_transaction(workload, txs):
+    utxo_manager = workload.populate(UTXOManager())
+    mempool = Mempool(max_size=len(txs) + 1)
+
+    def run():
+        for tx in txs:
+            mempool.add_transaction(tx, utxo_manager)
+        return len(txs)
+    return _timed(run)
+
+
+def bench_get_top_transactions(workload, txs, n=100, calls=200):
+    utxo_manager = workload.populate(UTXOManager())
+    mempool = Mempool(max_size=len(txs) + 1)
+    for tx in txs:
+        mempool.add_transaction(tx, utxo_manager)
+
+    def run():
+        for _ in range(calls):
+            mempool.get_top_transactions(n, utxo_manager)
+        return calls
+    return _timed(run)
+
+
+def bench_eviction(workload, txs):
+    utxo_manager = workload.populate(UTXOManager())
+    mempool = Mempool(max_size=len(txs) + 1)
+    for tx in txs:
+        mempool.add_transaction(tx, utxo_manager)
+
+    def run():
+        # Drain the pool lowest fee rate first, one eviction at a time
+        evictions = len(mempool)
+        for _ in range(evictions):
+            mempool._evict_lowest_fee_rate()
+        return evictions
+    return _timed(run)
+
+
+def bench_expire(workload, txs):
+    utxo_manager = workload.populate(UTXOManager())
+    # A frozen clock: everything is admitted at t=0 and expires at once
+    mempool = Mempool(max_size=len(txs) + 1, expiry=60, clock=lambda: 0.0)
+    for tx in txs:
+        mempool.add_transaction(tx, utxo_manager)
+
+    def run():
+        return len(mempool.expire(at=61.0))
+    return _timed(run)
+
+
+def bench_mine_block(workload, txs, block_txs=500):
+    utxo_manager = workload.populate(UTXOManager())
+    mempool = Mempool(max_size=len(txs) + 1)
+    for tx in txs:
+        mempool.add_transaction(tx, utxo_manager)
+
+    def run():
+        blocks = 0
+        while mine_block("bench_miner", mempool, utxo_manager, num_txs=block_txs, verbose=False):
+            blocks += 1
+        return blocks
+    return _timed(run)
+
+
+def bench_mine_block_sqlite(workload, txs, block_txs=500):
+    # An in-memory database with a cache of a tenth of the set, so most
+    # lookups miss and every block ends in one batched write
+    utxo_manager = SQLiteUTXOManager(cache_size=max(1, workload.num_utxos // 10))
+    with utxo_manager.batch():
+        workload.populate(utxo_manager)
+    mempool = Mempool(max_size=len(txs) + 1)
+    for tx in txs:
+        mempool.add_transaction(tx, utxo_manager)
+
+    def run():
+        blocks = 0
+        while mine_block("bench_miner", mempool, utxo_manager, num_txs=block_txs, verbose=False):
+            blocks += 1
+        return blocks
+    return _timed(run)
+
+
+def bench_mine_template(workload, txs):
+    utxo_manager = workload.populate(UTXOManager())
+    mempool = Mempool(max_size=len(txs) + 1)
+    for tx in txs:
+        mempool.add_transaction(tx, utxo_manager)
+    mempool.template.refresh()
+
+    def run():
+        # Full-weight blocks from the incrementally maintained template
+        blocks = 0
+        while mine_block("bench_miner", mempool, utxo_manager, verbose=False):
+            blocks += 1
+        return blocks
+    return _timed(run)
+
+
+def bench_disconnect_block(workload, txs, block_txs=500):
+    utxo_manager = workload.populate(UTXOManager())
+    mempool = Mempool(max_size=len(txs) + 1)
+    for tx in txs:
+        mempool.add_transaction(tx, utxo_manager)
+    chain = []
+    while True:
+        block = mine_block("bench_miner", mempool, utxo_manager, num_txs=block_txs,
+                           verbose=False, prev_block=chain[-1] if chain else None)
+        if block is None:
+            break
+        chain.append(block)
+
+    def run():
+        # Reorg the whole chain away, tip first
+        for block in reversed(chain):
+            disconnect_block(block, mempool, utxo_manager, verbose=False)
+        return len(chain)
+    return _timed(run)
+
+
+def bench_history_index(workload, txs, block_txs=500):
+    utxo_manager = workload.populate(UTXOManager())
+    mempool = Mempool(max_size=len(txs) + 1)
+    for tx in txs:
+        mempool.add_transaction(tx, utxo_manager)
+    chain = []
+    while True:
+        block = mine_block("bench_miner", mempool, utxo_manager, num_txs=block_txs,
+                           verbose=False, prev_block=chain[-1] if chain else None)
+        if block is None:
+            break
+        chain.append(block)
+
+    def run():
+        # Index the chain, then read the first page of every sender's history
+        history = AddressHistory.rebuild(chain)
+        for tx in txs:
+            history.get_history(tx.sender, limit=20)
+        return len(txs)
+    return _timed(run)
+
+
+def _json_record(tx):
+    return {"sender": tx.sender, "recipient": tx.recipient, "nonce": tx.nonce,
+            "inputs": tx.inputs, "outputs": tx.outputs}
+
+
+def bench_json_encode(workload, txs):
+    def run():
+        for tx in txs:
+            json.dumps(_json_record(tx)).encode()
+        return len(txs)
+    return _timed(run)
+
+
+def bench_json_decode(workload, txs):
+    # JSON lines, as --stream reads them
+    data = b"".join(json.dumps(_json_record(tx)).encode() + b"\n" for tx in txs)
+
+    def run():
+        for line in io.BytesIO(data):
+            Transaction(**json.loads(line))
+        return len(txs)
+    return _timed(run)
+
+
+def bench_wire_encode(workload, txs):
+    def run():
+        for tx in txs:
+            encode_transaction(tx)
+        return len(txs)
+    return _timed(run)
+
+
+def bench_wire_decode(workload, txs):
+    f = io.BytesIO()
+    dump_transactions(txs, f)
+    data = f.getvalue()
+
+    def run():
+        return sum(1 for _ in iter_transactions(io.BytesIO(data)))
+    return _timed(run)
+
+
+BENCHMARKS = {
+    "get_balance": bench_get_balance,
+    "validate_transaction": bench_validate,
+    "add_transaction": bench_add_transaction,
+    "get_top_transactions": bench_get_top_transactions,
+    "evict_lowest_fee_rate": bench_eviction,
+    "expire": bench_expire,
+    "mine_block": bench_mine_block,
+    "mine_block_sqlite": bench_mine_block_sqlite,
+    "mine_template": bench_mine_template,
+    "disconnect_block": bench_disconnect_block,
+    "history_index": bench_history_index,
+    "json_encode": bench_json_encode,
+    "json_decode": bench_json_decode,
+    "wire_encode": bench_wire_encode,
+    "wire_decode": bench_wire_decode,
+}
+
+
+def run_suite(scales, seed=42, repeat=3, names=None, log=sys.stderr):
+    results = {}
+    for scale in scales:
+        # M UTXOs spread over M/10 owners; spend roughly half of them
+        workload = Workload(num_owners=max(1, scale // 10), num_utxos=scale, seed=seed)
+        txs = workload.transactions(scale // 3)
+        for name, bench in BENCHMARKS.items():
+            if names and name not in names:
+                continue
+            best = None
+            for _ in range(repeat):
+                seconds, ops = bench(workload, txs)
+                if ops and (best is None or seconds / ops < best["seconds"] / best["ops"]):
+                    best = {"seconds": seconds, "ops": ops}
+            if best is None:
+                continue
+            best["us_per_op"] = best["seconds"] / best["ops"] * 1e6
+            best["ops_per_sec"] = best["ops"] / best["seconds"] if best["seconds"] else 0.0
+            results[f"{name}@{scale}"] = best
+            print(f"{name:<22} {scale:>9,} UTXOs  {best['us_per_op']:>12.2f} us/op", file=log)
+    return results
+
+
+def compare(current, baseline, threshold):
+    """Returns (key, baseline_us, current_us, ratio) for every regression."""
+    regressions = []
+    for key, result in current.items():
+        base = baseline.get(key)
+        if base is None or not base["us_per_op"]:
+            continue
+        ratio = result["us_per_op"] / base["us_per_op"]
+        if ratio > 1 + threshold:
+            regressions.append((key, base["us_per_op"], result["us_per_op"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="UTXO simulator benchmarks")
+    parser.add_argument("--scales", default=",".join(str(s) for s in DEFAULT_SCALES),
+                        help="Comma-separated UTXO set sizes")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; the best is kept")
+    parser.add_argument("--only", default="", help="Comma-separated benchmark names to run")
+    parser.add_argument("--out", metavar="PATH", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="Flag regressions against a saved results file")
+    parser.add_argument("--threshold", type=float, default=0.20,
+                        help="Allowed slowdown before a benchmark counts as a regression (0.20 = 20%%)")
+    args = parser.parse_args(argv)
+
+    scales = [int(s) for s in args.scales.split(",") if s]
+    names = {n for n in args.only.split(",") if n}
+    results = run_suite(scales, seed=args.seed, repeat=args.repeat, names=names)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "scales": scales,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for key, base_us, cur_us, ratio in regressions:
+            print(f"REGRESSION {key}: {base_us:.2f} -> {cur_us:.2f} us/op ({ratio:.2f}x)", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Load generator for the node service.
+
+    python -m src.main --serve 9333 &                 # a node with genesis state
+    python -m benchmarks.loadgen --port 9333 --clients 32 --txs 5000
+
+Without --port an in-process node is started on a free port (client and server
+then share one event loop, so the numbers are pessimistic). The generator seeds
+the node with the synthetic workload's genesis UTXOs, then --clients
+connections submit its transactions concurrently, each keeping up to
+--pipeline requests in flight. It prints throughput, client-side latency
+percentiles and the node's own metrics as JSON.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from src.amount import format_btc
+from src.mempool import Mempool
+from src.node import Node
+from src.utxo_manager import UTXOManager
+from benchmarks.workload import Workload
+
+
+def _tx_record(tx):
+    return {
+        "op": "tx",
+        "sender": tx.sender,
+        "recipient": tx.recipient,
+        "inputs": tx.inputs,
+        "outputs": [{"amount": format_btc(out["amount"]), "address": out["address"]}
+                    for out in tx.outputs],
+    }
+
+
+async def run_client(host, port, records, pipeline, latencies):
+    """Sends (id, record) pairs over one connection; returns the responses."""
+    reader, writer = await asyncio.open_connection(host, port)
+    slots = asyncio.Semaphore(pipeline)
+    sent_at = {}
+
+    async def send():
+        for request_id, record in records:
+            await slots.acquire()
+            sent_at[request_id] = time.perf_counter()
+            writer.write(json.dumps({"id": request_id, **record}).encode() + b"\n")
+            await writer.drain()
+
+    sender = asyncio.create_task(send())
+    responses = []
+    for _ in range(len(records)):
+        response = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - sent_at.pop(response["id"]))
+        responses.append(response)
+        slots.release()
+    await sender
+    writer.close()
+    await writer.wait_closed()
+    return responses
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+async def run_load(host, port, workload, num_txs, clients, pipeline):
+    seed_records = [(i, {"op": "utxo", "tx_id": tx_id, "index": index,
+                         "amount": format_btc(amount), "owner": owner})
+                    for i, (tx_id, index, amount, owner) in enumerate(workload.genesis())]
+    await run_client(host, port, seed_records, pipeline, [])
+
+    txs = workload.transactions(num_txs)
+    records = [(i, _tx_record(tx)) for i, tx in enumerate(txs)]
+    shards = [records[i::clients] for i in range(clients)]
+    latencies = []
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_client(host, port, shard, pipeline, latencies)
+                                     for shard in shards if shard))
+    elapsed = time.perf_counter() - start
+
+    accepted = sum(1 for responses in results for r in responses if r["ok"])
+    metrics = (await run_client(host, port, [(0, {"op": "metrics"})], 1, []))[0]
+    latencies.sort()
+    return {
+        "clients": clients,
+        "pipeline": pipeline,
+        "transactions": len(records),
+        "accepted": accepted,
+        "seconds": elapsed,
+        "tx_per_sec": len(records) / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "p50": _percentile(latencies, 0.50) * 1e3,
+            "p90": _percentile(latencies, 0.90) * 1e3,
+            "p99": _percentile(latencies, 0.99) * 1e3,
+            "max": latencies[-1] * 1e3 if latencies else 0.0,
+        },
+        "node": metrics,
+    }
+
+
+async def main_async(args):
+    workload = Workload(num_owners=max(1, args.utxos // 10), num_utxos=args.utxos, seed=args.seed)
+    node = None
+    host, port = args.host, args.port
+    if port is None:
+        node = Node(UTXOManager(), Mempool())
+        host, port = await node.start(host, 0)
+    try:
+        return await run_load(host, port, workload, args.txs, args.clients, args.pipeline)
+    finally:
+        if node is not None:
+            await node.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load generator for the node service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="Node to load (default: start one in-process)")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent connections")
+    parser.add_argument("--pipeline", type=int, default=8, help="Requests in flight per connection")
+    parser.add_argument("--txs", type=int, default=5_000, help="Transactions to submit")
+    parser.add_argument("--utxos", type=int, default=20_000, help="Genesis UTXOs to seed")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(main_async(args))
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import random
+from src.amount import COIN
+from src.transaction import Transaction
+
+class Workload:
+    """
+    Seeded synthetic workload: `num_owners` owners holding `num_utxos`
+    genesis UTXOs, plus transactions that spend them with random fan-in and
+    fan-out. The same seed always yields the same state and transactions.
+    """
+
+    def __init__(self, num_owners, num_utxos, seed=42, mean_inputs=1.5, mean_outputs=2.0,
+                 max_inputs=8, max_outputs=8):
+        self.num_owners = num_owners
+        self.num_utxos = num_utxos
+        self.seed = seed
+        self.mean_inputs = mean_inputs
+        self.mean_outputs = mean_outputs
+        self.max_inputs = max_inputs
+        self.max_outputs = max_outputs
+        self.owners = [f"owner{i}" for i in range(num_owners)]
+
+    def genesis(self):
+        """Yields (tx_id, index, amount, owner) for every genesis UTXO."""
+        rng = random.Random(self.seed)
+        for i in range(self.num_utxos):
+            yield "genesis", i, rng.randint(COIN // 100, 10 * COIN), rng.choice(self.owners)
+
+    def populate(self, utxo_manager):
+        for tx_id, index, amount, owner in self.genesis():
+            utxo_manager.add_utxo(tx_id, index, amount, owner)
+        return utxo_manager
+
+    def _count(self, rng, mean, limit):
+        # Geometric distribution with the requested mean, clipped to [1, limit]
+        p = 1.0 / mean
+        n = 1
+        while n < limit and rng.random() > p:
+            n += 1
+        return n
+
+    def transactions(self, count, seed_offset=1):
+        """
+        Builds up to `count` valid transactions. Each spends genesis UTXOs of a
+        single owner (so the simulated signature check passes), and no UTXO is
+        spent twice. Fees are a random 0-1% of the inputs.
+        """
+        rng = random.Random(self.seed + seed_offset)
+        by_owner = {}
+        for tx_id, index, amount, owner in self.genesis():
+            by_owner.setdefault(owner, []).append((tx_id, index, amount))
+        for utxos in by_owner.values():
+            rng.shuffle(utxos)
+        owners = [o for o in self.owners if o in by_owner]
+
+        txs = []
+        while len(txs) < count and owners:
+            pos = rng.randrange(len(owners))
+            owner = owners[pos]
+            pool = by_owner[owner]
+            n_in = min(self._count(rng, self.mean_inputs, self.max_inputs), len(pool))
+            spent = [pool.pop() for _ in range(n_in)]
+            if not pool:
+                owners[pos] = owners[-1]
+                owners.pop()
+
+            total_in = sum(amount for _, _, amount in spent)
+            fee = rng.randint(0, total_in // 100)
+            n_out = self._count(rng, self.mean_outputs, self.max_outputs)
+            share, remainder = divmod(total_in - fee, n_out)
+            outputs = [{"amount": share, "address": rng.choice(self.owners)} for _ in range(n_out)]
+            outputs[0]["amount"] += remainder
+
+            tx = Transaction(
+                sender=owner,
+                recipient=outputs[0]["address"],
+                inputs=[{"prev_tx": t, "index": i, "owner": owner} for t, i, _ in spent],
+                outputs=outputs
+            )
+            txs.append(tx)
+        return txs
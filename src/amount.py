@@ -0,0 +1,48 @@
+from decimal import Context, Decimal, Inexact, InvalidOperation, Overflow
+from src.stats import STATS
+
+COIN = 100_000_000             # Satoshis per BTC
+MAX_MONEY = 21_000_000 * COIN  # No amount, or sum of amounts, may exceed total supply
+
+# Amounts written with an exponent outside +-_MAX_EXPONENT are rejected before
+# any arithmetic; the conversion itself traps anything it cannot do exactly,
+# instead of the default context's Overflow or silent underflow to 0.
+_MAX_EXPONENT = 32
+_CONTEXT = Context(prec=64, traps=[InvalidOperation, Overflow, Inexact])
+
+def to_satoshis(value) -> int:
+    """
+    Convert a BTC amount (str, Decimal, int or float) to integer satoshis.
+    This is the only place amounts are parsed; everything past it is int math.
+    Raises ValueError for non-numeric input, sub-satoshi precision or an
+    absurd exponent.
+    """
+    if STATS.enabled:
+        STATS.incr("amount.decimal_conversions")
+    try:
+        btc = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {value!r}")
+    if btc.is_finite() and not -_MAX_EXPONENT <= btc.as_tuple().exponent <= _MAX_EXPONENT:
+        raise ValueError(f"Amount {value} is out of range.")
+    try:
+        sats = _CONTEXT.multiply(btc, COIN)
+    except (InvalidOperation, Overflow, Inexact):
+        raise ValueError(f"Amount {value} cannot be converted to satoshis exactly.")
+
+    if not sats.is_finite() or sats != sats.to_integral_value():
+        raise ValueError(f"Amount {value} is not a whole number of satoshis.")
+    return int(sats)
+
+def format_btc(sats: int) -> str:
+    """
+    Format integer satoshis as BTC, e.g. 3999900000 -> '39.999', 0 -> '0.0'.
+    """
+    sign = "-" if sats < 0 else ""
+    whole, frac = divmod(abs(sats), COIN)
+    frac_str = f"{frac:08d}".rstrip("0") or "0"
+    return f"{sign}{whole}.{frac_str}"
+
+def is_valid_amount(sats) -> bool:
+    """True for an int in [0, MAX_MONEY]; bools and floats are rejected."""
+    return type(sats) is int and 0 <= sats <= MAX_MONEY
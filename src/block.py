@@ -1,63 +1,238 @@
-import time
-from decimal import Decimal 
-from src.transaction import Transaction
+import hashlib
+import random
+from contextlib import nullcontext
+from src.amount import format_btc
+from src.stats import STATS, now
+from src.transaction import Transaction, WITNESS_SCALE_FACTOR
+from src.template import BLOCK_HEADER_BYTES
+from src.validate import Validator
 
-def mine_block(miner_address, mempool, utxo_manager, num_txs=3):
+GENESIS_HASH = "00" * 32
+
+class Block:
+    """
+    A mined block: the coinbase followed by the mined transactions, plus the
+    undo data needed to disconnect it again. undo[i] lists the outputs spent by
+    transactions[i + 1] as (tx_id, index, amount, owner) tuples.
+    utxo_commitment is the UTXO set commitment (see src/commitment.py) after
+    the block, so two nodes agree on the state exactly when it matches.
+    """
+
+    def __init__(self, height, prev_hash, transactions, undo, fees, utxo_commitment=None):
+        self.height = height
+        self.prev_hash = prev_hash
+        self.transactions = transactions
+        self.undo = undo
+        self.fees = fees
+        self.utxo_commitment = utxo_commitment
+        self.weight = WITNESS_SCALE_FACTOR * BLOCK_HEADER_BYTES + sum(tx.weight() for tx in transactions)
+        digest = hashlib.sha256(bytes.fromhex(prev_hash) + height.to_bytes(8, "little"))
+        for tx in transactions:
+            digest.update(tx.txid_bytes)
+        self.block_hash = digest.hexdigest()
+
+    @property
+    def coinbase(self):
+        return self.transactions[0]
+
+def mine_block(miner_address, mempool, utxo_manager, num_txs=None, verbose=True, prev_block=None):
     """
     Simulates mining: updates UTXO set and creates a coinbase reward.
+    Takes the mempool's ready block template, or with num_txs, selects at most
+    that many transactions. Returns the new Block (built on prev_block, if
+    given), or None when the mempool is empty. Pass verbose=False to suppress
+    console output.
     """
-    # Prioritize highest fee transactions
-    selected_txs = mempool.get_top_transactions(num_txs, utxo_manager)
-    
-    if not selected_txs:
-        print("Mempool empty, nothing to mine.")
-        return False
-
-    total_fees = Decimal('0.0')
-    print(f"Mining block with {len(selected_txs)} transactions...")
-
-    for tx in selected_txs:
-        input_sum = Decimal('0.0')
-        output_sum = Decimal('0.0')
-        
-        # 1. Consume Inputs (Remove from UTXO set)
-        for inp in tx.inputs:
-            prev_id, prev_idx = inp['prev_tx'], inp['index']
-            
-            if utxo_manager.exists(prev_id, prev_idx):
-                utxo_data = utxo_manager.utxo_set[(prev_id, prev_idx)]
-                amt = utxo_data["amount"]
-                input_sum += amt
-                utxo_manager.remove_utxo(prev_id, prev_idx)
-            
-            # Clean up mempool tracker
-            if (prev_id, prev_idx) in mempool.spent_utxos:
-                mempool.spent_utxos.remove((prev_id, prev_idx))
-
-        # 2. Create Outputs (Add to UTXO set)
-        for i, out in enumerate(tx.outputs):
-            amount_decimal = Decimal(str(out['amount']))
-            
-            utxo_manager.add_utxo(tx.tx_id, i, amount_decimal, out['address'])
-            output_sum += amount_decimal
+    # Validation must never see a half-applied block. Stores with a batch()
+    # (SQLiteUTXOManager) write the whole block to disk in one go at the end.
+    with mempool.lock, getattr(utxo_manager, "batch", nullcontext)():
+        return _mine_block(miner_address, mempool, utxo_manager, num_txs, verbose, prev_block)
+
+def _mine_block(miner_address, mempool, utxo_manager, num_txs, verbose, prev_block):
+    start = now() if STATS.enabled else None
+
+    # Prioritize the best ancestor packages (parents always precede children)
+    template = mempool.template
+    if num_txs is None:
+        selected = template.take()
+    else:
+        selected = mempool.select_block_entries(num_txs, template.max_tx_weight)
+    if start is not None:
+        STATS.observe("miner.select", now() - start)
 
-        # Fee = Inputs - Outputs
-        total_fees += (input_sum - output_sum)
+    if not selected:
+        if verbose:
+            print("Mempool empty, nothing to mine.")
+        if start is not None:
+            STATS.incr("miner.empty_mempool")
+        return None
 
-    # 3. Create Coinbase TX (Miner Reward)
+    # 1. Create Coinbase TX (Miner Reward) before touching the UTXO set: hashing
+    # it rejects an unencodable miner address while nothing has changed yet
+    total_fees = sum(entry.fee for entry in selected)
     coinbase_tx = Transaction(
         sender="SYSTEM",
         recipient=miner_address,
         inputs=[],
-        outputs=[{"amount": total_fees, "address": miner_address}]
+        outputs=[{"amount": total_fees, "address": miner_address}],
+        # Without inputs, two rewards of the same amount to the same miner would
+        # hash to the same ID; a random nonce keeps every coinbase distinct
+        nonce=random.getrandbits(64)
     )
-    
-    # Add coinbase output to UTXO set (index 0)
-    utxo_manager.add_utxo(coinbase_tx.tx_id, 0, total_fees, miner_address)
+    coinbase_id = coinbase_tx.tx_id
+
+    undo = []
+    if verbose:
+        print(f"Mining block with {len(selected)} transactions...")
+
+    for entry in selected:
+        tx = entry.tx
+
+        # 2. Consume Inputs (Remove from UTXO set); values were resolved at admission.
+        # Outputs of an in-block parent were added earlier in this loop.
+        # The validator matched each owner, so the undo record needs no lookup.
+        spent = []
+        for inp, amount in zip(tx.inputs, entry.input_values):
+            utxo_manager.remove_utxo(inp['prev_tx'], inp['index'])
+            spent.append((inp['prev_tx'], inp['index'], amount, inp['owner']))
+        undo.append(spent)
+
+        # 3. Create Outputs (Add to UTXO set)
+        for i, out in enumerate(tx.outputs):
+            utxo_manager.add_utxo(tx.tx_id, i, out['amount'], out['address'])
+
+    # Add coinbase output to UTXO set (index 0); fees were cached on the mempool entries
+    utxo_manager.add_utxo(coinbase_id, 0, total_fees, miner_address)
+
+    # 4. Remove mined txs from mempool (releases their spent_utxos markers and
+    # re-roots any unmined children on the now-confirmed outputs)
+    for entry in selected:
+        mempool.remove_transaction(entry.tx.tx_id)
+
+    # Height 0 is the genesis UTXO state, so the first mined block is 1
+    height = prev_block.height + 1 if prev_block is not None else 1
+    prev_hash = prev_block.block_hash if prev_block is not None else GENESIS_HASH
+    block = Block(height, prev_hash, [coinbase_tx] + [entry.tx for entry in selected],
+                  undo, total_fees, utxo_manager.commitment())
+
+    if start is not None:
+        STATS.observe("miner.mine_block", now() - start)
+        STATS.incr("miner.blocks")
+        STATS.incr("miner.transactions", len(selected))
+        STATS.incr("miner.fees_sat", total_fees)
+        STATS.gauge("miner.fill_ratio", block.weight / template.max_weight)
+        STATS.gauge("mempool.size", len(mempool))
+        STATS.gauge("utxo.count", len(utxo_manager))
+
+    # Have the next template ready; later arrivals are appended to it as they come
+    if num_txs is None:
+        template.refresh()
+
+    if verbose:
+        print(f"Block {block.height} mined! Miner {miner_address} reward: {format_btc(total_fees)} BTC "
+              f"({block.weight / template.max_weight:.2%} full)")
+    return block
+
+def connect_block(block, mempool, utxo_manager, verbose=True):
+    """
+    Applies a block mined elsewhere, which must build on the current tip:
+    validates its transactions, updates the UTXO set and takes them (and
+    anything they conflict with) out of the mempool. Returns
+    (Block, msg), where the Block is this node's copy with undo data built
+    from its own UTXO set, or (None, msg) if the block is invalid.
+    """
+    with mempool.lock, getattr(utxo_manager, "batch", nullcontext)():
+        return _connect_block(block, mempool, utxo_manager, verbose)
+
+def _connect_block(block, mempool, utxo_manager, verbose):
+    start = now() if STATS.enabled else None
+    txs = block.transactions
+    if not txs or txs[0].inputs:
+        return None, "Block Error: Block does not start with a coinbase."
+    is_valid, msg, _ = Validator.check_block(txs[1:], utxo_manager)
+    if not is_valid:
+        return None, f"Block Error: {msg}"
+
+    # Same application as mining; inputs were just checked, so every lookup hits
+    total_fees = 0
+    undo = []
+    for tx in txs[1:]:
+        spent = []
+        for inp in tx.inputs:
+            data = utxo_manager.get_utxo(inp['prev_tx'], inp['index'])
+            utxo_manager.remove_utxo(inp['prev_tx'], inp['index'])
+            spent.append((inp['prev_tx'], inp['index'], data['amount'], data['owner']))
+            total_fees += data['amount']
+        undo.append(spent)
+        for i, out in enumerate(tx.outputs):
+            utxo_manager.add_utxo(tx.tx_id, i, out['amount'], out['address'])
+            total_fees -= out['amount']
+
+    coinbase = txs[0]
+    reward = sum(out['amount'] for out in coinbase.outputs)
+    if reward > total_fees:
+        # Put the UTXO set back exactly as it was
+        _undo_transactions(txs[1:], undo, utxo_manager)
+        return None, (f"Block Error: Coinbase pays {format_btc(reward)} BTC, "
+                      f"more than the block's fees ({format_btc(total_fees)} BTC).")
+    for i, out in enumerate(coinbase.outputs):
+        utxo_manager.add_utxo(coinbase.tx_id, i, out['amount'], out['address'])
+    commitment = utxo_manager.commitment()
+    if block.utxo_commitment is not None and block.utxo_commitment != commitment:
+        # Same transactions, different resulting state: the miner's set has diverged from ours
+        for i in range(len(coinbase.outputs)):
+            utxo_manager.remove_utxo(coinbase.tx_id, i)
+        _undo_transactions(txs[1:], undo, utxo_manager)
+        return None, (f"Block Error: UTXO commitment {block.utxo_commitment} does not match "
+                      f"the local result {commitment}.")
+    mempool.remove_block_transactions(txs[1:])
+
+    local = Block(block.height, block.prev_hash, txs, undo, total_fees, commitment)
+    if start is not None:
+        STATS.observe("miner.connect_block", now() - start)
+        STATS.incr("miner.blocks_connected")
+        STATS.gauge("mempool.size", len(mempool))
+        STATS.gauge("utxo.count", len(utxo_manager))
+    if verbose:
+        print(f"Block {local.height} connected: {len(txs) - 1} transactions, "
+              f"fees: {format_btc(total_fees)} BTC")
+    return local, f"Block valid! {len(txs) - 1} transactions, fees: {format_btc(total_fees)} BTC"
+
+def _undo_transactions(txs, undo, utxo_manager):
+    # Walk backwards so an in-block child is undone before its parent
+    for tx, spent in zip(reversed(txs), reversed(undo)):
+        for i in range(len(tx.outputs)):
+            utxo_manager.remove_utxo(tx.tx_id, i)
+        for tx_id, index, amount, owner in spent:
+            utxo_manager.add_utxo(tx_id, index, amount, owner)
+
+def disconnect_block(block, mempool, utxo_manager, verbose=True):
+    """
+    Undoes a block, which must be the current tip: removes its outputs,
+    restores the outputs it spent from the undo data, and returns its
+    transactions to the mempool. Costs O(block size), not a replay from genesis.
+    Returns the transactions that could not re-enter the mempool.
+    """
+    with mempool.lock, getattr(utxo_manager, "batch", nullcontext)():
+        return _disconnect_block(block, mempool, utxo_manager, verbose)
+
+def _disconnect_block(block, mempool, utxo_manager, verbose):
+    start = now() if STATS.enabled else None
+
+    txs = block.transactions
+    _undo_transactions(txs[1:], block.undo, utxo_manager)
+    for i in range(len(block.coinbase.outputs)):
+        utxo_manager.remove_utxo(block.coinbase.tx_id, i)
+
+    dropped = mempool.reinsert_transactions(txs[1:], utxo_manager, [block.coinbase])
 
-    # 4. Remove mined txs from mempool
-    for tx in selected_txs:
-        mempool.remove_transaction(tx.tx_id)
+    if start is not None:
+        STATS.observe("miner.disconnect_block", now() - start)
+        STATS.incr("miner.blocks_disconnected")
+        STATS.gauge("mempool.size", len(mempool))
+        STATS.gauge("utxo.count", len(utxo_manager))
 
-    print(f"Block mined! Miner {miner_address} reward: {total_fees} BTC")
-    return True
\ No newline at end of file
+    if verbose:
+        returned = sum(1 for tx in txs[1:] if tx.tx_id in mempool.entries)
+        print(f"Block {block.height} disconnected; {returned} transactions returned to the mempool.")
+    return dropped
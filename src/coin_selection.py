@@ -0,0 +1,287 @@
+import random
+from bisect import bisect_left, insort
+from typing import NamedTuple
+from src.transaction import Transaction, TX_OVERHEAD_BYTES, INPUT_BYTES, OUTPUT_BYTES
+
+# Wallet-side coin selection. Fee rates are satoshis per 1000 bytes, the same
+# unit as MempoolEntry.fee_rate; 500_000 puts a 1-in/2-out send near 0.001 BTC.
+DEFAULT_FEE_RATE = 500_000
+# Change smaller than this is not worth an output; it goes to the fee instead
+DUST_THRESHOLD = 546
+
+# Search bounds. Each strategy looks at a bisected window of at most this many
+# coins, so selection stays near O(log n) for owners with very many UTXOs.
+MAX_BNB_COINS = 32
+MAX_BNB_TRIES = 10_000
+MAX_KNAPSACK_COINS = 64
+KNAPSACK_ITERATIONS = 100
+
+class CoinIndex:
+    """
+    Per-owner UTXOs kept sorted by amount: owner -> [(amount, tx_id, index)].
+    UTXO managers update it on every add and remove once it is attached.
+    """
+
+    def __init__(self):
+        self._by_owner = {}
+
+    def add(self, owner, amount, tx_id, index):
+        insort(self._by_owner.setdefault(owner, []), (amount, tx_id, index))
+
+    def remove(self, owner, amount, tx_id, index):
+        coins = self._by_owner.get(owner)
+        if coins is None:
+            return
+        item = (amount, tx_id, index)
+        pos = bisect_left(coins, item)
+        if pos < len(coins) and coins[pos] == item:
+            del coins[pos]
+            if not coins:
+                del self._by_owner[owner]
+
+    def coins(self, owner):
+        """The owner's coins in ascending amount order (do not modify)."""
+        return self._by_owner.get(owner, [])
+
+def attach_coin_index(utxo_manager):
+    """Builds a CoinIndex from the manager's current UTXOs and keeps it in sync from now on."""
+    index = CoinIndex()
+    for tx_id, out_index, amount, owner in utxo_manager.iter_utxos():
+        index.add(owner, amount, tx_id, out_index)
+    utxo_manager.coin_index = index
+    return index
+
+def sorted_coins(utxo_manager, owner):
+    """The owner's coins sorted by amount, from the index when one is attached."""
+    index = getattr(utxo_manager, "coin_index", None)
+    if index is not None:
+        return index.coins(owner)
+    return sorted((u["amount"], u["tx_id"], u["index"]) for u in utxo_manager.get_utxos_for_owner(owner))
+
+class CoinSelection(NamedTuple):
+    coins: list    # (amount, tx_id, index) tuples to spend
+    fee: int       # Satoshis
+    change: int    # Satoshis back to the sender; 0 means no change output
+    strategy: str
+
+class _Costs(NamedTuple):
+    base: int      # Overhead plus the recipient output
+    input: int     # Per input
+    change: int    # The change output
+
+def _costs(fee_rate):
+    def cost(size):
+        return -(-fee_rate * size // 1000) # Round up so the rate is always met
+    return _Costs(cost(TX_OVERHEAD_BYTES + OUTPUT_BYTES), cost(INPUT_BYTES), cost(OUTPUT_BYTES))
+
+def _finish(picked, target, costs, strategy):
+    """Works out fee and change for a set of coins, or None if they fall short."""
+    excess = sum(c[0] for c in picked) - target - costs.base - costs.input * len(picked)
+    if excess < 0:
+        return None
+    change = excess - costs.change
+    if change >= DUST_THRESHOLD:
+        return CoinSelection(picked, costs.base + costs.input * len(picked) + costs.change, change, strategy)
+    return CoinSelection(picked, excess + costs.base + costs.input * len(picked), 0, strategy)
+
+def _window(coins, low, high, limit, spent):
+    """Up to `limit` unspent coins with low < amount <= high, largest first."""
+    # Coins are (amount, tx_id, index) and amounts are ints, so the 1-tuple
+    # (n,) sorts before every coin worth n; bisect's key= needs Python 3.10
+    lo = bisect_left(coins, (low + 1,))
+    hi = bisect_left(coins, (high + 1,))
+    picked = []
+    for pos in range(hi - 1, lo - 1, -1):
+        coin = coins[pos]
+        if (coin[1], coin[2]) not in spent:
+            picked.append(coin)
+            if len(picked) == limit:
+                break
+    return picked
+
+def select_bnb(coins, target, costs, spent=frozenset()):
+    """
+    Branch and bound: a set of coins that pays target plus fees with less
+    excess than a change output would cost, so no change is needed.
+    """
+    lower = target + costs.base
+    upper = lower + costs.change
+    window = _window(coins, costs.input, upper + costs.input, MAX_BNB_COINS, spent)
+    effective = [c[0] - costs.input for c in window]
+    # Effective value still available from position i onwards, for pruning
+    remaining = [0] * (len(window) + 1)
+    for i in range(len(window) - 1, -1, -1):
+        remaining[i] = remaining[i + 1] + effective[i]
+
+    best, best_total, tries = None, None, 0
+    chosen = []
+
+    def search(i, total):
+        nonlocal best, best_total, tries
+        tries += 1
+        if tries > MAX_BNB_TRIES or total > upper or (best_total == lower):
+            return
+        if total >= lower:
+            if best_total is None or total < best_total:
+                best, best_total = list(chosen), total
+            return
+        if i == len(window) or total + remaining[i] < lower:
+            return
+        chosen.append(window[i])
+        search(i + 1, total + effective[i])
+        chosen.pop()
+        # Leaving out a coin and taking an equal one later finds nothing new
+        j = i + 1
+        while j < len(window) and effective[j] == effective[i]:
+            j += 1
+        search(j, total)
+
+    search(0, 0)
+    if best is None:
+        return None
+    return CoinSelection(best, sum(c[0] for c in best) - target, 0, "bnb")
+
+def select_largest_first(coins, target, costs, spent=frozenset()):
+    """Spends the largest coins until the target, fees and change are covered."""
+    picked, total = [], 0
+    need = target + costs.base
+    for pos in range(len(coins) - 1, -1, -1):
+        coin = coins[pos]
+        if coin[0] <= costs.input:
+            break # Every remaining coin costs more to spend than it is worth
+        if (coin[1], coin[2]) in spent:
+            continue
+        picked.append(coin)
+        total += coin[0] - costs.input
+        if total >= need + costs.change:
+            break
+    if total < need:
+        return None
+    return _finish(picked, target, costs, "largest_first")
+
+def select_knapsack(coins, target, costs, spent=frozenset()):
+    """
+    Bitcoin Core's knapsack: the smallest single coin that covers the target
+    with change, unless a randomized subset of smaller coins comes closer.
+    """
+    need = target + costs.base + costs.change
+    rng = random.Random(target)
+
+    # Smallest coin that covers everything on its own
+    single = None
+    pos = bisect_left(coins, (need + costs.input,))
+    while pos < len(coins):
+        coin = coins[pos]
+        if (coin[1], coin[2]) not in spent:
+            single = coin
+            break
+        pos += 1
+
+    smaller = _window(coins, costs.input, need + costs.input, MAX_KNAPSACK_COINS, spent)
+    effective = [c[0] - costs.input for c in smaller]
+    best, best_total = None, None
+    if sum(effective) >= need:
+        for _ in range(KNAPSACK_ITERATIONS):
+            included = [False] * len(smaller)
+            total, reached = 0, False
+            # First pass adds random coins, the second adds whatever is left
+            for first_pass in (True, False):
+                if reached:
+                    break
+                for k in range(len(smaller)):
+                    if (rng.random() < 0.5) if first_pass else not included[k]:
+                        included[k] = True
+                        total += effective[k]
+                        if total >= need:
+                            reached = True
+                            if best_total is None or total < best_total:
+                                best_total = total
+                                best = [c for c, inc in zip(smaller, included) if inc]
+                            # Back the coin out and keep looking for a closer total
+                            included[k] = False
+                            total -= effective[k]
+            if best_total == need:
+                break
+
+    if single is not None and (best_total is None or single[0] - costs.input <= best_total):
+        return _finish([single], target, costs, "knapsack")
+    if best is None:
+        return None
+    return _finish(best, target, costs, "knapsack")
+
+STRATEGIES = {
+    "bnb": select_bnb,
+    "knapsack": select_knapsack,
+    "largest_first": select_largest_first,
+}
+
+def select_coins(coins, target, fee_rate=DEFAULT_FEE_RATE, strategy="auto", spent=frozenset()):
+    """
+    Chooses coins (ascending (amount, tx_id, index) tuples) to pay `target`
+    satoshis at `fee_rate`, skipping outpoints in `spent`. "auto" tries an
+    exact match first, then knapsack, then largest-first. Returns a
+    CoinSelection, or None if the coins cannot cover it.
+    """
+    costs = _costs(fee_rate)
+    if strategy != "auto":
+        return STRATEGIES[strategy](coins, target, costs, spent)
+    for select in (select_bnb, select_knapsack, select_largest_first):
+        selection = select(coins, target, costs, spent)
+        if selection is not None:
+            return selection
+    return None
+
+def build_payment(utxo_manager, sender, recipient, amount, fee_rate=DEFAULT_FEE_RATE,
+                  strategy="auto", spent=frozenset()):
+    """
+    Builds a multi-input transaction paying `amount` satoshis from sender to
+    recipient, with change back to the sender. Pass the mempool's
+    spent_utxos as `spent` to avoid coins already being spent.
+    Returns (Transaction, CoinSelection); raises ValueError if funds are short.
+    """
+    selection = select_coins(sorted_coins(utxo_manager, sender), amount, fee_rate, strategy, spent)
+    if selection is None:
+        raise ValueError(f"Insufficient funds: {sender} cannot cover the amount plus fees.")
+    outputs = [{"amount": amount, "address": recipient}]
+    if selection.change:
+        outputs.append({"amount": selection.change, "address": sender})
+    tx = Transaction(
+        sender=sender,
+        recipient=recipient,
+        inputs=[{"prev_tx": tx_id, "index": index, "owner": sender} for _, tx_id, index in selection.coins],
+        outputs=outputs
+    )
+    return tx, selection
+
+def bump_fee(mempool, tx_id, fee_rate):
+    """
+    Builds a replacement for a pending payment that pays at least `fee_rate`,
+    with the extra fee taken from its change output (dropped if it would
+    fall below dust). It also outbids the transaction's pool descendants,
+    which the replacement evicts. Submit it to a replace_by_fee mempool.
+    Returns the Transaction; raises ValueError if there is not enough change.
+    """
+    entry = mempool.entries.get(tx_id)
+    if entry is None:
+        raise ValueError(f"Transaction {tx_id} is not in the mempool.")
+    tx = entry.tx
+    outputs = [dict(out) for out in tx.outputs]
+    change = next((i for i in range(len(outputs) - 1, -1, -1)
+                   if outputs[i]['address'] == tx.sender), None)
+    if change is None:
+        raise ValueError("Transaction has no change output to pay a higher fee from.")
+
+    size = tx.size()
+    replaced_fee = entry.fee + sum(mempool.entries[t].fee for t in mempool.get_descendants(tx_id))
+    fee = max(-(-fee_rate * size // 1000),
+              replaced_fee + 1,
+              -(-(entry.fee_rate + 1) * size // 1000)) # Strictly above the old fee rate
+    remaining = outputs[change]['amount'] - (fee - entry.fee)
+    if remaining < 0:
+        raise ValueError(f"Change of {outputs[change]['amount']} sat cannot cover a fee of {fee} sat.")
+    if remaining < DUST_THRESHOLD:
+        del outputs[change]
+    else:
+        outputs[change]['amount'] = remaining
+    return Transaction(sender=tx.sender, recipient=tx.recipient, inputs=[dict(inp) for inp in tx.inputs],
+                       outputs=outputs, nonce=tx.nonce)
@@ -0,0 +1,37 @@
+import hashlib
+import struct
+
+# Order-independent commitment to a UTXO set: the sum, mod 2**256, of the
+# SHA-256 of every UTXO's canonical encoding. Adding a UTXO adds its hash and
+# spending it subtracts it, so each manager keeps its commitment current in
+# O(1) per change, and two sets hold the same UTXOs exactly when their
+# commitments match, however they were built. The empty set commits to 0.
+#
+# An additive hash detects divergence, corruption and replay bugs. It is not
+# meant to resist someone choosing UTXOs to forge a collision (that needs
+# MuHash-style multiplication in a prime field).
+COMMITMENT_MASK = (1 << 256) - 1
+_LENGTHS = struct.Struct("<HH")
+_NUMBERS = struct.Struct("<qq")
+
+
+def utxo_hash(tx_id, index, amount, owner) -> int:
+    """The set element for one UTXO; strings are length-prefixed so no two encodings collide."""
+    tx_bytes = tx_id.encode("utf-8")
+    owner_bytes = owner.encode("utf-8")
+    digest = hashlib.sha256(_LENGTHS.pack(len(tx_bytes), len(owner_bytes)) + tx_bytes
+                            + _NUMBERS.pack(index, amount) + owner_bytes).digest()
+    return int.from_bytes(digest, "little")
+
+
+def compute_commitment(utxos) -> int:
+    """Commitment from scratch over (tx_id, index, amount, owner) tuples, e.g. iter_utxos()."""
+    total = 0
+    for tx_id, index, amount, owner in utxos:
+        total += utxo_hash(tx_id, index, amount, owner)
+    return total & COMMITMENT_MASK
+
+
+def format_commitment(value) -> str:
+    """A commitment as 64 hex characters."""
+    return value.to_bytes(32, "big").hex()
@@ -0,0 +1,303 @@
+import sys
+from array import array
+from collections.abc import Mapping
+from src import snapshot
+from src.commitment import COMMITMENT_MASK, utxo_hash, compute_commitment, format_commitment
+
+# Ranges of the 'I' index and 'q' amount columns
+_MAX_INDEX = (1 << 32) - 1
+_MIN_AMOUNT = -(1 << 63)
+_MAX_AMOUNT = (1 << 63) - 1
+
+
+class _UTXOSetView(Mapping):
+    """Read-only (tx_id, index) -> {amount, owner} view, decoded on access."""
+
+    def __init__(self, manager):
+        self._manager = manager
+
+    def __getitem__(self, key):
+        data = self._manager.get_utxo(key[0], key[1])
+        if data is None:
+            raise KeyError(key)
+        return data
+
+    def __contains__(self, key):
+        return self._manager.exists(key[0], key[1])
+
+    def __iter__(self):
+        m = self._manager
+        for slot in m._slots.values():
+            yield (m._txids[m._col_txid[slot]], m._col_index[slot])
+
+    def __len__(self):
+        return len(self._manager._slots)
+
+
+class CompactUTXOManager:
+    """
+    Memory-lean UTXO set with the same API as UTXOManager.
+
+    Each UTXO is one row across four typed columns (tx id, index, amount in
+    satoshis, owner). Tx ids and owners are interned into string tables and
+    referenced by integer id, and rows freed by spends are reused by later adds.
+    """
+
+    def __init__(self):
+        # Interned tx ids; ids are recycled once no output references them
+        self._txids = []
+        self._txid_ids = {}
+        self._txid_refs = array('I')
+        self._free_txids = []
+
+        # Interned owners (a small, long-lived set, so never recycled)
+        self._owners = []
+        self._owner_ids = {}
+
+        # Struct-of-arrays storage, one row per UTXO
+        self._col_txid = array('I')
+        self._col_index = array('I')
+        self._col_amount = array('q')
+        self._col_owner = array('I')
+        self._free_slots = []
+
+        # Packed outpoint (txid_id << 32 | index) -> row
+        self._slots = {}
+        # owner_id -> {row: None} and owner_id -> balance in satoshis
+        self._owner_slots = {}
+        self._owner_balance = {}
+        # Optional amount-sorted CoinIndex, see coin_selection.attach_coin_index
+        self.coin_index = None
+        # Sum of every UTXO's hash, see src/commitment.py
+        self._commitment = 0
+
+        self.utxo_set = _UTXOSetView(self)
+
+    # --- Interning helpers ---
+
+    def _intern_txid(self, tx_id):
+        txid_id = self._txid_ids.get(tx_id)
+        if txid_id is not None:
+            return txid_id
+        if self._free_txids:
+            txid_id = self._free_txids.pop()
+            self._txids[txid_id] = tx_id
+            self._txid_refs[txid_id] = 0
+        else:
+            txid_id = len(self._txids)
+            self._txids.append(tx_id)
+            self._txid_refs.append(0)
+        self._txid_ids[tx_id] = txid_id
+        return txid_id
+
+    def _release_txid(self, txid_id):
+        self._txid_refs[txid_id] -= 1
+        if self._txid_refs[txid_id] == 0:
+            del self._txid_ids[self._txids[txid_id]]
+            self._txids[txid_id] = None
+            self._free_txids.append(txid_id)
+
+    def _intern_owner(self, owner):
+        owner_id = self._owner_ids.get(owner)
+        if owner_id is None:
+            owner_id = len(self._owners)
+            self._owners.append(owner)
+            self._owner_ids[owner] = owner_id
+        return owner_id
+
+    def _find_slot(self, tx_id, index):
+        txid_id = self._txid_ids.get(tx_id)
+        if txid_id is None:
+            return None
+        return self._slots.get((txid_id << 32) | index)
+
+    # --- UTXOManager API ---
+
+    def add_utxo(self, tx_id: str, index: int, amount: int, owner: str):
+        """
+        Add a new UTXO to the set. Amount is in integer satoshis.
+        """
+        if type(amount) is not int:
+            raise TypeError(f"UTXO amount must be integer satoshis, got {type(amount).__name__}")
+        # Check everything the columns and commitment will need before changing
+        # anything, so a bad row cannot leave the columns out of step
+        if type(tx_id) is not str or type(owner) is not str:
+            raise TypeError("UTXO tx_id and owner must be strings")
+        if type(index) is not int or not 0 <= index <= _MAX_INDEX:
+            raise ValueError(f"UTXO index {index!r} is outside 0..{_MAX_INDEX}")
+        if not _MIN_AMOUNT <= amount <= _MAX_AMOUNT:
+            raise ValueError(f"UTXO amount {amount} does not fit in 64 bits")
+        if self.exists(tx_id, index):
+            self.remove_utxo(tx_id, index)
+
+        txid_id = self._intern_txid(tx_id)
+        owner_id = self._intern_owner(owner)
+        self._txid_refs[txid_id] += 1
+
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._col_txid[slot] = txid_id
+            self._col_index[slot] = index
+            self._col_amount[slot] = amount
+            self._col_owner[slot] = owner_id
+        else:
+            slot = len(self._col_txid)
+            self._col_txid.append(txid_id)
+            self._col_index.append(index)
+            self._col_amount.append(amount)
+            self._col_owner.append(owner_id)
+
+        self._slots[(txid_id << 32) | index] = slot
+        self._owner_slots.setdefault(owner_id, {})[slot] = None
+        self._owner_balance[owner_id] = self._owner_balance.get(owner_id, 0) + amount
+        self._commitment = (self._commitment + utxo_hash(tx_id, index, amount, owner)) & COMMITMENT_MASK
+        if self.coin_index is not None:
+            self.coin_index.add(owner, amount, tx_id, index)
+
+    def remove_utxo(self, tx_id: str, index: int):
+        """
+        Remove a UTXO (when spent). Its row goes on the free list for reuse.
+        """
+        txid_id = self._txid_ids.get(tx_id)
+        if txid_id is None:
+            return
+        slot = self._slots.pop((txid_id << 32) | index, None)
+        if slot is None:
+            return
+
+        owner_id = self._col_owner[slot]
+        self._commitment = (self._commitment - utxo_hash(tx_id, index, self._col_amount[slot],
+                                                         self._owners[owner_id])) & COMMITMENT_MASK
+        if self.coin_index is not None:
+            self.coin_index.remove(self._owners[owner_id], self._col_amount[slot], tx_id, index)
+        owned = self._owner_slots[owner_id]
+        del owned[slot]
+        if owned:
+            self._owner_balance[owner_id] -= self._col_amount[slot]
+        else:
+            del self._owner_slots[owner_id]
+            del self._owner_balance[owner_id]
+
+        self._free_slots.append(slot)
+        self._release_txid(txid_id)
+
+    def get_utxo(self, tx_id: str, index: int):
+        """
+        Return {amount, owner} for an unspent output, or None if missing.
+        """
+        slot = self._find_slot(tx_id, index)
+        if slot is None:
+            return None
+        return {
+            "amount": self._col_amount[slot],
+            "owner": self._owners[self._col_owner[slot]]
+        }
+
+    def exists(self, tx_id: str, index: int) -> bool:
+        return self._find_slot(tx_id, index) is not None
+
+    def get_balance(self, owner: str) -> int:
+        owner_id = self._owner_ids.get(owner)
+        if owner_id is None:
+            return 0
+        return self._owner_balance.get(owner_id, 0)
+
+    def get_utxos_for_owner(self, owner: str) -> list:
+        owner_id = self._owner_ids.get(owner)
+        owned_utxos = []
+        for slot in self._owner_slots.get(owner_id, ()):
+            owned_utxos.append({
+                "tx_id": self._txids[self._col_txid[slot]],
+                "index": self._col_index[slot],
+                "amount": self._col_amount[slot],
+                "owner": owner
+            })
+        return owned_utxos
+
+    def commitment(self) -> str:
+        """
+        Order-independent hash of the whole set, kept up to date on every add and remove.
+        """
+        return format_commitment(self._commitment)
+
+    def __len__(self):
+        return len(self._slots)
+
+    def iter_utxos(self):
+        """Yields (tx_id, index, amount, owner) for every unspent output."""
+        for slot in self._slots.values():
+            yield (self._txids[self._col_txid[slot]], self._col_index[slot],
+                   self._col_amount[slot], self._owners[self._col_owner[slot]])
+
+    def dump_snapshot(self, path):
+        """Writes a versioned, checksummed binary snapshot of the set to `path`."""
+        snapshot.dump_snapshot(self, path)
+
+    @classmethod
+    def load_snapshot(cls, path):
+        """Builds a new manager from a snapshot written by dump_snapshot."""
+        return snapshot.load_snapshot(path, cls)
+
+    def _restore_columns(self, txids, owners, col_txid, col_index, col_amount, col_owner):
+        """
+        Adopts decoded snapshot columns as-is; only the hash indexes are rebuilt.
+        """
+        self._txids = list(txids)
+        self._txid_ids = {tx_id: i for i, tx_id in enumerate(self._txids)}
+        self._txid_refs = array('I', bytes(4 * len(self._txids)))
+        self._owners = list(owners)
+        self._owner_ids = {owner: i for i, owner in enumerate(self._owners)}
+
+        self._col_txid, self._col_index = col_txid, col_index
+        self._col_amount, self._col_owner = col_amount, col_owner
+
+        slots, owner_slots, balances, refs = {}, {}, {}, self._txid_refs
+        for slot, (tid, index, amount, oid) in enumerate(zip(col_txid, col_index, col_amount, col_owner)):
+            slots[(tid << 32) | index] = slot
+            refs[tid] += 1
+            owned = owner_slots.get(oid)
+            if owned is None:
+                owned = owner_slots[oid] = {}
+                balances[oid] = 0
+            owned[slot] = None
+            balances[oid] += amount
+        self._slots, self._owner_slots, self._owner_balance = slots, owner_slots, balances
+        self._commitment = compute_commitment(self.iter_utxos())
+
+    def memory_usage(self) -> dict:
+        """
+        Approximate bytes held by the columns, string tables and indexes.
+        """
+        column_bytes = sum(col.buffer_info()[1] * col.itemsize for col in
+                           (self._col_txid, self._col_index, self._col_amount, self._col_owner))
+
+        slot_bytes = sys.getsizeof(self._slots) + sys.getsizeof(self._free_slots)
+        for packed in self._slots:
+            slot_bytes += sys.getsizeof(packed)
+
+        string_bytes = (sys.getsizeof(self._txids) + sys.getsizeof(self._txid_ids)
+                        + sys.getsizeof(self._owners) + sys.getsizeof(self._owner_ids)
+                        + self._txid_refs.buffer_info()[1] * self._txid_refs.itemsize)
+        for s in self._txids:
+            if s is not None:
+                string_bytes += sys.getsizeof(s)
+        for s in self._owners:
+            string_bytes += sys.getsizeof(s)
+
+        index_bytes = sys.getsizeof(self._owner_slots) + sys.getsizeof(self._owner_balance)
+        for owned in self._owner_slots.values():
+            index_bytes += sys.getsizeof(owned)
+
+        total = column_bytes + slot_bytes + string_bytes + index_bytes
+        count = len(self._slots)
+        return {
+            "backend": "compact",
+            "utxos": count,
+            "free_slots": len(self._free_slots),
+            "column_bytes": column_bytes,
+            "slot_map_bytes": slot_bytes,
+            "string_table_bytes": string_bytes,
+            "index_bytes": index_bytes,
+            "total_bytes": total,
+            "bytes_per_utxo": total / count if count else 0.0
+        }
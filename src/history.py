@@ -0,0 +1,121 @@
+from bisect import bisect_left
+from typing import NamedTuple
+
+RECEIVED = "received"
+SENT = "sent"
+
+
+class HistoryEntry(NamedTuple):
+    tx_id: str
+    height: int
+    direction: str # RECEIVED or SENT
+    amount: int    # Satoshis the transaction paid to, or spent from, the address
+
+
+class _AddressLog:
+    """One address's entries in chain order, plus the RECEIVED ones and their heights for bisecting."""
+    __slots__ = ("entries", "received", "received_heights")
+
+    def __init__(self):
+        self.entries = []
+        self.received = []
+        self.received_heights = []
+
+    def append(self, entry):
+        self.entries.append(entry)
+        if entry.direction == RECEIVED:
+            self.received.append(entry)
+            self.received_heights.append(entry.height)
+
+    def pop_block(self, tx_ids):
+        """Drops the trailing entries that belong to the given block's transactions."""
+        while self.entries and self.entries[-1].tx_id in tx_ids:
+            entry = self.entries.pop()
+            if entry.direction == RECEIVED:
+                self.received.pop()
+                self.received_heights.pop()
+
+
+class AddressHistory:
+    """
+    Address -> confirmed transaction history, filled one block at a time.
+
+    Each transaction that pays an address gets a RECEIVED entry and each one
+    that spends from it a SENT entry (a transaction with change back to the
+    sender has both), with the amounts summed per address. Spent amounts come
+    from the block's undo data, so nothing is looked up in the UTXO set.
+    Blocks must be added in chain order and removed tip first.
+    """
+
+    def __init__(self):
+        self._logs = {}
+        self.height = 0 # Height of the last block added
+
+    def add_block(self, block):
+        logs = self._logs
+        height = block.height
+        for position, tx in enumerate(block.transactions):
+            if position: # The coinbase spends nothing
+                sent = {}
+                for _, _, amount, owner in block.undo[position - 1]:
+                    sent[owner] = sent.get(owner, 0) + amount
+                for owner, amount in sent.items():
+                    log = logs.get(owner)
+                    if log is None:
+                        log = logs[owner] = _AddressLog()
+                    log.append(HistoryEntry(tx.tx_id, height, SENT, amount))
+            received = {}
+            for out in tx.outputs:
+                received[out['address']] = received.get(out['address'], 0) + out['amount']
+            for address, amount in received.items():
+                log = logs.get(address)
+                if log is None:
+                    log = logs[address] = _AddressLog()
+                log.append(HistoryEntry(tx.tx_id, height, RECEIVED, amount))
+        self.height = height
+
+    def remove_block(self, block):
+        """Takes a disconnected tip block back out of the index."""
+        tx_ids = {tx.tx_id for tx in block.transactions}
+        touched = {out['address'] for tx in block.transactions for out in tx.outputs}
+        touched.update(owner for spent in block.undo for _, _, _, owner in spent)
+        for address in touched:
+            log = self._logs.get(address)
+            if log is not None:
+                log.pop_block(tx_ids)
+                if not log.entries:
+                    del self._logs[address]
+        self.height = block.height - 1
+
+    @classmethod
+    def rebuild(cls, blocks):
+        """Builds the index from an iterable of blocks in chain order, e.g. wire.iter_blocks(f)."""
+        history = cls()
+        for block in blocks:
+            history.add_block(block)
+        return history
+
+    def __len__(self):
+        return len(self._logs)
+
+    def count(self, address) -> int:
+        log = self._logs.get(address)
+        return len(log.entries) if log else 0
+
+    def get_history(self, address, offset=0, limit=50, newest_first=True) -> list:
+        """One page of the address's entries; costs O(limit) however long the history is."""
+        log = self._logs.get(address)
+        if log is None or offset < 0 or limit <= 0:
+            return []
+        entries = log.entries
+        if newest_first:
+            end = len(entries) - offset
+            return entries[max(0, end - limit):end][::-1] if end > 0 else []
+        return entries[offset:offset + limit]
+
+    def received_since(self, address, height) -> list:
+        """RECEIVED entries at `height` or later, oldest first."""
+        log = self._logs.get(address)
+        if log is None:
+            return []
+        return log.received[bisect_left(log.received_heights, height):]
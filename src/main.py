@@ -1,32 +1,166 @@
+import os
 import sys
+import argparse
+import asyncio
+import functools
 from src.utxo_manager import UTXOManager
+from src.compact_utxo import CompactUTXOManager
+from src.sharded_utxo import ShardedUTXOManager
+from src.sqlite_utxo import SQLiteUTXOManager
+from src.snapshot import load_snapshot
 from src.mempool import Mempool
-from src.transaction import Transaction
+from src.coin_selection import attach_coin_index, build_payment
 from src.block import mine_block
+from src.stream import DEFAULT_MAX_REORG_DEPTH, run_stream
+from src.node import Node
+from src import stats
+from src.amount import COIN, to_satoshis, format_btc
 from tests.test_scenarios import run_tests
-from decimal import Decimal, getcontext
-getcontext().prec = 28
 
 def parse_amount(input_str):
+    """Parses user input like '10.5 BTC' into integer satoshis (None if invalid)."""
     try:
         clean = input_str.upper().replace("BTC", "").strip()
-        return Decimal(clean) 
-    except:
+        return to_satoshis(clean)
+    except ValueError:
         return None
 
-def main():
-    utxo_manager = UTXOManager()
-    mempool = Mempool()
-
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bitcoin Transaction Simulator")
+    # One UTXO store per run
+    backend = parser.add_mutually_exclusive_group()
+    backend.add_argument("--compact", action="store_true",
+                         help="Use the memory-lean columnar UTXO store")
+    backend.add_argument("--sharded", action="store_true",
+                         help="Use the thread-safe sharded UTXO store")
+    backend.add_argument("--db", metavar="PATH",
+                         help="Keep the UTXO set in a SQLite database at PATH (reopened on the next run)")
+    parser.add_argument("--cache-size", type=int, default=100_000,
+                        help="Outpoints --db keeps cached in memory (default: 100000)")
+    parser.add_argument("--snapshot", metavar="PATH",
+                        help="Start from a UTXO snapshot instead of the genesis state")
+    parser.add_argument("--save-snapshot", metavar="PATH",
+                        help="Write a UTXO snapshot to PATH on exit")
+    parser.add_argument("--stream", metavar="INPUT",
+                        help="Non-interactive mode: read JSONL transactions/mine commands "
+                             "from INPUT ('-' for stdin) and write JSONL results")
+    parser.add_argument("--output", metavar="PATH", default="-",
+                        help="Where --stream writes results ('-' for stdout, the default)")
+    parser.add_argument("--max-reorg-depth", type=int, default=DEFAULT_MAX_REORG_DEPTH,
+                        help="Blocks --stream keeps for disconnect records "
+                             f"(default: {DEFAULT_MAX_REORG_DEPTH})")
+    parser.add_argument("--serve", metavar="PORT", type=int,
+                        help="Run as a local node service on PORT (JSON lines over TCP)")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="Address --serve listens on (default: 127.0.0.1)")
+    parser.add_argument("--rbf", action="store_true",
+                        help="Let a conflicting transaction replace pending ones by paying a higher fee")
+    parser.add_argument("--stats", metavar="PATH",
+                        help="Collect validator/mempool/miner stats and write them to PATH as JSON on exit")
+    args = parser.parse_args(argv)
+    if args.max_reorg_depth < 0:
+        parser.error("--max-reorg-depth must not be negative")
+    return args
+
+def add_genesis_utxos(utxo_manager):
     # Initial Genesis State setup (Required for Assignment)
-    utxo_manager.add_utxo("genesis", 0, 50.0, "Alice")
-    utxo_manager.add_utxo("genesis", 1, 30.0, "Bob")
-    utxo_manager.add_utxo("genesis", 2, 20.0, "Charlie")
-    utxo_manager.add_utxo("genesis", 3, 10.0, "David")
-    utxo_manager.add_utxo("genesis", 4, 5.0, "Eve")
+    utxo_manager.add_utxo("genesis", 0, 50 * COIN, "Alice")
+    utxo_manager.add_utxo("genesis", 1, 30 * COIN, "Bob")
+    utxo_manager.add_utxo("genesis", 2, 20 * COIN, "Charlie")
+    utxo_manager.add_utxo("genesis", 3, 10 * COIN, "David")
+    utxo_manager.add_utxo("genesis", 4, 5 * COIN, "Eve")
+
+def load_utxo_manager(args):
+    """Builds the starting UTXO set from --snapshot, an existing --db, or the genesis state."""
+    if args.db:
+        manager_cls = functools.partial(SQLiteUTXOManager, args.db, cache_size=args.cache_size)
+    elif args.compact:
+        manager_cls = CompactUTXOManager
+    elif args.sharded:
+        manager_cls = ShardedUTXOManager
+    else:
+        manager_cls = UTXOManager
+    if args.snapshot:
+        try:
+            return load_snapshot(args.snapshot, manager_cls)
+        except (OSError, ValueError) as e: # SnapshotError, or a non-empty --db
+            print(f"Error: Could not load snapshot {args.snapshot}: {e}", file=sys.stderr)
+            sys.exit(1)
+    utxo_manager = manager_cls()
+    # A reopened --db already holds its UTXO set
+    if not len(utxo_manager):
+        add_genesis_utxos(utxo_manager)
+    return utxo_manager
+
+def close_utxo_manager(utxo_manager):
+    """Writes out anything a disk-backed (--db) store still holds in memory."""
+    if isinstance(utxo_manager, SQLiteUTXOManager):
+        utxo_manager.close()
+
+def stream_main(args):
+    utxo_manager = load_utxo_manager(args)
+    mempool = Mempool(replace_by_fee=args.rbf)
+    in_file = sys.stdin if args.stream == "-" else open(args.stream, encoding="utf-8")
+    out_file = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        summary = run_stream(in_file, out_file, mempool, utxo_manager,
+                             max_reorg_depth=args.max_reorg_depth)
+    finally:
+        if in_file is not sys.stdin:
+            in_file.close()
+        if out_file is not sys.stdout:
+            out_file.close()
+
+    if args.save_snapshot:
+        utxo_manager.dump_snapshot(args.save_snapshot)
+    close_utxo_manager(utxo_manager)
+    if args.stats:
+        stats.dump_json(args.stats)
+    print(f"Processed {summary['records']} records: {summary['accepted']} ok, "
+          f"{summary['rejected']} rejected.", file=sys.stderr)
+
+def serve_main(args):
+    utxo_manager = load_utxo_manager(args)
+    node = Node(utxo_manager, Mempool(replace_by_fee=args.rbf))
+    try:
+        asyncio.run(node.serve_forever(args.host, args.serve))
+    except KeyboardInterrupt:
+        print("\nNode stopped.")
+
+    if args.save_snapshot:
+        utxo_manager.dump_snapshot(args.save_snapshot)
+    close_utxo_manager(utxo_manager)
+    if args.stats:
+        stats.dump_json(args.stats)
+
+def main():
+    args = parse_args()
+    if args.stats:
+        stats.enable()
+    if args.stream:
+        stream_main(args)
+        return
+    if args.serve is not None:
+        serve_main(args)
+        return
+
+    mempool = Mempool(replace_by_fee=args.rbf)
+    chain = []
 
     print("\n=== Bitcoin Transaction Simulator ===")
-    print(f"Genesis UTXOs created for Alice, Bob, Charlie, David, and Eve.")
+    reopened = bool(args.db) and os.path.exists(args.db)
+    utxo_manager = load_utxo_manager(args)
+    if args.snapshot:
+        print(f"Loaded {len(utxo_manager)} UTXOs from snapshot {args.snapshot} "
+              f"(commitment {utxo_manager.commitment()}).")
+    elif reopened:
+        print(f"Opened database {args.db} with {len(utxo_manager)} UTXOs.")
+    else:
+        print(f"Genesis UTXOs created for Alice, Bob, Charlie, David, and Eve.")
+    # The index is one more in-memory copy of every coin, which would undo what
+    # --db and --compact save; those stores sort the owner's coins per send instead
+    if isinstance(utxo_manager, (UTXOManager, ShardedUTXOManager)):
+        attach_coin_index(utxo_manager)
 
     while True:
         print("\n--- Main Menu ---")
@@ -47,7 +181,7 @@ def main():
                 print(f"Error: {sender} has no available BTC.")
                 continue
                 
-            print(f"Available balance: {balance} BTC")
+            print(f"Available balance: {format_btc(balance)} BTC")
             recipient = input("Enter recipient name: ")
             
             amount_input = input("Enter amount (e.g., 10.0 BTC): ")
@@ -57,45 +191,17 @@ def main():
                 print("Error: Invalid amount entered.")
                 continue
 
-            sender_utxos = utxo_manager.get_utxos_for_owner(sender)
-            selected_utxo = sender_utxos[0]
-            
-            # --- START OF UPDATED FEE LOGIC ---
-            utxo_amount = Decimal(str(selected_utxo['amount']))
-            
-            # Check how much is left after the transfer amount
-            remainder = utxo_amount - amount
-            
-            # If remainder is zero or negative, we can't pay ANY fee
-            if remainder < 0:
-                print(f"Error: Selected UTXO ({utxo_amount} BTC) is insufficient to pay amount + fee.")
+            try:
+                tx, selection = build_payment(utxo_manager, sender, recipient, amount,
+                                              spent=mempool.spent_utxos)
+            except ValueError as e:
+                print(f"Error: {e}")
                 continue
 
-            target_fee = Decimal('0.001')
+            print(f"Selected {len(selection.coins)} input(s) ({selection.strategy}): "
+                  + ", ".join(f"{format_btc(c[0])} BTC" for c in selection.coins))
+            print(f"Fee: {format_btc(selection.fee)} BTC, change: {format_btc(selection.change)} BTC")
 
-            # If we have enough for the standard fee
-            if remainder >= target_fee:
-                change = remainder - target_fee
-            # If we have less than 0.001 but more than 0, take all remainder as fee
-            else:
-                print(f"Warning: Insufficient funds for full 0.001 fee. Using available remainder ({remainder} BTC) as fee.")
-                change = Decimal('0.0')
-            # --- END OF UPDATED FEE LOGIC ---
-
-            tx = Transaction(
-                sender=sender,
-                recipient=recipient,
-                inputs=[{
-                    "prev_tx": selected_utxo['tx_id'], 
-                    "index": selected_utxo['index'], 
-                    "owner": sender
-                }],
-                outputs=[
-                    {"amount": amount, "address": recipient},
-                    {"amount": change, "address": sender}
-                ]
-            )
-            
             success, msg = mempool.add_transaction(tx, utxo_manager)
             print(msg)
 
@@ -105,7 +211,7 @@ def main():
                 print("No UTXOs exist.")
             else:
                 for (tx_id, idx), data in utxo_manager.utxo_set.items():
-                    print(f"[{tx_id}:{idx}] Owner: {data['owner']} | Amount: {data['amount']} BTC")
+                    print(f"[{tx_id}:{idx}] Owner: {data['owner']} | Amount: {format_btc(data['amount'])} BTC")
 
         elif choice == '3':
             print("\n--- Current Mempool ---")
@@ -113,18 +219,27 @@ def main():
                 print("Mempool is empty.")
             else:
                 for tx in mempool.transactions:
-                    print(f"ID: {tx.tx_id} | {tx.sender} -> {tx.recipient} | Amount: {tx.outputs[0]['amount']} BTC")
+                    print(f"ID: {tx.tx_id} | {tx.sender} -> {tx.recipient} | Amount: {format_btc(tx.outputs[0]['amount'])} BTC")
 
         elif choice == '4':
             miner = input("Enter miner name for reward: ")
-            success = mine_block(miner, mempool, utxo_manager)
-            if not success:
+            block = mine_block(miner, mempool, utxo_manager, prev_block=chain[-1] if chain else None)
+            if block is None:
                 print("Mining failed (likely empty mempool).")
+            else:
+                chain.append(block)
 
         elif choice == '5':
             run_tests()
 
         elif choice == '6':
+            if args.save_snapshot:
+                utxo_manager.dump_snapshot(args.save_snapshot)
+                print(f"Saved {len(utxo_manager)} UTXOs to snapshot {args.save_snapshot} "
+                      f"(commitment {utxo_manager.commitment()}).")
+            close_utxo_manager(utxo_manager)
+            if args.stats:
+                stats.dump_json(args.stats)
             print("Thankyou!")
             sys.exit()
         
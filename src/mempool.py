@@ -1,71 +1,635 @@
-from decimal import Decimal
+import functools
+import heapq
+import itertools
+import threading
+import time
+from contextlib import nullcontext
+from typing import NamedTuple
 from src.validate import Validator
+from src.transaction import WITNESS_SCALE_FACTOR
+from src.template import BlockTemplate, MAX_BLOCK_WEIGHT
+from src.stats import STATS, now
+from src.amount import format_btc
+
+# Block assembly stops after this many packages in a row fail to fit, once the
+# block is within BLOCK_FULL_MARGIN weight units of its limit
+MAX_CONSECUTIVE_FAILURES = 1000
+BLOCK_FULL_MARGIN = 4000
+
+# Default pool limits: total estimated serialized bytes of pending
+# transactions, and how long one may wait unconfirmed (Bitcoin Core's
+# -maxmempool=300 and -mempoolexpiry=336 hours)
+DEFAULT_MAX_BYTES = 300_000_000
+DEFAULT_EXPIRY = 14 * 24 * 3600
+
+# Most pool transactions (conflicts plus their descendants) one replacement
+# may evict, as in BIP 125
+MAX_REPLACEMENT_EVICTIONS = 100
+
+def _locked(method):
+    """Runs a Mempool method under the pool's lock (a no-op unless thread_safe)."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+class MempoolEntry(NamedTuple):
+    """Immutable admission record; everything selection and mining need, resolved once."""
+    tx: object
+    input_values: tuple # Amount of each input, in input order
+    total_in: int       # All amounts in satoshis
+    total_out: int
+    fee: int
+    fee_rate: int       # Satoshis per 1000 estimated bytes
+    size: int           # Estimated serialized size in bytes
+    seq: int            # Arrival order, used to break fee ties
+    time: float         # Admission time on the pool's clock, for expiry
 
 class Mempool:
-    def __init__(self, max_size=50):
-        self.transactions = [] 
-        self.spent_utxos = set() # Tracks UTXOs referenced in mempool to prevent double-spends
+    def __init__(self, max_size=300_000, max_ancestors=25, max_block_weight=MAX_BLOCK_WEIGHT,
+                 thread_safe=False, max_bytes=DEFAULT_MAX_BYTES, expiry=DEFAULT_EXPIRY,
+                 clock=time.monotonic, replace_by_fee=False):
+        # tx_id -> MempoolEntry; dict order doubles as arrival order
+        self.entries = {}
+        # (tx_id, index) -> tx_id of the pool transaction spending it, to catch double-spends
+        self.spent_utxos = {}
+        # Whether a conflicting transaction may replace pool transactions by paying more
+        self.replace_by_fee = replace_by_fee
+        # Limits: once either is exceeded, the lowest fee-rate entries are evicted
         self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.total_bytes = 0 # Sum of entry sizes
+        # Seconds an entry may stay unconfirmed (None: forever), measured on `clock`
+        self.expiry = expiry
+        self.clock = clock
+        # Longest unconfirmed chain (including the tx itself) a new tx may extend
+        self.max_ancestors = max_ancestors
+
+        # Dependency graph between unconfirmed transactions: tx_id -> {tx_id}
+        self.parents = {}
+        self.children = {}
+        # Ancestor package totals (the tx plus all its in-mempool ancestors),
+        # updated incrementally as ancestors are mined
+        self.ancestor_fee = {}
+        self.ancestor_size = {}
+
+        # Fee-ordered indexes with lazy deletion: stale items are skipped on pop
+        self._by_fee_desc = []     # (-fee, seq, tx_id) -> best first, earliest arrival wins ties
+        self._by_fee_rate_asc = [] # (fee_rate, -seq, tx_id) -> eviction order, latest arrival loses ties
+        self._by_time = []         # (time, seq, tx_id) -> oldest first, for expiry
+        # (-ancestor score, seq, tx_id); stale once the tx's ancestor totals change
+        self._by_ancestor_score = []
+        self._seq = itertools.count()
+
+        # Next block's contents, maintained as entries come and go
+        self.template = BlockTemplate(self, max_block_weight)
 
+        # With thread_safe, every method that reads or changes the pool holds
+        # this lock, so checking a transaction's inputs against spent_utxos and
+        # claiming them is atomic: of two conflicting spends submitted from
+        # different threads, exactly one is admitted
+        self.lock = threading.RLock() if thread_safe else nullcontext()
+
+    @property
+    @_locked
+    def transactions(self):
+        """Pending transactions in arrival order."""
+        return [entry.tx for entry in self.entries.values()]
+
+    def __len__(self):
+        return len(self.entries)
+
+    @_locked
     def add_transaction(self, tx, utxo_manager):
         """Validates and adds a transaction to the mempool."""
-        if len(self.transactions) >= self.max_size:
-            self._evict_lowest_fee(utxo_manager)
+        start = now() if STATS.enabled else None
+        self.expire()
 
         # Validate tx (checks signatures, balance, and mempool conflicts)
-        is_valid, msg = Validator.validate_transaction(tx, utxo_manager, self)
-        
+        is_valid, msg, totals = Validator.check_transaction(tx, utxo_manager, self)
+
+        if is_valid:
+            is_valid, msg = self._admit(tx, totals, msg)
+        if start is not None:
+            self._record_admission(is_valid, start)
         if not is_valid:
             return False, msg
+        return True, f"Added to mempool. {msg}"
+
+    def _admit(self, tx, totals, msg):
+        """
+        Inserts a validated transaction, then evicts the lowest fee-rate
+        entries until the pool is back within max_size and max_bytes. A
+        transaction that would itself be evicted, or a replacement, which
+        first evicts the transactions it conflicts with, is checked against
+        the limits beforehand and rejected without changing the pool.
+        """
+        size = tx.size()
+        if size > self.max_bytes:
+            return False, f"Mempool Error: Transaction is {size} bytes, larger than the whole mempool."
+        fee_rate = totals[3] * 1000 // size
+        conflicts = totals[5]
+        replaced = ()
+        if conflicts:
+            replaced, error = self._check_replacement(tx, totals, size)
+            if error:
+                return False, error
+        if not self._survives_trim(size, fee_rate, totals[4], replaced):
+            return False, (f"Mempool Error: Mempool full, fee rate {fee_rate} sat/kB is too low "
+                           f"to displace pending transactions.")
+        if conflicts:
+            for tx_id in conflicts:
+                self.evict_transaction(tx_id)
+            msg += f" Replaced {len(replaced)} transaction(s)."
+            if STATS.enabled:
+                STATS.incr("mempool.replacements")
+                STATS.incr("mempool.replaced_txs", len(replaced))
+        self._insert(tx, totals)
+        if len(self.entries) > self.max_size or self.total_bytes > self.max_bytes:
+            self._trim()
+        return True, msg
+
+    def _survives_trim(self, size, fee_rate, parents, replaced=()):
+        """
+        Dry run of _trim for a transaction about to be inserted once `replaced`
+        is evicted: walks the eviction heap in order (putting every item back)
+        and reports whether the limits are met before the new transaction, or
+        one of its ancestors, would be evicted. Costs O(evictions * log pool).
+        """
+        excess_count = len(self.entries) - len(replaced) + 1 - self.max_size
+        excess_bytes = (self.total_bytes - sum(self.entries[t].size for t in replaced)
+                        + size - self.max_bytes)
+        if excess_count <= 0 and excess_bytes <= 0:
+            return True
+        ancestors = self.get_ancestors(parents) if parents else set()
+        doomed = set(replaced)
+        heap = self._by_fee_rate_asc
+        popped = []
+        try:
+            while excess_count > 0 or excess_bytes > 0:
+                if not heap:
+                    return False
+                item = heapq.heappop(heap)
+                popped.append(item)
+                rate, neg_seq, tx_id = item
+                if tx_id in doomed or not self._is_live(tx_id, -neg_seq):
+                    continue
+                if rate >= fee_rate:
+                    return False # The newcomer comes first (the latest arrival loses ties)
+                victims = (self.get_descendants(tx_id) | {tx_id}) - doomed
+                if not victims.isdisjoint(ancestors):
+                    return False # It would go along with an evicted ancestor
+                doomed |= victims
+                excess_count -= len(victims)
+                excess_bytes -= sum(self.entries[t].size for t in victims)
+            return True
+        finally:
+            for item in popped:
+                heapq.heappush(heap, item)
+
+    def _check_replacement(self, tx, totals, size):
+        """
+        Replace-by-fee rules for a transaction that conflicts with pool
+        entries. It must pay a higher fee rate than each conflicting entry
+        and a higher absolute fee than everything it evicts (the conflicts
+        and their descendants). Costs O(inputs + evicted), not O(pool).
+        Returns (the tx_ids to evict, None) or (None, error message).
+        """
+        fee, parents, conflicts = totals[3], totals[4], totals[5]
+        evicted = set(conflicts)
+        for tx_id in conflicts:
+            evicted |= self.get_descendants(tx_id)
+            if len(evicted) > MAX_REPLACEMENT_EVICTIONS:
+                return None, (f"Mempool Error: Replacement would evict more than "
+                              f"{MAX_REPLACEMENT_EVICTIONS} transactions.")
+        if not evicted.isdisjoint(parents):
+            return None, "Mempool Error: Replacement spends an output of a transaction it would replace."
+
+        fee_rate = fee * 1000 // size
+        best_rate = max(self.entries[tx_id].fee_rate for tx_id in conflicts)
+        if fee_rate <= best_rate:
+            return None, (f"Mempool Error: Replacement fee rate {fee_rate} sat/kB must exceed "
+                          f"{best_rate} sat/kB of the transaction(s) it conflicts with.")
+        evicted_fee = sum(self.entries[tx_id].fee for tx_id in evicted)
+        if fee <= evicted_fee:
+            return None, (f"Mempool Error: Replacement fee {format_btc(fee)} BTC must exceed the "
+                          f"{format_btc(evicted_fee)} BTC paid by the {len(evicted)} transaction(s) it replaces.")
+        return evicted, None
+
+    def _record_admission(self, accepted, start):
+        STATS.observe("mempool.add", now() - start)
+        STATS.incr("mempool.accepted" if accepted else "mempool.rejected")
+        STATS.gauge("mempool.size", len(self.entries))
+
+    def add_transactions(self, batch, utxo_manager, executor=None, chunksize=256):
+        """
+        Admits a burst of transactions, returning one (success, msg) per tx, in order.
+
+        Stateless checks run first, across `executor` (any concurrent.futures
+        executor) when one is given. UTXO and mempool conflicts are then
+        resolved in a single ordered pass, so earlier transactions in the batch
+        win conflicts exactly as with repeated add_transaction calls.
+        """
+        batch = list(batch)
+        if executor is None:
+            prechecked = [Validator.check_stateless(tx) for tx in batch]
+        else:
+            prechecked = executor.map(Validator.check_stateless, batch, chunksize=chunksize)
+        return self._admit_prechecked(batch, prechecked, utxo_manager)
+
+    @_locked
+    def _admit_prechecked(self, batch, prechecked, utxo_manager):
+        # Hot loop: bind the per-transaction callables once for the whole batch
+        check_inputs = Validator.check_inputs
+        admit = self._admit
+
+        start = now() if STATS.enabled else None
+        self.expire()
+        results = []
+        for tx, (is_valid, msg, total_out) in zip(batch, prechecked):
+            if not is_valid:
+                results.append((False, msg))
+                continue
+
+            is_valid, msg, totals = check_inputs(tx, utxo_manager, self, total_out)
+            if is_valid:
+                is_valid, msg = admit(tx, totals, msg)
+            if not is_valid:
+                results.append((False, msg))
+                continue
+            results.append((True, "Added to mempool. " + msg))
+
+        if start is not None:
+            accepted = sum(1 for ok, _ in results if ok)
+            STATS.observe("mempool.add_batch", now() - start)
+            STATS.incr("mempool.accepted", accepted)
+            STATS.incr("mempool.rejected", len(results) - accepted)
+            STATS.gauge("mempool.size", len(self.entries))
+        return results
+
+    def get_unconfirmed_output(self, tx_id, index):
+        """
+        Return {amount, owner} for an output of a pending transaction, or None.
+        Lets children spend outputs of parents that are still in the mempool.
+        """
+        entry = self.entries.get(tx_id)
+        if entry is None or not 0 <= index < len(entry.tx.outputs):
+            return None
+        out = entry.tx.outputs[index]
+        return {"amount": out['amount'], "owner": out['address']}
+
+    def get_ancestors(self, tx_ids):
+        """Returns every in-mempool ancestor of the given transactions, including them."""
+        ancestors = set()
+        stack = list(tx_ids)
+        while stack:
+            tx_id = stack.pop()
+            if tx_id not in ancestors:
+                ancestors.add(tx_id)
+                stack.extend(self.parents[tx_id])
+        return ancestors
+
+    def get_descendants(self, tx_id):
+        """Returns every in-mempool descendant of a transaction (excluding itself)."""
+        descendants = set()
+        stack = list(self.children[tx_id])
+        while stack:
+            child = stack.pop()
+            if child not in descendants:
+                descendants.add(child)
+                stack.extend(self.children[child])
+        return descendants
+
+    def _insert(self, tx, totals):
+        """Records a validated transaction and marks its inputs as pending spent."""
+        input_values, total_in, total_out, fee, parents, _ = totals
+        size = tx.size()
+        tx_id = tx.tx_id
+        entry = MempoolEntry(tx, input_values, total_in, total_out, fee,
+                             fee * 1000 // size, size, next(self._seq), self.clock())
+        self.entries[tx_id] = entry
+        self.total_bytes += size
+        heapq.heappush(self._by_fee_desc, (-fee, entry.seq, tx_id))
+        heapq.heappush(self._by_fee_rate_asc, (entry.fee_rate, -entry.seq, tx_id))
+        heapq.heappush(self._by_time, (entry.time, entry.seq, tx_id))
+
+        # Link into the dependency graph and total up the ancestor package
+        self.parents[tx_id] = set(parents)
+        self.children[tx_id] = set()
+        anc_fee, anc_size = fee, size
+        for parent in parents:
+            self.children[parent].add(tx_id)
+        for ancestor in self.get_ancestors(parents):
+            anc_entry = self.entries[ancestor]
+            anc_fee += anc_entry.fee
+            anc_size += anc_entry.size
+        self.ancestor_fee[tx_id] = anc_fee
+        self.ancestor_size[tx_id] = anc_size
+        self._push_ancestor_score(tx_id)
 
-        self.transactions.append(tx)
-        
-        # Mark inputs as 'pending spent'
+        # Mark inputs as 'pending spent' by this transaction
         for inp in tx.inputs:
             key = (inp['prev_tx'], inp['index'])
-            self.spent_utxos.add(key)
-            
-        return True, f"Added to mempool. {msg}"
+            self.spent_utxos[key] = tx_id
+        self.template.on_add(tx_id)
 
+    @_locked
     def remove_transaction(self, tx_id):
-        """Removes a transaction from the pool (e.g., after mining)."""
-        self.transactions = [t for t in self.transactions if t.tx_id != tx_id]
-
-    def get_top_transactions(self, n, utxo_manager):
-        """Returns top N transactions sorted by fee (descending)."""
-        def calc_fee(tx):
-            total_in = Decimal('0.0')
-            for inp in tx.inputs:
-                if utxo_manager.exists(inp['prev_tx'], inp['index']):
-                    utxo_data = utxo_manager.utxo_set[(inp['prev_tx'], inp['index'])]
-                    # Ensure input value is treated as Decimal
-                    val = Decimal(str(utxo_data["amount"]))
-                    total_in += val
-            
-            # Ensure output values are summed as Decimals
-            total_out = sum(Decimal(str(o['amount'])) for o in tx.outputs)
-            return total_in - total_out
-
-        # Sort by fee desc
-        sorted_txs = sorted(self.transactions, key=calc_fee, reverse=True)
-        return sorted_txs[:n]
-
-    def _evict_lowest_fee(self, utxo_manager):
-        """Removes the lowest fee transaction when full."""
-        if not self.transactions:
+        """
+        Removes a confirmed transaction (e.g., after mining) and releases its inputs.
+        Its descendants stay in the pool; their ancestor totals shrink accordingly.
+        """
+        entry = self.entries.get(tx_id)
+        if entry is None:
             return
 
-        sorted_txs = self.get_top_transactions(len(self.transactions), utxo_manager)
-        worst_tx = sorted_txs[-1] # Last one has lowest fee
-        
-        # Clean up spent_utxos tracker before removing
-        for inp in worst_tx.inputs:
-            key = (inp['prev_tx'], inp['index'])
-            if key in self.spent_utxos:
-                self.spent_utxos.remove(key)
-                
-        self.remove_transaction(worst_tx.tx_id)
+        for descendant in self.get_descendants(tx_id):
+            self.ancestor_fee[descendant] -= entry.fee
+            self.ancestor_size[descendant] -= entry.size
+            self._push_ancestor_score(descendant)
+        self._unlink(tx_id)
+
+    @_locked
+    def remove_block_transactions(self, txs):
+        """
+        Drops the transactions of a block received from elsewhere: those in
+        the pool are removed as confirmed, and pool transactions that spend
+        an output the block spent are evicted with their descendants.
+        Returns the evicted tx_ids.
+        """
+        spent = set()
+        for tx in txs:
+            if tx.tx_id in self.entries:
+                self.remove_transaction(tx.tx_id)
+            else:
+                spent.update((inp['prev_tx'], inp['index']) for inp in tx.inputs)
+        evicted = []
+        for key in spent:
+            spender = self.spent_utxos.get(key)
+            if spender is not None:
+                evicted.extend(self.evict_transaction(spender))
+        return evicted
+
+    @_locked
+    def evict_transaction(self, tx_id):
+        """
+        Drops an unconfirmed transaction together with all its descendants,
+        which would otherwise spend outputs that no longer exist.
+        Returns the removed tx_ids.
+        """
+        if tx_id not in self.entries:
+            return []
+        # Children arrive after their parents, so unlink from the newest down
+        doomed = sorted(self.get_descendants(tx_id) | {tx_id},
+                        key=lambda t: self.entries[t].seq, reverse=True)
+        for victim in doomed:
+            self._unlink(victim)
+        return doomed
+
+    @_locked
+    def reinsert_transactions(self, txs, utxo_manager, invalidated=()):
+        """
+        Returns transactions from a disconnected block to the pool, parents
+        first. Pool transactions spending outputs of `txs` or `invalidated`
+        (e.g. the block's coinbase) are taken out and re-admitted afterwards,
+        so they are re-linked to their parents or dropped if their inputs are
+        gone. Returns the transactions that were not accepted.
+        """
+        created = {(tx.tx_id, i) for tx in itertools.chain(txs, invalidated)
+                   for i in range(len(tx.outputs))}
+        dependents = []
+        spent_utxos = self.spent_utxos
+        spenders = {spent_utxos[key] for key in created if key in spent_utxos}
+        if spenders:
+            affected = set(spenders)
+            for tx_id in spenders:
+                affected |= self.get_descendants(tx_id)
+            dependents = [self.entries[tx_id] for tx_id in affected]
+            dependents.sort(key=lambda entry: entry.seq)
+            for tx_id in spenders:
+                self.evict_transaction(tx_id)
+
+        dropped = []
+        for tx in itertools.chain(txs, (entry.tx for entry in dependents)):
+            ok, _ = self.add_transaction(tx, utxo_manager)
+            if not ok:
+                dropped.append(tx)
+        return dropped
+
+    def _unlink(self, tx_id):
+        """Deletes one entry, its graph edges and its spent markers."""
+        self.template.on_remove(tx_id)
+        entry = self.entries.pop(tx_id)
+        self.total_bytes -= entry.size
+        for inp in entry.tx.inputs:
+            self.spent_utxos.pop((inp['prev_tx'], inp['index']), None)
+
+        for parent in self.parents.pop(tx_id):
+            self.children[parent].discard(tx_id)
+        for child in self.children.pop(tx_id):
+            self.parents[child].discard(tx_id)
+        del self.ancestor_fee[tx_id]
+        del self.ancestor_size[tx_id]
+
+        # Heap items for this tx are now stale; rebuild once they dominate
+        if len(self._by_fee_desc) > 2 * len(self.entries) + 64:
+            self._rebuild_indexes()
+
+    def get_top_transactions(self, n, utxo_manager=None):
+        """Returns top N transactions sorted by fee (descending) in O(N log pool)."""
+        return [entry.tx for entry in self.get_top_entries(n)]
+
+    @_locked
+    def get_top_entries(self, n):
+        """Returns the MempoolEntry records of the top N transactions by fee."""
+        picked = []
+        while self._by_fee_desc and len(picked) < n:
+            item = heapq.heappop(self._by_fee_desc)
+            if self._is_live(item[2], item[1]):
+                picked.append(item)
+
+        # Put the live items back so the index is left unchanged
+        for item in picked:
+            heapq.heappush(self._by_fee_desc, item)
+        return [self.entries[tx_id] for _, _, tx_id in picked]
+
+    def select_block_entries(self, max_txs=None, max_weight=None):
+        """
+        Picks entries for a block by ancestor-package fee rate
+        (child-pays-for-parent), within max_txs transactions and max_weight
+        weight units. A transaction is always preceded by its unconfirmed
+        ancestors, so the result can be applied in order.
+        """
+        return [entry for _, package in self.select_packages(max_txs, max_weight)
+                for entry in package]
+
+    @_locked
+    def select_packages(self, max_txs=None, max_weight=None):
+        """
+        Same selection as select_block_entries, as a list of
+        (package score, [entries]) in inclusion order.
+        """
+        selected = {} # tx_id -> MempoolEntry, in inclusion order
+        packages = []
+        weight = 0
+        failures = 0
+        # Package totals of descendants whose ancestors were already selected
+        modified_fee, modified_size, modified_heap = {}, {}, []
+        popped = []
+
+        def best_candidate():
+            heap = self._by_ancestor_score
+            while heap:
+                item = heap[0]
+                if not self._is_current_score(item):
+                    heapq.heappop(heap) # Stale for good
+                elif item[2] in selected or item[2] in modified_fee:
+                    # Still valid for later selections, just not for this one
+                    popped.append(heapq.heappop(heap))
+                else:
+                    break
+            while modified_heap:
+                neg_score, _, tx_id = modified_heap[0]
+                if (tx_id in selected
+                        or -neg_score != self._score(modified_fee[tx_id], modified_size[tx_id])):
+                    heapq.heappop(modified_heap)
+                else:
+                    break
+
+            # Take the better of the persistent index and the modified packages
+            base = heap[0] if heap else None
+            mod = modified_heap[0] if modified_heap else None
+            if mod is not None and (base is None or mod < base):
+                item = heapq.heappop(modified_heap)
+                return item[2], -item[0]
+            if base is not None:
+                popped.append(heapq.heappop(heap))
+                return base[2], -base[0]
+            return None, None
+
+        while max_txs is None or len(selected) < max_txs:
+            tx_id, score = best_candidate()
+            if tx_id is None:
+                break
+
+            package = [t for t in self.get_ancestors([tx_id]) if t not in selected]
+            package_weight = WITNESS_SCALE_FACTOR * sum(self.entries[t].size for t in package)
+            if ((max_txs is not None and len(selected) + len(package) > max_txs)
+                    or (max_weight is not None and weight + package_weight > max_weight)):
+                # Give up once the block is close to full and nothing has fit for a while
+                failures += 1
+                if (failures > MAX_CONSECUTIVE_FAILURES and max_weight is not None
+                        and weight > max_weight - BLOCK_FULL_MARGIN):
+                    break
+                continue
+            failures = 0
+            weight += package_weight
+            package.sort(key=lambda t: self.entries[t].seq)
+
+            members = []
+            for member in package:
+                entry = self.entries[member]
+                selected[member] = entry
+                members.append(entry)
+                for descendant in self.get_descendants(member):
+                    if descendant in selected:
+                        continue
+                    fee = modified_fee.get(descendant, self.ancestor_fee[descendant]) - entry.fee
+                    size = modified_size.get(descendant, self.ancestor_size[descendant]) - entry.size
+                    modified_fee[descendant] = fee
+                    modified_size[descendant] = size
+                    heapq.heappush(modified_heap, (-self._score(fee, size), self.entries[descendant].seq, descendant))
+            packages.append((score, members))
+
+        # Restore the persistent index for the next selection
+        for item in popped:
+            heapq.heappush(self._by_ancestor_score, item)
+        return packages
+
+    @staticmethod
+    def _score(fee, size):
+        return fee * 1000 // size
+
+    def _push_ancestor_score(self, tx_id):
+        score = self._score(self.ancestor_fee[tx_id], self.ancestor_size[tx_id])
+        heapq.heappush(self._by_ancestor_score, (-score, self.entries[tx_id].seq, tx_id))
+
+    def _is_current_score(self, item):
+        neg_score, seq, tx_id = item
+        return (self._is_live(tx_id, seq)
+                and -neg_score == self._score(self.ancestor_fee[tx_id], self.ancestor_size[tx_id]))
+
+    def _is_live(self, tx_id, seq):
+        entry = self.entries.get(tx_id)
+        return entry is not None and entry.seq == seq
+
+    def _rebuild_indexes(self):
+        self._by_fee_desc = [(-e.fee, e.seq, tx_id) for tx_id, e in self.entries.items()]
+        self._by_fee_rate_asc = [(e.fee_rate, -e.seq, tx_id) for tx_id, e in self.entries.items()]
+        self._by_time = [(e.time, e.seq, tx_id) for tx_id, e in self.entries.items()]
+        self._by_ancestor_score = [
+            (-self._score(self.ancestor_fee[tx_id], self.ancestor_size[tx_id]), e.seq, tx_id)
+            for tx_id, e in self.entries.items()
+        ]
+        heapq.heapify(self._by_fee_desc)
+        heapq.heapify(self._by_fee_rate_asc)
+        heapq.heapify(self._by_time)
+        heapq.heapify(self._by_ancestor_score)
+
+    def _evict_lowest_fee_rate(self):
+        """Removes the lowest fee-rate transaction (and its descendants). Returns the removed tx_ids."""
+        start = now() if STATS.enabled else None
+        while self._by_fee_rate_asc:
+            _, neg_seq, tx_id = heapq.heappop(self._by_fee_rate_asc)
+            if self._is_live(tx_id, -neg_seq):
+                evicted = self.evict_transaction(tx_id)
+                if start is not None:
+                    STATS.observe("mempool.evict", now() - start)
+                    STATS.incr("mempool.evictions", len(evicted))
+                return evicted
+        return []
+
+    def _trim(self):
+        """Evicts by fee rate until the pool is within max_size and max_bytes."""
+        while ((len(self.entries) > self.max_size or self.total_bytes > self.max_bytes)
+               and self._evict_lowest_fee_rate()):
+            pass
+        if STATS.enabled:
+            STATS.gauge("mempool.bytes", self.total_bytes)
+
+    @_locked
+    def expire(self, at=None):
+        """
+        Evicts transactions (and their descendants) that entered the pool more
+        than `expiry` seconds before `at` (default: now on the pool's clock).
+        Only the oldest entries are looked at, so this is cheap to call often.
+        Returns the removed tx_ids.
+        """
+        if self.expiry is None or not self._by_time:
+            return []
+        cutoff = (self.clock() if at is None else at) - self.expiry
+        heap = self._by_time
+        expired = []
+        while heap and heap[0][0] <= cutoff:
+            _, seq, tx_id = heapq.heappop(heap)
+            if self._is_live(tx_id, seq):
+                expired.extend(self.evict_transaction(tx_id))
+        if expired and STATS.enabled:
+            STATS.incr("mempool.expired", len(expired))
+        return expired
 
+    @_locked
     def clear(self):
-        self.transactions = []
-        self.spent_utxos = set()
\ No newline at end of file
+        self.entries = {}
+        self.spent_utxos = {}
+        self.parents = {}
+        self.children = {}
+        self.ancestor_fee = {}
+        self.ancestor_size = {}
+        self.total_bytes = 0
+        self._by_fee_desc = []
+        self._by_fee_rate_asc = []
+        self._by_time = []
+        self._by_ancestor_score = []
+        self.template.invalidate()
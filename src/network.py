@@ -0,0 +1,361 @@
+import heapq
+import itertools
+import random
+from src.block import GENESIS_HASH, mine_block, connect_block, disconnect_block
+from src.coin_selection import build_payment
+from src.mempool import Mempool
+from src.utxo_manager import UTXOManager
+
+# Discrete-event simulation of many nodes in one process.
+#
+# Each SimNode has its own UTXO set, mempool and chain. Nodes only learn about
+# transactions and blocks through messages, which arrive after the link's
+# latency plus payload size / bandwidth:
+#
+#   inv(kind, id)     : "I have this"; sent to every peer after accepting it
+#   getdata(kind, id) : "send it to me"; only for ids not seen or requested yet
+#   tx / block        : the object itself
+#
+# Nodes follow the most-work (here: highest) chain, first seen wins ties, and
+# reorganize with disconnect_block/connect_block when a longer branch arrives.
+# Time is simulated seconds; nothing sleeps, so hours of network time take as
+# long as the validation work they contain.
+
+INV_BYTES = 36 # Type plus 32-byte hash, as in Bitcoin's inv message
+
+
+class Simulator:
+    """A clock and a queue of (time, seq, callback, args) events."""
+
+    def __init__(self):
+        self.now = 0.0
+        self._events = []
+        self._seq = itertools.count()
+        self.processed = 0
+
+    def schedule(self, delay, callback, *args):
+        heapq.heappush(self._events, (self.now + delay, next(self._seq), callback, args))
+
+    def run(self, until):
+        """Processes events in time order until the queue is empty or `until` is reached."""
+        events = self._events
+        while events and events[0][0] <= until:
+            self.now, _, callback, args = heapq.heappop(events)
+            callback(*args)
+            self.processed += 1
+        self.now = max(self.now, until)
+
+
+class SimNode:
+    def __init__(self, node_id, network):
+        self.node_id = node_id
+        self.network = network
+        self.sim = network.sim
+        self.utxo_manager = UTXOManager()
+        # The pool's expiry runs on simulated time
+        self.mempool = Mempool(clock=lambda: self.sim.now)
+        self.peers = {} # SimNode -> (latency seconds, bandwidth bytes/second)
+
+        self.chain = []        # Active chain, this node's own Block copies
+        self.blocks = {}       # block_hash -> Block for every block received or mined
+        self.orphans = {}      # prev_hash -> [Block] waiting for their parent
+        self.seen = set()      # Tx ids and block hashes already received or requested
+
+    @property
+    def tip_hash(self):
+        return self.chain[-1].block_hash if self.chain else GENESIS_HASH
+
+    @property
+    def height(self):
+        return self.chain[-1].height if self.chain else 0
+
+    # --- Messaging ---
+
+    def _send(self, peer, size, handler, *args):
+        latency, bandwidth = self.peers[peer]
+        self.sim.schedule(latency + size / bandwidth, handler, self, *args)
+
+    def _announce(self, kind, object_id, skip=None):
+        for peer in self.peers:
+            if peer is not skip:
+                self._send(peer, INV_BYTES, peer.on_inv, kind, object_id)
+
+    def on_inv(self, peer, kind, object_id):
+        if object_id in self.seen:
+            return
+        self.seen.add(object_id)
+        self._send(peer, INV_BYTES, peer.on_getdata, kind, object_id)
+
+    def on_getdata(self, peer, kind, object_id):
+        if kind == "tx":
+            entry = self.mempool.entries.get(object_id)
+            if entry is not None: # It may have been mined or evicted meanwhile
+                self._send(peer, entry.size, peer.on_tx, entry.tx)
+        else:
+            block = self.blocks.get(object_id)
+            if block is not None:
+                self._send(peer, block.weight // 4, peer.on_block, block)
+
+    # --- Transactions ---
+
+    def submit(self, tx):
+        """A local wallet hands in a new transaction."""
+        self.seen.add(tx.tx_id)
+        self.on_tx(None, tx)
+
+    def on_tx(self, peer, tx):
+        ok, _ = self.mempool.add_transaction(tx, self.utxo_manager)
+        if ok:
+            self.network.record_tx(tx.tx_id, self)
+            self._announce("tx", tx.tx_id, skip=peer)
+
+    # --- Blocks ---
+
+    def mine(self, miner_address):
+        block = mine_block(miner_address, self.mempool, self.utxo_manager, verbose=False,
+                           prev_block=self.chain[-1] if self.chain else None)
+        if block is None:
+            return None # Nothing to mine; the simulator does not produce empty blocks
+        self.chain.append(block)
+        self.blocks[block.block_hash] = block
+        self.seen.add(block.block_hash)
+        self.network.record_block(block, self, mined=True)
+        self._announce("block", block.block_hash)
+        return block
+
+    def on_block(self, peer, block):
+        if block.block_hash in self.blocks:
+            return
+        self.blocks[block.block_hash] = block
+        if block.prev_hash != GENESIS_HASH and block.prev_hash not in self.blocks:
+            # Arrived before its parent; ask the sender for the parent too
+            self.orphans.setdefault(block.prev_hash, []).append(block)
+            self.network.counters["orphans"] += 1
+            if block.prev_hash not in self.seen:
+                self.seen.add(block.prev_hash)
+                self._send(peer, INV_BYTES, peer.on_getdata, "block", block.prev_hash)
+            return
+
+        pending = [block]
+        while pending:
+            block = pending.pop()
+            if block.height > self.height and self._activate(block):
+                self.network.record_block(block, self)
+                self._announce("block", block.block_hash, skip=peer)
+            pending.extend(self.orphans.pop(block.block_hash, ()))
+
+    def _branch(self, block):
+        """Blocks from the fork point with the active chain up to `block`, oldest first."""
+        active = {b.block_hash: i for i, b in enumerate(self.chain)}
+        branch = []
+        while block is not None and block.block_hash not in active:
+            branch.append(block)
+            block = self.blocks.get(block.prev_hash)
+        fork = active[block.block_hash] + 1 if block is not None else 0
+        branch.reverse()
+        return fork, branch
+
+    def _activate(self, block):
+        """Makes `block` the tip, reorganizing if it is on another branch. False if invalid."""
+        fork, branch = self._branch(block)
+        if branch[0].prev_hash != (self.chain[fork - 1].block_hash if fork else GENESIS_HASH):
+            return False # Branch does not reach a known block
+        old = self.chain[fork:]
+        for stale in reversed(old):
+            disconnect_block(stale, self.mempool, self.utxo_manager, verbose=False)
+        del self.chain[fork:]
+        if old:
+            self.network.counters["reorgs"] += 1
+
+        for new in branch:
+            local, _ = connect_block(new, self.mempool, self.utxo_manager, verbose=False)
+            if local is None:
+                # Invalid branch: drop it and go back to the old chain
+                for connected in reversed(self.chain[fork:]):
+                    disconnect_block(connected, self.mempool, self.utxo_manager, verbose=False)
+                del self.chain[fork:]
+                for stale in old:
+                    local, _ = connect_block(stale, self.mempool, self.utxo_manager, verbose=False)
+                    self.chain.append(local)
+                del self.blocks[new.block_hash]
+                self.network.counters["invalid_blocks"] += 1
+                return False
+            self.chain.append(local)
+            self.blocks[local.block_hash] = local
+        return True
+
+
+# Topologies take (num_nodes, rng, degree) and return (a, b) links; only
+# random_topology uses the degree.
+
+def ring_topology(n, rng, degree=2):
+    return [(i, (i + 1) % n) for i in range(n)] if n > 2 else [(0, 1)] if n == 2 else []
+
+
+def random_topology(n, rng, degree=4):
+    """A ring (so the graph is connected) plus random links up to about `degree` peers per node."""
+    edges = {tuple(sorted(e)) for e in ring_topology(n, rng)}
+    target = max(len(edges), n * degree // 2)
+    while len(edges) < min(target, n * (n - 1) // 2):
+        a, b = rng.sample(range(n), 2)
+        edges.add((min(a, b), max(a, b)))
+    return sorted(edges)
+
+
+def full_topology(n, rng, degree=None):
+    return [(a, b) for a in range(n) for b in range(a + 1, n)]
+
+
+TOPOLOGIES = {
+    "ring": ring_topology,
+    "random": random_topology,
+    "full": full_topology,
+}
+
+
+def _percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {}
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+    return {"p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99), "max": values[-1]}
+
+
+class Network:
+    """
+    `num_nodes` nodes linked by `topology` (a name from TOPOLOGIES, with
+    `degree` peers per node on average for "random", or a list of (a, b)
+    pairs), each link with a latency drawn from `latency` (min, max)
+    seconds and `bandwidth` bytes per second. Every node starts from the
+    same genesis UTXO set: `num_wallets` wallets holding `coins_per_wallet`
+    outputs of `coin_amount` satoshis each.
+    """
+
+    def __init__(self, num_nodes=20, topology="random", degree=4, latency=(0.05, 0.3), bandwidth=1_000_000,
+                 num_wallets=200, coins_per_wallet=5, coin_amount=10 * 10**8, seed=42):
+        self.rng = random.Random(seed)
+        self.sim = Simulator()
+        self.nodes = [SimNode(i, self) for i in range(num_nodes)]
+        edges = TOPOLOGIES[topology](num_nodes, self.rng, degree) if isinstance(topology, str) else topology
+        for a, b in edges:
+            link = (self.rng.uniform(*latency), bandwidth)
+            self.nodes[a].peers[self.nodes[b]] = link
+            self.nodes[b].peers[self.nodes[a]] = link
+
+        self.wallets = [f"wallet_{i}" for i in range(num_wallets)]
+        for node in self.nodes:
+            for w, owner in enumerate(self.wallets):
+                for c in range(coins_per_wallet):
+                    node.utxo_manager.add_utxo("genesis", w * coins_per_wallet + c, coin_amount, owner)
+
+        self.tx_seen = {}    # tx_id -> [first seen time, nodes that accepted it]
+        self.block_seen = {} # block_hash -> [mined time, nodes that made it their tip]
+        self.mined = []      # (time, node_id, Block) for every block mined
+        self.tx_delays = []
+        self.block_delays = []
+        self.counters = {"submitted": 0, "unfunded": 0, "orphans": 0, "reorgs": 0,
+                         "invalid_blocks": 0, "empty_rounds": 0}
+        self._arrivals = False
+
+    # --- Bookkeeping called by nodes ---
+
+    def record_tx(self, tx_id, node):
+        seen = self.tx_seen.get(tx_id)
+        if seen is None:
+            self.tx_seen[tx_id] = [self.sim.now, 1]
+        else:
+            seen[1] += 1
+            self.tx_delays.append(self.sim.now - seen[0])
+
+    def record_block(self, block, node, mined=False):
+        if mined:
+            self.block_seen[block.block_hash] = [self.sim.now, 1]
+            self.mined.append((self.sim.now, node.node_id, block))
+        else:
+            seen = self.block_seen[block.block_hash]
+            seen[1] += 1
+            self.block_delays.append(self.sim.now - seen[0])
+
+    # --- Arrival processes ---
+
+    def _wallet_arrival(self, rate, fee_rates):
+        if not self._arrivals:
+            return
+        node = self.rng.choice(self.nodes)
+        sender, recipient = self.rng.sample(self.wallets, 2)
+        balance = node.utxo_manager.get_balance(sender)
+        self.counters["submitted"] += 1
+        try:
+            tx, _ = build_payment(node.utxo_manager, sender, recipient,
+                                  max(1, int(balance * self.rng.uniform(0.01, 0.5))),
+                                  fee_rate=self.rng.randint(*fee_rates),
+                                  spent=node.mempool.spent_utxos)
+        except ValueError:
+            self.counters["unfunded"] += 1 # Every confirmed coin of the wallet is already pending
+        else:
+            node.submit(tx)
+        self.sim.schedule(self.rng.expovariate(rate), self._wallet_arrival, rate, fee_rates)
+
+    def _block_arrival(self, interval, miners, weights):
+        if not self._arrivals:
+            return
+        node = self.rng.choices(miners, weights)[0]
+        if node.mine(f"miner_{node.node_id}") is None:
+            self.counters["empty_rounds"] += 1
+        self.sim.schedule(self.rng.expovariate(1 / interval), self._block_arrival,
+                          interval, miners, weights)
+
+    def run(self, duration, tx_rate=2.0, block_interval=600.0, miners=None,
+            fee_rates=(1_000, 100_000)):
+        """
+        Simulates `duration` seconds: wallets submit about `tx_rate`
+        transactions per second to random nodes, and a block is found every
+        `block_interval` seconds on average by one of `miners` ({node_id:
+        hash share}, default: every node equally). Returns report().
+        """
+        miners = miners or {node.node_id: 1.0 for node in self.nodes}
+        miner_nodes = [self.nodes[i] for i in miners]
+        self._arrivals = True
+        self.sim.schedule(self.rng.expovariate(tx_rate), self._wallet_arrival, tx_rate, fee_rates)
+        self.sim.schedule(self.rng.expovariate(1 / block_interval), self._block_arrival,
+                          block_interval, miner_nodes, list(miners.values()))
+        self.sim.run(self.sim.now + duration)
+        self._arrivals = False
+        return self.report()
+
+    def settle(self, duration=600.0):
+        """Lets messages still in flight arrive, with no new transactions or blocks. Returns report()."""
+        self.sim.run(self.sim.now + duration)
+        return self.report()
+
+    def report(self):
+        nodes = self.nodes
+        best = max(nodes, key=lambda n: n.height)
+        best_chain = {b.block_hash for b in best.chain}
+        stale = sum(1 for _, _, block in self.mined if block.block_hash not in best_chain)
+        tips = {n.tip_hash for n in nodes}
+        pools = [set(n.mempool.entries) for n in nodes]
+        union = set().union(*pools)
+        in_all = set.intersection(*pools) if pools else set()
+        n = len(nodes)
+        return {
+            "sim_seconds": self.sim.now,
+            "events": self.sim.processed,
+            "nodes": n,
+            "links": sum(len(node.peers) for node in nodes) // 2,
+            "counters": dict(self.counters),
+            "transactions": len(self.tx_seen),
+            "tx_fully_propagated": sum(1 for _, count in self.tx_seen.values() if count == n),
+            "tx_propagation_s": _percentiles(self.tx_delays),
+            "blocks_mined": len(self.mined),
+            "stale_blocks": stale,
+            "stale_rate": stale / len(self.mined) if self.mined else 0.0,
+            "block_propagation_s": _percentiles(self.block_delays),
+            "best_height": best.height,
+            "distinct_tips": len(tips),
+            # Nodes on the same tip must also hold the same UTXO set
+            "distinct_utxo_sets": len({(n.tip_hash, n.utxo_manager.commitment()) for n in nodes}),
+            "mempool_sizes": _percentiles([len(p) for p in pools]),
+            # Share of pending transactions that some node is missing
+            "mempool_divergence": 1 - len(in_all) / len(union) if union else 0.0,
+        }
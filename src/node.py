@@ -0,0 +1,255 @@
+import asyncio
+import json
+from contextlib import suppress
+from src.amount import to_satoshis, format_btc, is_valid_amount
+from src.block import mine_block
+from src.history import AddressHistory
+from src.stats import Histogram, now
+from src.stream import build_transaction
+
+# Local node service: newline-delimited JSON over TCP. Each request is one JSON
+# object per line; each response echoes the request's "id".
+#
+#   {"id": 1, "op": "tx", "sender", "recipient", "inputs", "outputs"}   (as in --stream)
+#   {"id": 2, "op": "balance", "owner": "Alice"}
+#   {"id": 3, "op": "utxos", "owner": "Alice"}
+#   {"id": 4, "op": "utxo", "tx_id", "index", "amount", "owner"}
+#   {"id": 5, "op": "mine", "miner": "Miner_1", "max_txs": 3}         (max_txs optional)
+#   {"id": 6, "op": "metrics"}
+#   {"id": 7, "op": "history", "owner": "Alice", "offset": 0, "limit": 50}  (newest first)
+#   {"id": 8, "op": "history", "owner": "Alice", "since": 10}   (received at height >= 10)
+#
+# Clients may pipeline requests; responses are written as they complete.
+# Transactions from every connection share one bounded queue. A single
+# admitter drains it in batches through Mempool.add_transactions, so
+# submissions that arrive close together are admitted together. Once the queue
+# is full, or a connection has max_inflight requests outstanding, the server
+# stops reading from that socket and TCP pushes back on the client.
+
+class Node:
+    def __init__(self, utxo_manager, mempool, max_batch=256, batch_window=0.002,
+                 max_pending=10_000, max_inflight=64):
+        self.utxo_manager = utxo_manager
+        self.mempool = mempool
+        self.max_batch = max_batch
+        self.batch_window = batch_window # Seconds a lone submission waits for company
+        self.max_pending = max_pending
+        self.max_inflight = max_inflight
+        self.chain = []
+        self.history = AddressHistory() # Filled from every block this node mines
+        self.latency = {} # op -> Histogram of request latency, queueing included
+        self.counters = {"requests": 0, "errors": 0, "batches": 0, "batched_txs": 0}
+        self.server = None
+        self._queue = None
+        self._admitter = None
+        self._clients = {} # Connection handler task -> its StreamReader
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Starts listening and returns the bound (host, port)."""
+        self._queue = asyncio.Queue(self.max_pending)
+        self._admitter = asyncio.create_task(self._admit_loop())
+        self.server = await asyncio.start_server(self._handle_client, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self, host="127.0.0.1", port=0):
+        host, port = await self.start(host, port)
+        print(f"Node listening on {host}:{port}")
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        self.server.close()
+        # End every connection's read loop; requests already read are still answered
+        for reader in self._clients.values():
+            reader.feed_eof()
+        self._admitter.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._admitter
+        # Submissions the admitter will never reach must still be answered
+        pending = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        _fail(pending, RuntimeError("Node is shutting down"))
+        await asyncio.gather(*self._clients, return_exceptions=True)
+        await self.server.wait_closed()
+
+    # --- Connections ---
+
+    async def _handle_client(self, reader, writer):
+        inflight = asyncio.Semaphore(self.max_inflight)
+        write_lock = asyncio.Lock()
+        tasks = set()
+        overrun = None
+        self._clients[asyncio.current_task()] = reader
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError) as e:
+                    # Longer than the reader's limit: its id is unreadable and the
+                    # stream has lost its framing, so answer once and hang up
+                    overrun = e
+                    break
+                if not line:
+                    break
+                await inflight.acquire()
+                task = asyncio.create_task(self._serve(line, writer, write_lock, inflight))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except ConnectionError:
+            pass
+        finally:
+            # Requests already read are answered (or find the client gone) before closing
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            if overrun is not None:
+                self.counters["requests"] += 1
+                self.counters["errors"] += 1
+                await self._send(writer, write_lock,
+                                 {"id": None, "ok": False, "msg": f"Invalid request: {overrun}"})
+            del self._clients[asyncio.current_task()]
+            writer.close()
+
+    async def _serve(self, line, writer, write_lock, inflight):
+        start = now()
+        op = None
+        try:
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("expected a JSON object")
+            except ValueError as e:
+                response = {"id": None, "ok": False, "msg": f"Invalid request: {e}"}
+            else:
+                op = record.get("op")
+                try:
+                    response = await self.handle(record)
+                except (KeyError, TypeError, ValueError) as e:
+                    response = {"ok": False, "msg": f"Malformed {op!r} request: {e!r}"}
+                except Exception as e:
+                    # A pipelining client waits for every id, so a bug must still be answered
+                    response = {"ok": False, "msg": f"Internal error handling {op!r} request: {e!r}"}
+                response = {"id": record.get("id"), **response}
+        finally:
+            inflight.release()
+
+        self.counters["requests"] += 1
+        if not response["ok"]:
+            self.counters["errors"] += 1
+        name = op if isinstance(op, str) else "invalid"
+        hist = self.latency.get(name)
+        if hist is None:
+            hist = self.latency[name] = Histogram()
+        hist.observe(now() - start)
+        await self._send(writer, write_lock, response)
+
+    async def _send(self, writer, write_lock, response):
+        async with write_lock:
+            try:
+                writer.write(json.dumps(response, separators=(",", ":")).encode() + b"\n")
+                await writer.drain()
+            except ConnectionError:
+                pass # Client went away; nothing left to tell it
+
+    # --- Requests ---
+
+    async def handle(self, record):
+        """Executes one request and returns the response fields."""
+        op = record.get("op")
+        if op == "tx":
+            tx = build_transaction(record)
+            future = asyncio.get_running_loop().create_future()
+            await self._queue.put((tx, future))
+            ok, msg = await future
+            return {"ok": ok, "tx_id": tx.tx_id if ok else None, "msg": msg}
+
+        if op == "balance":
+            return {"ok": True, "balance": format_btc(self.utxo_manager.get_balance(record["owner"]))}
+
+        if op == "utxos":
+            utxos = [{"tx_id": u["tx_id"], "index": u["index"], "amount": format_btc(u["amount"])}
+                     for u in self.utxo_manager.get_utxos_for_owner(record["owner"])]
+            return {"ok": True, "utxos": utxos}
+
+        if op == "utxo":
+            amount = to_satoshis(record["amount"])
+            if not is_valid_amount(amount):
+                return {"ok": False, "msg": f"Invalid amount {record['amount']!r}: must be 0 to 21 million BTC"}
+            self.utxo_manager.add_utxo(record["tx_id"], int(record["index"]), amount, record["owner"])
+            return {"ok": True}
+
+        if op == "mine":
+            block = mine_block(record["miner"], self.mempool, self.utxo_manager,
+                               num_txs=int(record["max_txs"]) if "max_txs" in record else None,
+                               verbose=False, prev_block=self.chain[-1] if self.chain else None)
+            if block is None:
+                return {"ok": False, "msg": "Mempool empty, nothing to mine."}
+            self.chain.append(block)
+            self.history.add_block(block)
+            return {"ok": True, "height": block.height, "block_hash": block.block_hash,
+                    "txs": len(block.transactions), "fees": format_btc(block.fees),
+                    "utxo_commitment": block.utxo_commitment}
+
+        if op == "history":
+            owner = record["owner"]
+            if "since" in record:
+                entries = self.history.received_since(owner, int(record["since"]))
+            else:
+                entries = self.history.get_history(owner, int(record.get("offset", 0)),
+                                                   int(record.get("limit", 50)))
+            return {"ok": True, "count": self.history.count(owner),
+                    "history": [{"tx_id": e.tx_id, "height": e.height, "direction": e.direction,
+                                 "amount": format_btc(e.amount)} for e in entries]}
+
+        if op == "metrics":
+            return {"ok": True, **self.metrics()}
+
+        return {"ok": False, "msg": f"Unknown op {op!r}"}
+
+    def metrics(self):
+        return {
+            "counters": dict(self.counters),
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "mempool_size": len(self.mempool),
+            "mempool_bytes": self.mempool.total_bytes,
+            "utxo_count": len(self.utxo_manager),
+            "utxo_commitment": self.utxo_manager.commitment(),
+            "height": self.chain[-1].height if self.chain else 0,
+            "latency": {op: h.summary() for op, h in sorted(self.latency.items())},
+            **({"utxo_cache": self.utxo_manager.cache_stats()}
+               if hasattr(self.utxo_manager, "cache_stats") else {}),
+        }
+
+    # --- Batched admission ---
+
+    async def _admit_loop(self):
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            if queue.empty() and self.batch_window:
+                # Let submissions already on their way join this batch
+                try:
+                    await asyncio.sleep(self.batch_window)
+                except asyncio.CancelledError:
+                    _fail(batch, RuntimeError("Node is shutting down"))
+                    raise
+            while len(batch) < self.max_batch and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            try:
+                results = self.mempool.add_transactions([tx for tx, _ in batch], self.utxo_manager)
+            except Exception as e:
+                _fail(batch, e)
+                continue
+            self.counters["batches"] += 1
+            self.counters["batched_txs"] += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+def _fail(batch, error):
+    """Fails every still-waiting (tx, future) submission in batch with error."""
+    for _, future in batch:
+        if not future.done():
+            future.set_exception(error)
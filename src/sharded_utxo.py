@@ -0,0 +1,233 @@
+import sys
+import threading
+from collections.abc import Mapping
+from src import snapshot
+from src.commitment import COMMITMENT_MASK, utxo_hash, compute_commitment, format_commitment
+
+
+class _ShardedUTXOSetView(Mapping):
+    """Read-only (tx_id, index) -> {amount, owner} view across all shards."""
+
+    def __init__(self, manager):
+        self._manager = manager
+
+    def __getitem__(self, key):
+        data = self._manager.get_utxo(key[0], key[1])
+        if data is None:
+            raise KeyError(key)
+        return data
+
+    def __contains__(self, key):
+        return self._manager.exists(key[0], key[1])
+
+    def __iter__(self):
+        m = self._manager
+        for shard, lock in zip(m._shards, m._shard_locks):
+            with lock:
+                keys = list(shard)
+            yield from keys
+
+    def __len__(self):
+        return len(self._manager)
+
+
+class ShardedUTXOManager:
+    """
+    Thread-safe UTXO set with the same API as UTXOManager.
+
+    Outpoints are spread over `num_shards` dicts by hash, and owners (their
+    index and running balance) over as many owner shards, each shard with its
+    own lock. A writer locks the outpoint shard and then one owner shard at a
+    time, always in that order, so writers cannot deadlock and writers on
+    different shards never wait for each other. Point reads (get_balance,
+    get_utxo, exists) take no lock: a single dict lookup is atomic, and
+    entries and balances are replaced rather than mutated in place.
+    """
+
+    def __init__(self, num_shards=16):
+        self.num_shards = num_shards
+        # (tx_id, index) -> {amount (satoshis), owner}
+        self._shards = [{} for _ in range(num_shards)]
+        self._shard_locks = [threading.Lock() for _ in range(num_shards)]
+        # owner -> {(tx_id, index): None} and owner -> balance, sharded by owner
+        self._owner_index = [{} for _ in range(num_shards)]
+        self._balances = [{} for _ in range(num_shards)]
+        self._owner_locks = [threading.Lock() for _ in range(num_shards)]
+        # Optional amount-sorted CoinIndex, see coin_selection.attach_coin_index.
+        # Updated under the owner lock, since an owner's coins live in one list.
+        self.coin_index = None
+        # Per outpoint shard, the sum of its UTXOs' hashes (see src/commitment.py),
+        # updated under that shard's lock
+        self._commitments = [0] * num_shards
+
+        self.utxo_set = _ShardedUTXOSetView(self)
+
+    def _shard_of(self, key):
+        return hash(key) % self.num_shards
+
+    def _credit(self, owner, key, amount):
+        n = hash(owner) % self.num_shards
+        with self._owner_locks[n]:
+            self._owner_index[n].setdefault(owner, {})[key] = None
+            balances = self._balances[n]
+            balances[owner] = balances.get(owner, 0) + amount
+            if self.coin_index is not None:
+                self.coin_index.add(owner, amount, key[0], key[1])
+
+    def _debit(self, owner, key, amount):
+        n = hash(owner) % self.num_shards
+        with self._owner_locks[n]:
+            index, balances = self._owner_index[n], self._balances[n]
+            if self.coin_index is not None:
+                self.coin_index.remove(owner, amount, key[0], key[1])
+            owned = index[owner]
+            del owned[key]
+            if owned:
+                balances[owner] -= amount
+            else:
+                # Drop empty owners so the index does not grow without bound
+                del index[owner]
+                del balances[owner]
+
+    def add_utxo(self, tx_id: str, index: int, amount: int, owner: str):
+        """
+        Add a new UTXO to the set. Amount is in integer satoshis.
+        """
+        if type(amount) is not int:
+            raise TypeError(f"UTXO amount must be integer satoshis, got {type(amount).__name__}")
+        key = (tx_id, index)
+        n = self._shard_of(key)
+        with self._shard_locks[n]:
+            shard = self._shards[n]
+            # Overwriting an existing outpoint must not leave it counted twice
+            old = shard.get(key)
+            commitment = self._commitments[n]
+            if old is not None:
+                self._debit(old["owner"], key, old["amount"])
+                commitment -= utxo_hash(tx_id, index, old["amount"], old["owner"])
+            shard[key] = {"amount": amount, "owner": owner}
+            self._credit(owner, key, amount)
+            self._commitments[n] = (commitment + utxo_hash(tx_id, index, amount, owner)) & COMMITMENT_MASK
+
+    def remove_utxo(self, tx_id: str, index: int):
+        """
+        Remove a UTXO (when spent).
+        """
+        key = (tx_id, index)
+        n = self._shard_of(key)
+        with self._shard_locks[n]:
+            data = self._shards[n].pop(key, None)
+            if data is not None:
+                self._debit(data["owner"], key, data["amount"])
+                self._commitments[n] = (self._commitments[n] - utxo_hash(
+                    tx_id, index, data["amount"], data["owner"])) & COMMITMENT_MASK
+
+    def get_balance(self, owner: str) -> int:
+        """
+        Return the total balance in satoshis for an address.
+        """
+        return self._balances[hash(owner) % self.num_shards].get(owner, 0)
+
+    def get_utxo(self, tx_id: str, index: int):
+        """
+        Return {amount, owner} for an unspent output, or None if missing.
+        """
+        key = (tx_id, index)
+        return self._shards[hash(key) % self.num_shards].get(key)
+
+    def exists(self, tx_id: str, index: int) -> bool:
+        """
+        Check if UTXO exists and is unspent.
+        """
+        key = (tx_id, index)
+        return key in self._shards[hash(key) % self.num_shards]
+
+    def get_utxos_for_owner(self, owner: str) -> list:
+        """
+        Get all UTXOs owned by an address.
+        """
+        n = hash(owner) % self.num_shards
+        with self._owner_locks[n]:
+            keys = list(self._owner_index[n].get(owner, ()))
+
+        owned_utxos = []
+        for tx_id, index in keys:
+            data = self.get_utxo(tx_id, index)
+            if data is None:
+                continue # Spent since the index was read
+            owned_utxos.append({
+                "tx_id": tx_id,
+                "index": index,
+                "amount": data["amount"],
+                "owner": data["owner"]
+            })
+        return owned_utxos
+
+    def commitment(self) -> str:
+        """
+        Order-independent hash of the whole set: the shards' sums added together.
+        Only a consistent snapshot while no writer is running.
+        """
+        return format_commitment(sum(self._commitments) & COMMITMENT_MASK)
+
+    def __len__(self):
+        return sum(len(shard) for shard in self._shards)
+
+    def iter_utxos(self):
+        """Yields (tx_id, index, amount, owner) for every unspent output."""
+        for shard, lock in zip(self._shards, self._shard_locks):
+            with lock:
+                items = list(shard.items())
+            for (tx_id, index), data in items:
+                yield tx_id, index, data["amount"], data["owner"]
+
+    def dump_snapshot(self, path):
+        """Writes a versioned, checksummed binary snapshot of the set to `path`."""
+        snapshot.dump_snapshot(self, path)
+
+    @classmethod
+    def load_snapshot(cls, path):
+        """Builds a new manager from a snapshot written by dump_snapshot."""
+        return snapshot.load_snapshot(path, cls)
+
+    def _restore_columns(self, txids, owners, col_txid, col_index, col_amount, col_owner):
+        """Bulk-fills an empty manager from decoded snapshot columns (no locking needed yet)."""
+        n_shards = self.num_shards
+        for tid, index, amount, oid in zip(col_txid, col_index, col_amount, col_owner):
+            key = (txids[tid], index)
+            owner = owners[oid]
+            self._shards[hash(key) % n_shards][key] = {"amount": amount, "owner": owner}
+            n = hash(owner) % n_shards
+            self._owner_index[n].setdefault(owner, {})[key] = None
+            balances = self._balances[n]
+            balances[owner] = balances.get(owner, 0) + amount
+        for n, shard in enumerate(self._shards):
+            self._commitments[n] = compute_commitment(
+                (tx_id, index, data["amount"], data["owner"]) for (tx_id, index), data in shard.items())
+
+    def memory_usage(self) -> dict:
+        """
+        Approximate bytes held by the shards and owner indexes.
+        """
+        table_bytes = entry_bytes = index_bytes = 0
+        for shard in self._shards:
+            table_bytes += sys.getsizeof(shard)
+            for key, data in list(shard.items()):
+                entry_bytes += sys.getsizeof(key) + sys.getsizeof(data) + sys.getsizeof(data["amount"])
+        for index, balances in zip(self._owner_index, self._balances):
+            index_bytes += sys.getsizeof(index) + sys.getsizeof(balances)
+            for owned in list(index.values()):
+                index_bytes += sys.getsizeof(owned)
+
+        total = table_bytes + entry_bytes + index_bytes
+        count = len(self)
+        return {
+            "backend": "sharded",
+            "utxos": count,
+            "shards": self.num_shards,
+            "table_bytes": table_bytes,
+            "entry_bytes": entry_bytes,
+            "index_bytes": index_bytes,
+            "total_bytes": total,
+            "bytes_per_utxo": total / count if count else 0.0
+        }
@@ -0,0 +1,138 @@
+import gc
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+# File layout (all integers little-endian):
+#   header   : magic, version, flags, txid count, owner count, utxo count
+#   strings  : txid table then owner table, each entry u16 length + UTF-8 bytes
+#   columns  : txid ids (u32), output indexes (u32), amounts (i64), owner ids (u32)
+#   trailer  : SHA-256 of everything above
+# Columns are stored whole so loading is a straight copy into typed arrays.
+SNAPSHOT_MAGIC = b"UTXOSNAP"
+SNAPSHOT_VERSION = 1
+_HEADER = struct.Struct("<8sHHIIQ")
+_STR_LEN = struct.Struct("<H")
+_CHECKSUM_SIZE = 32
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot file is truncated, corrupt or of an unknown version."""
+
+
+def _column_bytes(col):
+    if sys.byteorder == "big":
+        col = array(col.typecode, col)
+        col.byteswap()
+    return col.tobytes()
+
+
+def _column_from(typecode, buf):
+    col = array(typecode)
+    col.frombytes(buf)
+    if sys.byteorder == "big":
+        col.byteswap()
+    return col
+
+
+def dump_snapshot(utxo_manager, path):
+    """
+    Writes the UTXO set to `path` as a versioned, checksummed binary snapshot.
+    The file is written to a temporary name and renamed, so a crash never
+    leaves a half-written snapshot behind.
+    """
+    txids, txid_ids = [], {}
+    owners, owner_ids = [], {}
+    col_txid, col_index = array('I'), array('I')
+    col_amount, col_owner = array('q'), array('I')
+
+    for tx_id, index, amount, owner in utxo_manager.iter_utxos():
+        tid = txid_ids.get(tx_id)
+        if tid is None:
+            tid = txid_ids[tx_id] = len(txids)
+            txids.append(tx_id)
+        oid = owner_ids.get(owner)
+        if oid is None:
+            oid = owner_ids[owner] = len(owners)
+            owners.append(owner)
+        col_txid.append(tid)
+        col_index.append(index)
+        col_amount.append(amount)
+        col_owner.append(oid)
+
+    digest = hashlib.sha256()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        def write(chunk):
+            digest.update(chunk)
+            f.write(chunk)
+
+        write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0,
+                           len(txids), len(owners), len(col_txid)))
+        for s in txids + owners:
+            raw = s.encode("utf-8")
+            write(_STR_LEN.pack(len(raw)) + raw)
+        for col in (col_txid, col_index, col_amount, col_owner):
+            write(_column_bytes(col))
+        f.write(digest.digest())
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path, manager_cls):
+    """
+    Maps a snapshot file, verifies its checksum and returns a new
+    `manager_cls` instance restored from it.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < _HEADER.size + _CHECKSUM_SIZE:
+            raise SnapshotError("Snapshot is truncated.")
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    with mm:
+        checksum = mm[-_CHECKSUM_SIZE:]
+        # Every view into the map must be released before it can be closed
+        with memoryview(mm) as view, view[:-_CHECKSUM_SIZE] as body:
+            txids, owners, columns = _decode(body, checksum)
+
+    # Bulk restore allocates millions of objects that all stay alive, so
+    # cyclic GC passes over them are pure overhead
+    manager = manager_cls()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        manager._restore_columns(txids, owners, *columns)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return manager
+
+
+def _decode(body, checksum):
+    magic, version, _flags, n_txids, n_owners, n_utxos = _HEADER.unpack_from(body, 0)
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotError("Not a UTXO snapshot file.")
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {version}.")
+    if hashlib.sha256(body).digest() != checksum:
+        raise SnapshotError("Snapshot checksum mismatch.")
+
+    offset = _HEADER.size
+    strings = []
+    for _ in range(n_txids + n_owners):
+        (length,) = _STR_LEN.unpack_from(body, offset)
+        offset += _STR_LEN.size
+        strings.append(str(body[offset:offset + length], "utf-8"))
+        offset += length
+    txids, owners = strings[:n_txids], strings[n_txids:]
+
+    columns = []
+    for typecode in ('I', 'I', 'q', 'I'):
+        size = array(typecode).itemsize * n_utxos
+        columns.append(_column_from(typecode, body[offset:offset + size]))
+        offset += size
+    if offset != len(body):
+        raise SnapshotError("Snapshot length does not match its header.")
+    return txids, owners, columns
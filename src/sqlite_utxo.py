@@ -0,0 +1,321 @@
+import sqlite3
+from collections import OrderedDict
+from collections.abc import Mapping
+from contextlib import contextmanager
+from src import snapshot
+from src.commitment import COMMITMENT_MASK, utxo_hash, compute_commitment, format_commitment
+from src.stats import STATS, now
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS utxos (
+    tx_id  TEXT    NOT NULL,
+    idx    INTEGER NOT NULL,
+    amount INTEGER NOT NULL,
+    owner  TEXT    NOT NULL,
+    PRIMARY KEY (tx_id, idx)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS utxos_by_owner ON utxos (owner);
+CREATE TABLE IF NOT EXISTS balances (
+    owner  TEXT    PRIMARY KEY,
+    amount INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key    TEXT    PRIMARY KEY,
+    value  TEXT    NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class _SQLiteUTXOSetView(Mapping):
+    """Read-only (tx_id, index) -> {amount, owner} view of the store and its cache."""
+
+    def __init__(self, manager):
+        self._manager = manager
+
+    def __getitem__(self, key):
+        data = self._manager.get_utxo(key[0], key[1])
+        if data is None:
+            raise KeyError(key)
+        return data
+
+    def __contains__(self, key):
+        return self._manager.exists(key[0], key[1])
+
+    def __iter__(self):
+        for tx_id, index, _, _ in self._manager.iter_utxos():
+            yield (tx_id, index)
+
+    def __len__(self):
+        return len(self._manager)
+
+
+class SQLiteUTXOManager:
+    """
+    Disk-backed UTXO set with the same API as UTXOManager.
+
+    UTXOs live in a SQLite database at `path` (":memory:" for a throwaway
+    one). In front of it sits a cache of at most `cache_size` clean outpoints
+    with LRU eviction, plus the dirty outpoints changed since the last flush,
+    which stay in memory until they are written. Changes are flushed in one
+    SQLite transaction when the dirty set outgrows the cache, at the end of
+    a batch() block, or on flush()/close().
+    """
+
+    def __init__(self, path=":memory:", cache_size=100_000):
+        self.path = path
+        self.cache_size = cache_size
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+        # (tx_id, index) -> {amount, owner}, least recently used first
+        self._cache = OrderedDict()
+        # (tx_id, index) -> {amount, owner}, or None once spent; not yet on disk
+        self._dirty = {}
+        # owner -> satoshis gained (negative: lost) since the last flush
+        self._balance_delta = {}
+        self._count = self._db.execute("SELECT COUNT(*) FROM utxos").fetchone()[0]
+        # Sum of every UTXO's hash (see src/commitment.py), saved with each flush;
+        # a database from before commitments were stored gets one full scan
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'commitment'").fetchone()
+        self._commitment = int(row[0], 16) if row else compute_commitment(
+            self._db.execute("SELECT * FROM utxos"))
+        self._batch_depth = 0
+        self.hits = 0
+        self.misses = 0
+        self.flushes = 0
+        # Optional amount-sorted CoinIndex, see coin_selection.attach_coin_index
+        self.coin_index = None
+
+        self.utxo_set = _SQLiteUTXOSetView(self)
+
+    # --- Cache ---
+
+    def _lookup(self, key, count=True):
+        # count=False is for add_utxo's overwrite check, which is expected to
+        # find nothing and so would report every new output as a miss
+        if key in self._dirty:
+            self.hits += count
+            return self._dirty[key]
+        data = self._cache.get(key)
+        if data is not None:
+            self.hits += count
+            self._cache.move_to_end(key)
+            return data
+
+        self.misses += count
+        row = self._db.execute("SELECT amount, owner FROM utxos WHERE tx_id = ? AND idx = ?",
+                               key).fetchone()
+        if row is None:
+            return None
+        data = {"amount": row[0], "owner": row[1]}
+        self._cache[key] = data
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return data
+
+    def _write(self, key, data):
+        self._cache.pop(key, None)
+        self._dirty[key] = data
+        if self._batch_depth == 0 and len(self._dirty) > self.cache_size:
+            self.flush()
+
+    def _adjust(self, owner, amount):
+        self._balance_delta[owner] = self._balance_delta.get(owner, 0) + amount
+
+    @contextmanager
+    def batch(self):
+        """Holds back flushes until the outermost batch ends, then writes everything at once."""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.flush()
+
+    def flush(self):
+        """Writes every dirty outpoint and balance change to disk in one transaction."""
+        if not self._dirty and not self._balance_delta:
+            return
+        start = now() if STATS.enabled else None
+        created = [(tx_id, index, data["amount"], data["owner"])
+                   for (tx_id, index), data in self._dirty.items() if data is not None]
+        spent = [key for key, data in self._dirty.items() if data is None]
+        deltas = [(owner, delta) for owner, delta in self._balance_delta.items() if delta]
+        with self._db:
+            self._db.executemany("DELETE FROM utxos WHERE tx_id = ? AND idx = ?", spent)
+            self._db.executemany("INSERT OR REPLACE INTO utxos VALUES (?, ?, ?, ?)", created)
+            self._db.executemany("INSERT INTO balances VALUES (?, ?) ON CONFLICT (owner) "
+                                 "DO UPDATE SET amount = amount + excluded.amount", deltas)
+            self._db.executemany("DELETE FROM balances WHERE owner = ? AND amount = 0",
+                                 [(owner,) for owner, _ in deltas])
+            self._save_commitment()
+
+        # Freshly written outputs are the likeliest to be spent next
+        cache = self._cache
+        for key, data in self._dirty.items():
+            if data is not None:
+                cache[key] = data
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        self._dirty = {}
+        self._balance_delta = {}
+        self.flushes += 1
+        if start is not None:
+            STATS.observe("utxo.flush", now() - start)
+            STATS.incr("utxo.flushes")
+            STATS.gauge("utxo.cache_hits", self.hits)
+            STATS.gauge("utxo.cache_misses", self.misses)
+            STATS.gauge("utxo.cache_hit_rate", self.cache_stats()["hit_rate"])
+
+    def _save_commitment(self):
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES ('commitment', ?)",
+                         (format_commitment(self._commitment),))
+
+    def close(self):
+        self.flush()
+        self._db.close()
+
+    def cache_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "cached": len(self._cache),
+            "dirty": len(self._dirty),
+            "flushes": self.flushes
+        }
+
+    # --- UTXOManager API ---
+
+    def add_utxo(self, tx_id: str, index: int, amount: int, owner: str):
+        """
+        Add a new UTXO to the set. Amount is in integer satoshis.
+        """
+        if type(amount) is not int:
+            raise TypeError(f"UTXO amount must be integer satoshis, got {type(amount).__name__}")
+        # Overwriting an existing outpoint must not leave it counted twice
+        key = (tx_id, index)
+        data = self._lookup(key, count=False)
+        if data is not None:
+            self._remove(key, data)
+        self._write(key, {"amount": amount, "owner": owner})
+        self._adjust(owner, amount)
+        self._count += 1
+        self._commitment = (self._commitment + utxo_hash(tx_id, index, amount, owner)) & COMMITMENT_MASK
+        if self.coin_index is not None:
+            self.coin_index.add(owner, amount, tx_id, index)
+
+    def remove_utxo(self, tx_id: str, index: int):
+        """
+        Remove a UTXO (when spent).
+        """
+        key = (tx_id, index)
+        data = self._lookup(key)
+        if data is not None:
+            self._remove(key, data)
+
+    def _remove(self, key, data):
+        tx_id, index = key
+        self._write(key, None)
+        self._adjust(data["owner"], -data["amount"])
+        self._count -= 1
+        self._commitment = (self._commitment - utxo_hash(tx_id, index, data["amount"],
+                                                         data["owner"])) & COMMITMENT_MASK
+        if self.coin_index is not None:
+            self.coin_index.remove(data["owner"], data["amount"], tx_id, index)
+
+    def get_balance(self, owner: str) -> int:
+        """
+        Return the total balance in satoshis for an address.
+        """
+        row = self._db.execute("SELECT amount FROM balances WHERE owner = ?", (owner,)).fetchone()
+        return (row[0] if row else 0) + self._balance_delta.get(owner, 0)
+
+    def get_utxo(self, tx_id: str, index: int):
+        """
+        Return {amount, owner} for an unspent output, or None if missing.
+        """
+        return self._lookup((tx_id, index))
+
+    def exists(self, tx_id: str, index: int) -> bool:
+        """
+        Check if UTXO exists and is unspent.
+        """
+        return self._lookup((tx_id, index)) is not None
+
+    def get_utxos_for_owner(self, owner: str) -> list:
+        """
+        Get all UTXOs owned by an address (one indexed query plus the unflushed changes).
+        """
+        dirty = self._dirty
+        owned_utxos = [{"tx_id": tx_id, "index": index, "amount": amount, "owner": owner}
+                       for tx_id, index, amount in self._db.execute(
+                           "SELECT tx_id, idx, amount FROM utxos WHERE owner = ?", (owner,))
+                       if (tx_id, index) not in dirty]
+        for (tx_id, index), data in dirty.items():
+            if data is not None and data["owner"] == owner:
+                owned_utxos.append({"tx_id": tx_id, "index": index,
+                                    "amount": data["amount"], "owner": owner})
+        return owned_utxos
+
+    def commitment(self) -> str:
+        """
+        Order-independent hash of the whole set, kept up to date on every add and remove.
+        """
+        return format_commitment(self._commitment)
+
+    def __len__(self):
+        return self._count
+
+    def iter_utxos(self):
+        """Yields (tx_id, index, amount, owner) for every unspent output."""
+        dirty = dict(self._dirty)
+        for tx_id, index, amount, owner in self._db.execute("SELECT * FROM utxos"):
+            if (tx_id, index) not in dirty:
+                yield tx_id, index, amount, owner
+        for (tx_id, index), data in dirty.items():
+            if data is not None:
+                yield tx_id, index, data["amount"], data["owner"]
+
+    def dump_snapshot(self, path):
+        """Writes a versioned, checksummed binary snapshot of the set to `path`."""
+        snapshot.dump_snapshot(self, path)
+
+    @classmethod
+    def load_snapshot(cls, path):
+        """Builds a new (in-memory database) manager from a snapshot written by dump_snapshot."""
+        return snapshot.load_snapshot(path, cls)
+
+    def _restore_columns(self, txids, owners, col_txid, col_index, col_amount, col_owner):
+        """Bulk-fills an empty manager from decoded snapshot columns."""
+        if self._count or self._dirty:
+            raise ValueError("Snapshots can only be restored into an empty database.")
+        balances = {}
+        for oid, amount in zip(col_owner, col_amount):
+            balances[oid] = balances.get(oid, 0) + amount
+        with self._db:
+            self._db.executemany("INSERT INTO utxos VALUES (?, ?, ?, ?)",
+                                 ((txids[tid], index, amount, owners[oid]) for tid, index, amount, oid
+                                  in zip(col_txid, col_index, col_amount, col_owner)))
+            self._db.executemany("INSERT INTO balances VALUES (?, ?)",
+                                 ((owners[oid], amount) for oid, amount in balances.items() if amount))
+            self._commitment = compute_commitment(
+                (txids[tid], index, amount, owners[oid]) for tid, index, amount, oid
+                in zip(col_txid, col_index, col_amount, col_owner))
+            self._save_commitment()
+        self._count = len(col_txid)
+
+    def memory_usage(self) -> dict:
+        """
+        Cache occupancy; the set itself is on disk.
+        """
+        return {
+            "backend": "sqlite",
+            "utxos": self._count,
+            "path": self.path,
+            **self.cache_stats()
+        }
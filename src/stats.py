@@ -0,0 +1,109 @@
+import json
+import time
+
+# Opt-in instrumentation for the validator, mempool and miner.
+#
+# Hot paths guard every call with `if STATS.enabled:`, so when stats are off
+# the only cost is one attribute check. Latencies go into log2 histograms
+# (bucket i holds samples below 2**i microseconds), which keeps recording O(1)
+# and memory fixed no matter how many samples are taken.
+
+_BUCKETS = 32
+
+
+class Histogram:
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.buckets = [0] * _BUCKETS
+
+    def observe(self, seconds):
+        us = seconds * 1e6
+        self.count += 1
+        self.total += us
+        if self.min is None or us < self.min:
+            self.min = us
+        if us > self.max:
+            self.max = us
+        self.buckets[min(int(us).bit_length(), _BUCKETS - 1)] += 1
+
+    def percentile(self, q):
+        """Upper bound (in microseconds) of the bucket holding the q-th quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return max(self.min, min(float(2 ** i), self.max))
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count if self.count else 0.0,
+            "min_us": self.min or 0.0,
+            "max_us": self.max,
+            "p50_us": self.percentile(0.50),
+            "p90_us": self.percentile(0.90),
+            "p99_us": self.percentile(0.99),
+        }
+
+
+class Stats:
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def incr(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        self.gauges[name] = value
+
+    def observe(self, name, seconds):
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = Histogram()
+        hist.observe(seconds)
+
+    def snapshot(self):
+        return {
+            "counters": dict(sorted(self.counters.items())),
+            "gauges": dict(sorted(self.gauges.items())),
+            "latency": {name: h.summary() for name, h in sorted(self.histograms.items())},
+        }
+
+
+STATS = Stats()
+now = time.perf_counter
+
+
+def enable(reset=True):
+    if reset:
+        STATS.reset()
+    STATS.enabled = True
+
+
+def disable():
+    STATS.enabled = False
+
+
+def stats():
+    """Current counters, gauges and latency summaries as a plain dict."""
+    return STATS.snapshot()
+
+
+def dump_json(path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(stats(), f, indent=2)
@@ -0,0 +1,119 @@
+import json
+from collections import deque
+from src.amount import to_satoshis, format_btc, is_valid_amount
+from src.block import GENESIS_HASH, mine_block, disconnect_block
+from src.transaction import Transaction
+
+# Non-interactive driver: one JSON object per input line, one result per output line.
+#
+#   {"op": "tx", "sender": "Alice", "recipient": "Bob",
+#    "inputs": [{"prev_tx": "genesis", "index": 0, "owner": "Alice"}],
+#    "outputs": [{"amount": "10.0", "address": "Bob"}, ...]}
+#   {"op": "mine", "miner": "Miner_1"}               (max_txs optional)
+#   {"op": "disconnect", "depth": 1}
+#   {"op": "utxo", "tx_id": "seed", "index": 0, "amount": "50.0", "owner": "Alice"}
+#
+# Amounts are BTC (strings avoid float rounding) and are converted to satoshis
+# here, at the boundary. Every stage is a generator, and only the last
+# max_reorg_depth blocks are kept for "disconnect", so memory use does not
+# grow with the length of the input.
+
+DEFAULT_MAX_REORG_DEPTH = 100
+
+def read_records(lines):
+    """Parses JSONL lines into (line_no, record, error) tuples, skipping blanks."""
+    for line_no, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, None, f"Invalid JSON: {e.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, "Invalid record: expected a JSON object"
+            continue
+        yield line_no, record, None
+
+def build_transaction(record):
+    """Builds a Transaction from a "tx" record (amounts in BTC)."""
+    outputs = [{"amount": to_satoshis(out["amount"]), "address": out["address"]}
+               for out in record["outputs"]]
+    inputs = [{"prev_tx": inp["prev_tx"], "index": int(inp["index"]), "owner": inp["owner"]}
+              for inp in record["inputs"]]
+    return Transaction(sender=record.get("sender", ""), recipient=record.get("recipient", ""),
+                       inputs=inputs, outputs=outputs)
+
+def _apply(record, mempool, utxo_manager, chain):
+    op = record.get("op")
+    if op == "tx":
+        tx = build_transaction(record)
+        ok, msg = mempool.add_transaction(tx, utxo_manager)
+        return {"ok": ok, "tx_id": tx.tx_id, "msg": msg}
+
+    if op == "mine":
+        block = mine_block(record["miner"], mempool, utxo_manager,
+                           num_txs=int(record["max_txs"]) if "max_txs" in record else None,
+                           verbose=False,
+                           prev_block=chain[-1] if chain else None)
+        result = {"ok": block is not None}
+        if block is not None:
+            chain.append(block)
+            result.update(height=block.height, block_hash=block.block_hash,
+                          txs=len(block.transactions), fees=format_btc(block.fees),
+                          weight=block.weight, utxo_commitment=block.utxo_commitment)
+        result.update(mempool_size=len(mempool), utxo_count=len(utxo_manager))
+        return result
+
+    if op == "disconnect":
+        depth = int(record.get("depth", 1))
+        # Once older blocks have left the window, the oldest one kept only
+        # anchors the next block and cannot be disconnected itself
+        limit = len(chain) - (1 if chain and chain[0].prev_hash != GENESIS_HASH else 0)
+        if not 0 < depth <= limit:
+            return {"ok": False, "msg": f"Cannot disconnect {depth} blocks, only the last {limit} can be"}
+        dropped = 0
+        for _ in range(depth):
+            dropped += len(disconnect_block(chain.pop(), mempool, utxo_manager, verbose=False))
+        return {"ok": True, "height": chain[-1].height if chain else 0, "dropped": dropped,
+                "mempool_size": len(mempool), "utxo_count": len(utxo_manager),
+                "utxo_commitment": utxo_manager.commitment()}
+
+    if op == "utxo":
+        amount = to_satoshis(record["amount"])
+        if not is_valid_amount(amount):
+            return {"ok": False, "msg": f"Invalid amount {record['amount']!r}: must be 0 to 21 million BTC"}
+        utxo_manager.add_utxo(record["tx_id"], int(record["index"]), amount, record["owner"])
+        return {"ok": True, "balance": format_btc(utxo_manager.get_balance(record["owner"]))}
+
+    return {"ok": False, "msg": f"Unknown op {op!r}"}
+
+def process_records(records, mempool, utxo_manager, chain=None, max_reorg_depth=DEFAULT_MAX_REORG_DEPTH):
+    """
+    Applies each parsed record in order and yields one result dict per record.
+    Mined blocks are appended to `chain` (tip last); by default a deque that
+    keeps enough blocks to disconnect up to max_reorg_depth of them.
+    """
+    if chain is None:
+        chain = deque(maxlen=max_reorg_depth + 1)
+    for line_no, record, error in records:
+        if error is not None:
+            yield {"line": line_no, "ok": False, "msg": error}
+            continue
+        try:
+            result = _apply(record, mempool, utxo_manager, chain)
+        except (KeyError, TypeError, ValueError) as e:
+            result = {"ok": False, "msg": f"Malformed {record.get('op')!r} record: {e!r}"}
+        yield {"line": line_no, "op": record.get("op"), **result}
+
+def run_stream(in_file, out_file, mempool, utxo_manager, chain=None,
+               max_reorg_depth=DEFAULT_MAX_REORG_DEPTH):
+    """Streams JSONL from in_file to results in out_file; returns a summary dict."""
+    summary = {"records": 0, "accepted": 0, "rejected": 0}
+    for result in process_records(read_records(in_file), mempool, utxo_manager, chain, max_reorg_depth):
+        summary["records"] += 1
+        summary["accepted" if result["ok"] else "rejected"] += 1
+        out_file.write(json.dumps(result, separators=(",", ":")))
+        out_file.write("\n")
+    return summary
@@ -0,0 +1,94 @@
+from src.stats import STATS, now
+from src.transaction import WITNESS_SCALE_FACTOR
+
+MAX_BLOCK_WEIGHT = 4_000_000
+BLOCK_HEADER_BYTES = 80
+# Weight kept back for the coinbase transaction, as Bitcoin Core does
+COINBASE_RESERVED_WEIGHT = 4000
+BASE_BLOCK_WEIGHT = WITNESS_SCALE_FACTOR * BLOCK_HEADER_BYTES + COINBASE_RESERVED_WEIGHT
+
+class BlockTemplate:
+    """
+    The block a miner would build right now, kept current as transactions
+    enter and leave the mempool so that mining only has to take it.
+
+    A newly admitted package is appended if it fits in the remaining weight.
+    Changes that could alter the selection (a better package that does not
+    fit, or removing a selected transaction or an unconfirmed parent) mark the
+    template stale, and it is rebuilt on next use. A rebuild pops packages off
+    the mempool's ancestor-score index, so it costs about the block size, not
+    the pool size.
+    """
+
+    def __init__(self, mempool, max_weight=MAX_BLOCK_WEIGHT, max_txs=None):
+        self.mempool = mempool
+        self.max_weight = max_weight
+        self.max_txs = max_txs
+        # Budget left for transactions once the header and coinbase are paid for
+        self.max_tx_weight = max_weight - BASE_BLOCK_WEIGHT
+        self.invalidate()
+
+    def invalidate(self):
+        self.entries = {} # tx_id -> MempoolEntry, ancestors first
+        self.fees = 0
+        self.weight = BASE_BLOCK_WEIGHT
+        self.min_score = None # Lowest package score included so far
+        self.stale = True
+
+    def fill_ratio(self):
+        """Share of the block weight limit the template uses."""
+        return self.weight / self.max_weight
+
+    def refresh(self):
+        """Rebuilds the template if it is stale."""
+        if not self.stale:
+            return
+        start = now() if STATS.enabled else None
+        self.invalidate()
+        for score, package in self.mempool.select_packages(self.max_txs, self.max_tx_weight):
+            self._append(score, package)
+        self.stale = False
+        if start is not None:
+            STATS.observe("template.rebuild", now() - start)
+            STATS.incr("template.rebuilds")
+
+    def take(self):
+        """Returns the current template's entries, ancestors first, and starts a new one."""
+        self.refresh()
+        selected = list(self.entries.values())
+        self.invalidate()
+        return selected
+
+    def _append(self, score, package):
+        for entry in package:
+            self.entries[entry.tx.tx_id] = entry
+            self.fees += entry.fee
+            self.weight += WITNESS_SCALE_FACTOR * entry.size
+        if self.min_score is None or score < self.min_score:
+            self.min_score = score
+
+    def on_add(self, tx_id):
+        """Called by the mempool after a transaction is admitted."""
+        if self.stale:
+            return
+        mempool = self.mempool
+        package = [t for t in mempool.get_ancestors([tx_id]) if t not in self.entries]
+        fee = sum(mempool.entries[t].fee for t in package)
+        size = sum(mempool.entries[t].size for t in package)
+        score = mempool._score(fee, size)
+
+        fits = (self.weight + WITNESS_SCALE_FACTOR * size <= self.max_weight
+                and (self.max_txs is None or len(self.entries) + len(package) <= self.max_txs))
+        if fits:
+            package.sort(key=lambda t: mempool.entries[t].seq)
+            self._append(score, [mempool.entries[t] for t in package])
+            if STATS.enabled:
+                STATS.incr("template.appends")
+        elif self.min_score is None or score > self.min_score:
+            # Would displace something already selected
+            self.stale = True
+
+    def on_remove(self, tx_id):
+        """Called by the mempool before a transaction is unlinked."""
+        if not self.stale and (tx_id in self.entries or self.mempool.children[tx_id]):
+            self.stale = True
@@ -1,20 +1,83 @@
-import time
-import random
+import hashlib
+import struct
 
-def generate_tx_id(sender, recipient):
-    """Generates a unique transaction ID including sender and recipient names."""
-    timestamp = int(time.time())
-    rand_salt = random.randint(1000, 9999)
-    return f"tx_{sender}_to_{recipient}_{timestamp}_{rand_salt}"
+# Rough legacy (P2PKH) sizes in bytes, used to estimate fee rates
+TX_OVERHEAD_BYTES = 10
+INPUT_BYTES = 148
+OUTPUT_BYTES = 34
+# Weight units per byte of non-witness data (all our transactions are legacy)
+WITNESS_SCALE_FACTOR = 4
+
+# Canonical encoding hashed into the tx ID (all integers little-endian):
+#   header : version, nonce, input count, output count
+#   input  : prev_tx (u16 length + UTF-8), index (u32), owner (u16 length + UTF-8)
+#   output : amount in satoshis (i64), address (u16 length + UTF-8)
+TX_VERSION = 1
+_TX_HEADER = struct.Struct("<HQII")
+_STR_LEN = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+
+def _pack_str(value):
+    raw = value.encode("utf-8")
+    return _STR_LEN.pack(len(raw)) + raw
 
 class Transaction:
-    def __init__(self, sender, recipient, inputs, outputs):
-        self.tx_id = generate_tx_id(sender, recipient)
+    """
+    The tx ID is the SHA-256 of the canonical encoding of the inputs and
+    outputs, so two different transactions can never share an ID and the same
+    transaction always gets the same one. It is computed on first use and
+    cached; inputs and outputs must not be changed after that.
+    """
+
+    def __init__(self, sender, recipient, inputs, outputs, nonce=0):
         # SAVE THESE ATTRIBUTES SO main.py CAN ACCESS THEM
         self.sender = sender
         self.recipient = recipient
         self.inputs = inputs
         self.outputs = outputs
+        # Distinguishes transactions that are otherwise identical (coinbase rewards)
+        self.nonce = nonce
+        self._txid_bytes = None
+        self._tx_id = None
+
+    def serialize(self):
+        """Canonical byte encoding of the inputs, outputs and nonce (ValueError if unencodable)."""
+        try:
+            parts = [_TX_HEADER.pack(TX_VERSION, self.nonce, len(self.inputs), len(self.outputs))]
+            for inp in self.inputs:
+                parts.append(_pack_str(inp['prev_tx']))
+                parts.append(_U32.pack(inp['index']))
+                parts.append(_pack_str(inp['owner']))
+            for out in self.outputs:
+                parts.append(_I64.pack(out['amount']))
+                parts.append(_pack_str(out['address']))
+        except (struct.error, AttributeError) as e:
+            # Out-of-range integers or non-string names
+            raise ValueError(f"Transaction cannot be serialized: {e}") from e
+        return b"".join(parts)
+
+    @property
+    def txid_bytes(self):
+        """The 32-byte binary form of the tx ID."""
+        if self._txid_bytes is None:
+            self._txid_bytes = hashlib.sha256(self.serialize()).digest()
+        return self._txid_bytes
+
+    @property
+    def tx_id(self):
+        """The tx ID as 64 hex characters (one cached str, so its hash is computed once)."""
+        if self._tx_id is None:
+            self._tx_id = self.txid_bytes.hex()
+        return self._tx_id
+
+    def size(self):
+        """Estimated serialized size in bytes."""
+        return TX_OVERHEAD_BYTES + INPUT_BYTES * len(self.inputs) + OUTPUT_BYTES * len(self.outputs)
+
+    def weight(self):
+        """Block weight in weight units, the budget blocks are filled against."""
+        return WITNESS_SCALE_FACTOR * self.size()
 
     def to_dict(self):
         return {
@@ -23,4 +86,4 @@ class Transaction:
             "recipient": self.recipient,
             "inputs": self.inputs,
             "outputs": self.outputs
-        }
\ No newline at end of file
+        }
@@ -1,38 +1,76 @@
-from decimal import Decimal 
+import sys
+from src import snapshot
+from src.commitment import COMMITMENT_MASK, utxo_hash, compute_commitment, format_commitment
 
 class UTXOManager:
     def __init__(self):
-        # Store UTXOs as dictionary: (tx_id, index) -> {amount, owner}
+        # Store UTXOs as dictionary: (tx_id, index) -> {amount (satoshis), owner}
         self.utxo_set = {}
+        # Secondary index: owner -> {(tx_id, index): None} (dict keeps insertion order)
+        self.owner_index = {}
+        # Running balance per owner, kept in step with owner_index
+        self.balances = {}
+        # Optional amount-sorted CoinIndex, see coin_selection.attach_coin_index
+        self.coin_index = None
+        # Sum of every UTXO's hash, see src/commitment.py
+        self._commitment = 0
 
-    def add_utxo(self, tx_id: str, index: int, amount: float, owner: str):
+    def add_utxo(self, tx_id: str, index: int, amount: int, owner: str):
         """
-        Add a new UTXO to the set.
+        Add a new UTXO to the set. Amount is in integer satoshis.
         """
+        if type(amount) is not int:
+            raise TypeError(f"UTXO amount must be integer satoshis, got {type(amount).__name__}")
         key = (tx_id, index)
-        
+
+        # Overwriting an existing outpoint must not leave it counted twice
+        if key in self.utxo_set:
+            self.remove_utxo(tx_id, index)
+
         self.utxo_set[key] = {
-            "amount": Decimal(str(amount)), 
+            "amount": amount,
             "owner": owner
         }
 
+        self.owner_index.setdefault(owner, {})[key] = None
+        self.balances[owner] = self.balances.get(owner, 0) + amount
+        self._commitment = (self._commitment + utxo_hash(tx_id, index, amount, owner)) & COMMITMENT_MASK
+        if self.coin_index is not None:
+            self.coin_index.add(owner, amount, tx_id, index)
+
     def remove_utxo(self, tx_id: str, index: int):
         """
         Remove a UTXO (when spent).
         """
         key = (tx_id, index)
-        if key in self.utxo_set:
-            del self.utxo_set[key]
-        
-    def get_balance(self, owner: str) -> Decimal: 
+        data = self.utxo_set.pop(key, None)
+        if data is None:
+            return
+
+        owner = data["owner"]
+        self._commitment = (self._commitment - utxo_hash(tx_id, index, data["amount"], owner)) & COMMITMENT_MASK
+        if self.coin_index is not None:
+            self.coin_index.remove(owner, data["amount"], tx_id, index)
+        owned = self.owner_index[owner]
+        del owned[key]
+        if owned:
+            self.balances[owner] -= data["amount"]
+        else:
+            # Drop empty owners so the index does not grow without bound
+            del self.owner_index[owner]
+            del self.balances[owner]
+
+    def get_balance(self, owner: str) -> int:
+        """
+        Return the total balance in satoshis for an address (O(1) via the running balance).
+        """
+        return self.balances.get(owner, 0)
+
+    def get_utxo(self, tx_id: str, index: int):
         """
-        Calculate total balance for an address.
+        Return {amount, owner} for an unspent output, or None if missing.
         """
-        balance = Decimal('0.0') 
-        for utxo in self.utxo_set.values():
-            if utxo["owner"] == owner:
-                balance += utxo["amount"]
-        return balance
+        return self.utxo_set.get((tx_id, index))
 
     def exists(self, tx_id: str, index: int) -> bool:
         """
@@ -43,15 +81,78 @@ class UTXOManager:
     def get_utxos_for_owner(self, owner: str) -> list:
         """
         Get all UTXOs owned by an address.
+        Cost depends on the owner's UTXO count, not the size of the whole set.
         """
         owned_utxos = []
+        for (tx_id, index) in self.owner_index.get(owner, ()):
+            data = self.utxo_set[(tx_id, index)]
+            utxo_info = {
+                "tx_id": tx_id,
+                "index": index,
+                "amount": data["amount"],
+                "owner": data["owner"]
+            }
+            owned_utxos.append(utxo_info)
+        return owned_utxos
+
+    def commitment(self) -> str:
+        """
+        Order-independent hash of the whole set, kept up to date on every add and remove.
+        """
+        return format_commitment(self._commitment)
+
+    def __len__(self):
+        return len(self.utxo_set)
+
+    def iter_utxos(self):
+        """Yields (tx_id, index, amount, owner) for every unspent output."""
         for (tx_id, index), data in self.utxo_set.items():
-            if data["owner"] == owner:
-                utxo_info = {
-                    "tx_id": tx_id,
-                    "index": index,
-                    "amount": data["amount"],
-                    "owner": data["owner"]
-                }
-                owned_utxos.append(utxo_info)
-        return owned_utxos
\ No newline at end of file
+            yield tx_id, index, data["amount"], data["owner"]
+
+    def dump_snapshot(self, path):
+        """Writes a versioned, checksummed binary snapshot of the set to `path`."""
+        snapshot.dump_snapshot(self, path)
+
+    @classmethod
+    def load_snapshot(cls, path):
+        """Builds a new manager from a snapshot written by dump_snapshot."""
+        return snapshot.load_snapshot(path, cls)
+
+    def _restore_columns(self, txids, owners, col_txid, col_index, col_amount, col_owner):
+        """Bulk-fills an empty manager from decoded snapshot columns."""
+        utxo_set, owner_index, balances = self.utxo_set, self.owner_index, self.balances
+        for tid, index, amount, oid in zip(col_txid, col_index, col_amount, col_owner):
+            key = (txids[tid], index)
+            owner = owners[oid]
+            utxo_set[key] = {"amount": amount, "owner": owner}
+            owned = owner_index.get(owner)
+            if owned is None:
+                owned = owner_index[owner] = {}
+                balances[owner] = 0
+            owned[key] = None
+            balances[owner] += amount
+        self._commitment = compute_commitment(self.iter_utxos())
+
+    def memory_usage(self) -> dict:
+        """
+        Approximate bytes held by the UTXO set and its indexes.
+        Walks every entry, so use it for sizing runs, not on a hot path.
+        """
+        entry_bytes = 0
+        for key, data in self.utxo_set.items():
+            entry_bytes += sys.getsizeof(key) + sys.getsizeof(data) + sys.getsizeof(data["amount"])
+        index_bytes = sys.getsizeof(self.owner_index) + sys.getsizeof(self.balances)
+        for owned in self.owner_index.values():
+            index_bytes += sys.getsizeof(owned)
+
+        total = sys.getsizeof(self.utxo_set) + entry_bytes + index_bytes
+        count = len(self.utxo_set)
+        return {
+            "backend": "dict",
+            "utxos": count,
+            "table_bytes": sys.getsizeof(self.utxo_set),
+            "entry_bytes": entry_bytes,
+            "index_bytes": index_bytes,
+            "total_bytes": total,
+            "bytes_per_utxo": total / count if count else 0.0
+        }
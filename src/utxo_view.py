@@ -0,0 +1,141 @@
+from collections.abc import Mapping
+from src.commitment import COMMITMENT_MASK, utxo_hash, format_commitment
+
+
+class _ViewSetMapping(Mapping):
+    """Read-only (tx_id, index) -> {amount, owner} mapping of what a view sees."""
+
+    def __init__(self, view):
+        self._view = view
+
+    def __getitem__(self, key):
+        data = self._view.get_utxo(key[0], key[1])
+        if data is None:
+            raise KeyError(key)
+        return data
+
+    def __contains__(self, key):
+        return self._view.exists(key[0], key[1])
+
+    def __iter__(self):
+        view = self._view
+        for key in view.base.utxo_set:
+            if key not in view._spent:
+                yield key
+        yield from view._added
+
+    def __len__(self):
+        return len(self._view)
+
+
+class UTXOView:
+    """
+    Copy-on-write overlay on a UTXO set (any manager, or another view).
+
+    Adds and spends are recorded in a small delta and reads fall through to
+    the base, so creating a view is O(1) and the base is untouched until
+    commit(). A view has the manager API, so the Validator and mine_block can
+    run against it to try out a block or a sequence of spends.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self._added = {}         # (tx_id, index) -> {amount, owner} created in the view
+        self._spent = set()      # Base outpoints spent in the view
+        self._balance_delta = {} # owner -> satoshis gained (negative: lost) in the view
+        self._commitment_delta = 0 # Hashes of added UTXOs minus those of spent ones
+
+    def _adjust(self, owner, amount):
+        self._balance_delta[owner] = self._balance_delta.get(owner, 0) + amount
+
+    def add_utxo(self, tx_id: str, index: int, amount: int, owner: str):
+        if type(amount) is not int:
+            raise TypeError(f"UTXO amount must be integer satoshis, got {type(amount).__name__}")
+        # Overwriting an existing outpoint must not leave it counted twice
+        self.remove_utxo(tx_id, index)
+        self._added[(tx_id, index)] = {"amount": amount, "owner": owner}
+        self._adjust(owner, amount)
+        self._commitment_delta += utxo_hash(tx_id, index, amount, owner)
+
+    def remove_utxo(self, tx_id: str, index: int):
+        key = (tx_id, index)
+        data = self._added.pop(key, None)
+        if data is None:
+            if key in self._spent:
+                return
+            data = self.base.get_utxo(tx_id, index)
+            if data is None:
+                return
+            self._spent.add(key)
+        self._adjust(data["owner"], -data["amount"])
+        self._commitment_delta -= utxo_hash(tx_id, index, data["amount"], data["owner"])
+
+    def get_balance(self, owner: str) -> int:
+        return self.base.get_balance(owner) + self._balance_delta.get(owner, 0)
+
+    def get_utxo(self, tx_id: str, index: int):
+        key = (tx_id, index)
+        data = self._added.get(key)
+        if data is not None:
+            return data
+        if key in self._spent:
+            return None
+        return self.base.get_utxo(tx_id, index)
+
+    def exists(self, tx_id: str, index: int) -> bool:
+        return self.get_utxo(tx_id, index) is not None
+
+    def get_utxos_for_owner(self, owner: str) -> list:
+        owned_utxos = [u for u in self.base.get_utxos_for_owner(owner)
+                       if (u["tx_id"], u["index"]) not in self._spent
+                       and (u["tx_id"], u["index"]) not in self._added]
+        for (tx_id, index), data in self._added.items():
+            if data["owner"] == owner:
+                owned_utxos.append({"tx_id": tx_id, "index": index,
+                                    "amount": data["amount"], "owner": owner})
+        return owned_utxos
+
+    def commitment(self) -> str:
+        """The set commitment the base would have after commit()."""
+        return format_commitment((int(self.base.commitment(), 16) + self._commitment_delta) & COMMITMENT_MASK)
+
+    @property
+    def utxo_set(self):
+        return _ViewSetMapping(self)
+
+    def __len__(self):
+        # add_utxo spends any base outpoint it overwrites, so the two never overlap in count
+        return len(self.base) - len(self._spent) + len(self._added)
+
+    def iter_utxos(self):
+        """Yields (tx_id, index, amount, owner) for every output the view sees."""
+        for key in self.utxo_set:
+            data = self.get_utxo(key[0], key[1])
+            yield key[0], key[1], data["amount"], data["owner"]
+
+    def changes(self):
+        """Returns (spent base outpoints, added {outpoint: data}) recorded so far."""
+        return set(self._spent), dict(self._added)
+
+    def commit(self):
+        """
+        Applies the delta to the base and empties the view.
+        Every spent outpoint is checked first, so if the base changed
+        underneath the view, nothing is applied and ValueError is raised.
+        """
+        base = self.base
+        for tx_id, index in self._spent:
+            if not base.exists(tx_id, index):
+                raise ValueError(f"Cannot commit view: UTXO {tx_id}:{index} is no longer in the base set.")
+        for tx_id, index in self._spent:
+            base.remove_utxo(tx_id, index)
+        for (tx_id, index), data in self._added.items():
+            base.add_utxo(tx_id, index, data["amount"], data["owner"])
+        self.discard()
+
+    def discard(self):
+        """Drops every change made in the view."""
+        self._added = {}
+        self._spent = set()
+        self._balance_delta = {}
+        self._commitment_delta = 0
@@ -1,51 +1,165 @@
-from decimal import Decimal
+from src.amount import MAX_MONEY, format_btc
+from src.stats import STATS, now
+from src.utxo_view import UTXOView
+
+def _reject(reason, msg):
+    if STATS.enabled:
+        STATS.incr(f"validator.reject.{reason}")
+    return False, msg, None
 
 class Validator:
     @staticmethod
     def validate_transaction(transaction, utxo_manager, mempool):
-        # Rule 4: Check for negative outputs
+        is_valid, msg, _ = Validator.check_transaction(transaction, utxo_manager, mempool)
+        return is_valid, msg
+
+    @staticmethod
+    def check_transaction(transaction, utxo_manager, mempool):
+        """
+        Same rules as validate_transaction, but also returns the resolved
+        totals as (input_values, total_input, total_output, fee, parents,
+        conflicts), or None when the transaction is rejected. All amounts are
+        integer satoshis; parents are the tx_ids of unconfirmed transactions
+        it spends. conflicts are the tx_ids of pool transactions spending the
+        same outputs, which is only allowed when the pool has replace_by_fee.
+        """
+        start = now() if STATS.enabled else None
+        is_valid, msg, total_output_value = Validator.check_stateless(transaction)
+        if is_valid:
+            is_valid, msg, totals = Validator.check_inputs(transaction, utxo_manager, mempool, total_output_value)
+        else:
+            totals = None
+        if start is not None:
+            STATS.observe("validator.validate", now() - start)
+        return is_valid, msg, totals
+
+    @staticmethod
+    def check_block(transactions, utxo_manager):
+        """
+        Validates transactions in order as one block, each able to spend the
+        outputs of earlier ones, without touching utxo_manager. Returns
+        (is_valid, msg, view); commit() the UTXOView to apply the block.
+        """
+        view = UTXOView(utxo_manager)
+        total_fee = 0
+        for n, tx in enumerate(transactions):
+            is_valid, msg, totals = Validator.check_transaction(tx, view, None)
+            if not is_valid:
+                return False, f"Transaction {n}: {msg}", None
+            for tx_input in tx.inputs:
+                view.remove_utxo(tx_input['prev_tx'], tx_input['index'])
+            for i, out in enumerate(tx.outputs):
+                view.add_utxo(tx.tx_id, i, out['amount'], out['address'])
+            total_fee += totals[3]
+        return True, f"Block valid! {len(transactions)} transactions, fees: {format_btc(total_fee)} BTC", view
+
+    @staticmethod
+    def check_stateless(transaction):
+        """
+        Rules that need only the transaction itself, so they can run in a
+        worker pool. Returns (is_valid, msg, total_output_value).
+        """
+        # Rule 4: Check for negative outputs (and anything that is not whole satoshis)
+        total_output_value = 0
         for output in transaction.outputs:
-            if Decimal(str(output['amount'])) < 0:
-                return False, "Validation Error: Negative output amount detected."
+            amount = output['amount']
+            if type(amount) is not int:
+                return _reject("bad_amount", "Validation Error: Output amounts must be integer satoshis.")
+            if amount < 0:
+                return _reject("negative_output", "Validation Error: Negative output amount detected.")
+            if amount > MAX_MONEY:
+                return _reject("output_too_large", "Validation Error: Output amount exceeds the maximum money supply.")
+            total_output_value += amount
+
+        if total_output_value > MAX_MONEY:
+            return _reject("output_too_large", "Validation Error: Total output exceeds the maximum money supply.")
+
+        # Only a coinbase may create coins from nothing, and it never enters the mempool
+        if not transaction.inputs:
+            return _reject("no_inputs", "Validation Error: Transaction has no inputs.")
 
         # Rule 2: Check for duplicate inputs within the same transaction
         input_keys = set()
         for tx_input in transaction.inputs:
             key = (tx_input['prev_tx'], tx_input['index'])
             if key in input_keys:
-                return False, f"Validation Error: Duplicate input {key} in the same transaction."
+                return _reject("duplicate_input", f"Validation Error: Duplicate input {key} in the same transaction.")
             input_keys.add(key)
 
-        # Initialize as Decimal to avoid floating point errors
-        total_input_value = Decimal('0.0')
-        
+            # Every input must carry a (simulated) signature
+            if not tx_input.get('owner'):
+                return _reject("unsigned_input", f"Validation Error: Input {key[0]}:{key[1]} is not signed by an owner.")
+
+        # The tx ID hashes the canonical encoding; compute it here, off the ordered path
+        try:
+            transaction.txid_bytes
+        except ValueError as e:
+            return _reject("malformed", f"Validation Error: {e}")
+
+        return True, "", total_output_value
+
+    @staticmethod
+    def check_inputs(transaction, utxo_manager, mempool, total_output_value):
+        """
+        Rules that read the UTXO set and the mempool. Expects check_stateless
+        to have passed and returns the same triple as check_transaction.
+        With mempool=None, inputs must be in the UTXO set (block validation).
+        """
+        total_input_value = 0
+        input_values = []
+        parents = set()
+        conflicts = set()
+        if STATS.enabled:
+            STATS.incr("validator.utxo_lookups", len(transaction.inputs))
+
         # Rule 1 & 5: Validate inputs against UTXO Manager and Mempool
         for tx_input in transaction.inputs:
             prev_id = tx_input['prev_tx']
             idx = tx_input['index']
-            
-            if not utxo_manager.exists(prev_id, idx):
-                return False, f"Validation Error: UTXO {prev_id}:{idx} does not exist or is already spent."
-            
-            if (prev_id, idx) in mempool.spent_utxos:
-                return False, f"Validation Error: UTXO {prev_id}:{idx} is already being spent in the mempool."
-
-            utxo_data = utxo_manager.utxo_set[(prev_id, idx)]
-            # Convert stored amount to Decimal
-            amount = Decimal(str(utxo_data["amount"]))
+
+            utxo_data = utxo_manager.get_utxo(prev_id, idx)
+            if utxo_data is None:
+                # Not confirmed yet: it may be an output of a pending parent
+                if mempool is not None:
+                    utxo_data = mempool.get_unconfirmed_output(prev_id, idx)
+                if utxo_data is None:
+                    return _reject("missing_input", f"Validation Error: UTXO {prev_id}:{idx} does not exist or is already spent.")
+                parents.add(prev_id)
+
+            if mempool is not None:
+                spender = mempool.spent_utxos.get((prev_id, idx))
+                if spender is not None:
+                    if not mempool.replace_by_fee:
+                        return _reject("mempool_conflict", f"Validation Error: UTXO {prev_id}:{idx} is already being spent in the mempool.")
+                    # A possible replacement; the mempool decides whether it pays enough
+                    conflicts.add(spender)
+
+            # Simulated signature check: the signer must own the output
+            if tx_input['owner'] != utxo_data["owner"]:
+                return _reject("bad_signature", f"Validation Error: {tx_input['owner']} does not own UTXO {prev_id}:{idx}.")
+
+            amount = utxo_data["amount"]
+            input_values.append(amount)
             total_input_value += amount
 
-        # Rule 3: Ensure sufficient funds - Calculate output sum using Decimals
-        total_output_value = sum(Decimal(str(output['amount'])) for output in transaction.outputs)
-        
+        if parents and len(mempool.get_ancestors(parents)) + 1 > mempool.max_ancestors:
+            return _reject("too_many_ancestors", f"Validation Error: Unconfirmed chain longer than {mempool.max_ancestors} transactions.")
+
+        if total_input_value > MAX_MONEY:
+            return _reject("input_too_large", "Validation Error: Total input exceeds the maximum money supply.")
+
+        # Rule 3: Ensure sufficient funds
         if total_input_value < total_output_value:
-            return False, f"Validation Error: Insufficient funds. Inputs ({total_input_value}) < Outputs ({total_output_value})."
+            return _reject("insufficient_funds",
+                           f"Validation Error: Insufficient funds. Inputs ({format_btc(total_input_value)}) "
+                           f"< Outputs ({format_btc(total_output_value)}).")
 
-        # Safe Decimal subtraction for exact fee calculation
+        # Exact integer fee
         fee = total_input_value - total_output_value
-        
+
         # Rule: Fee must be positive (non-zero)
         if fee < 0:
-             return False, "Validation Error: Zero or negative fee transactions are not allowed."
+             return _reject("negative_fee", "Validation Error: Zero or negative fee transactions are not allowed.")
 
-        return True, f"Transaction valid! Fee: {fee} BTC"
\ No newline at end of file
+        totals = (tuple(input_values), total_input_value, total_output_value, fee, parents, conflicts)
+        return True, f"Transaction valid! Fee: {format_btc(fee)} BTC", totals
@@ -0,0 +1,384 @@
+import struct
+from src.block import Block
+from src.transaction import Transaction
+
+# Binary wire format for transactions and mined blocks. Counts, indexes, the
+# nonce and the block height are unsigned LEB128 varints; amounts are fixed
+# 8-byte little-endian integers.
+#
+# Each record carries a string table and refers to names by position in it:
+#   entry    : varint 0 followed by 32 raw bytes (a 64-hex-char tx id), or
+#              varint 2 * length + 1 followed by that many UTF-8 bytes
+# so an address used many times, or a tx id, costs one byte after the first.
+#
+#   transaction : version (u8), string table, tx body
+#   tx body     : nonce, sender ref, recipient ref,
+#                 input count, inputs (prev_tx ref, index, owner ref),
+#                 output count, outputs (amount i64, address ref)
+#   block       : version (u8), height, prev_hash (32 bytes), fees (i64),
+#                 commitment flag (u8), utxo_commitment (32 bytes, only if the flag is 1)
+#                 (version 1 blocks have neither and still decode),
+#                 string table shared by all its transactions,
+#                 tx count, tx bodies (coinbase first),
+#                 undo count per non-coinbase tx, entries (prev_tx ref, index, amount i64, owner ref)
+#
+# Transaction and block records are versioned separately, WIRE_VERSION and
+# BLOCK_VERSION, so a change to one layout does not invalidate the other.
+# A transaction file is WIRE_MAGIC, a u16 version, then any number of
+# transaction records each preceded by its varint byte length. A block log is
+# the same with BLOCK_LOG_MAGIC, BLOCK_VERSION and block records, in chain order.
+# The tx id is still the hash of Transaction.serialize(); this format is only
+# for moving and storing transactions compactly.
+WIRE_MAGIC = b"UTXOWIRE"
+BLOCK_LOG_MAGIC = b"UTXOBLKS"
+WIRE_VERSION = 1
+BLOCK_VERSION = 2 # 2 added the block's UTXO commitment
+_BLOCK_VERSIONS = (1, 2)
+_FILE_HEADER = struct.Struct("<8sH")
+_I64 = struct.Struct("<q")
+_HASH_BYTES = 32
+_HEX_DIGITS = frozenset("0123456789abcdef")
+
+
+class WireError(ValueError):
+    """Raised when wire data is truncated, corrupt or of an unknown version."""
+
+
+# --- Encoding ---
+
+def _varint(value, out):
+    if value < 0:
+        raise ValueError(f"Cannot encode negative value {value} as a varint.")
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+class _StringTable:
+    """Interns strings in first-use order for one record."""
+
+    def __init__(self):
+        self.ids = {}
+
+    def ref(self, value, out):
+        idx = self.ids.get(value)
+        if idx is None:
+            idx = self.ids[value] = len(self.ids)
+        _varint(idx, out)
+
+    def encode(self, out):
+        _varint(len(self.ids), out)
+        for value in self.ids:
+            if len(value) == 2 * _HASH_BYTES and _HEX_DIGITS.issuperset(value):
+                out.append(0)
+                out += bytes.fromhex(value)
+            else:
+                raw = value.encode("utf-8")
+                _varint(2 * len(raw) + 1, out)
+                out += raw
+
+
+def _encode_tx_body(tx, table, out):
+    _varint(tx.nonce, out)
+    table.ref(tx.sender, out)
+    table.ref(tx.recipient, out)
+    _varint(len(tx.inputs), out)
+    for inp in tx.inputs:
+        table.ref(inp['prev_tx'], out)
+        _varint(inp['index'], out)
+        table.ref(inp['owner'], out)
+    _varint(len(tx.outputs), out)
+    for output in tx.outputs:
+        out += _I64.pack(output['amount'])
+        table.ref(output['address'], out)
+
+
+def _checked(encode):
+    """Reports unencodable values (out-of-range integers, non-string names) as ValueError."""
+    try:
+        return encode()
+    except (struct.error, AttributeError, TypeError) as e:
+        raise ValueError(f"Cannot encode: {e}") from e
+
+
+def encode_transaction(tx):
+    """Encodes one transaction as a self-contained record."""
+    def encode():
+        table, body = _StringTable(), bytearray()
+        _encode_tx_body(tx, table, body)
+        out = bytearray([WIRE_VERSION])
+        table.encode(out)
+        out += body
+        return bytes(out)
+    return _checked(encode)
+
+
+def encode_block(block):
+    """Encodes a mined block, its transactions and its undo data."""
+    def encode():
+        table, body = _StringTable(), bytearray()
+        _varint(len(block.transactions), body)
+        for tx in block.transactions:
+            _encode_tx_body(tx, table, body)
+        for spent in block.undo:
+            _varint(len(spent), body)
+            for tx_id, index, amount, owner in spent:
+                table.ref(tx_id, body)
+                _varint(index, body)
+                body += _I64.pack(amount)
+                table.ref(owner, body)
+
+        out = bytearray([BLOCK_VERSION])
+        _varint(block.height, out)
+        out += bytes.fromhex(block.prev_hash)
+        out += _I64.pack(block.fees)
+        if block.utxo_commitment is None:
+            out.append(0)
+        else:
+            commitment = bytes.fromhex(block.utxo_commitment)
+            if len(commitment) != _HASH_BYTES:
+                raise ValueError(f"Cannot encode: UTXO commitment is {len(commitment)} bytes, not {_HASH_BYTES}")
+            out.append(1)
+            out += commitment
+        table.encode(out)
+        out += body
+        return bytes(out)
+    return _checked(encode)
+
+
+# --- Decoding ---
+# Decoders walk a memoryview with an offset: numbers are read in place and
+# only the final str objects are materialized.
+
+def _read_varint(buf, pos):
+    byte = buf[pos]
+    if byte < 0x80:
+        return byte, pos + 1
+    value, shift = byte & 0x7F, 7
+    while True:
+        pos += 1
+        byte = buf[pos]
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos + 1
+        shift += 7
+        if shift > 63:
+            raise WireError("Varint is longer than 64 bits.")
+
+
+def _read_table(buf, pos):
+    count, pos = _read_varint(buf, pos)
+    strings = []
+    size = len(buf)
+    for _ in range(count):
+        header = buf[pos]
+        if header < 0x80:
+            pos += 1
+        else:
+            header, pos = _read_varint(buf, pos)
+        if header == 0:
+            end = pos + _HASH_BYTES
+            if end > size:
+                raise IndexError("tx id runs past the end of the data")
+            strings.append(buf[pos:end].hex())
+        else:
+            end = pos + (header >> 1)
+            if end > size:
+                raise IndexError("string runs past the end of the data")
+            strings.append(str(buf[pos:end], "utf-8"))
+        pos = end
+    return strings, pos
+
+
+def _decode_tx_body(buf, pos, strings):
+    # Hot loop: every field is read inline when it fits in one varint byte,
+    # which string refs, indexes and counts almost always do
+    read_varint = _read_varint
+    nonce, pos = read_varint(buf, pos)
+    sender, pos = read_varint(buf, pos)
+    recipient, pos = read_varint(buf, pos)
+    count, pos = read_varint(buf, pos)
+    inputs = []
+    for _ in range(count):
+        prev_tx = buf[pos]
+        if prev_tx < 0x80:
+            pos += 1
+        else:
+            prev_tx, pos = read_varint(buf, pos)
+        index = buf[pos]
+        if index < 0x80:
+            pos += 1
+        else:
+            index, pos = read_varint(buf, pos)
+        owner = buf[pos]
+        if owner < 0x80:
+            pos += 1
+        else:
+            owner, pos = read_varint(buf, pos)
+        inputs.append({"prev_tx": strings[prev_tx], "index": index, "owner": strings[owner]})
+    count, pos = read_varint(buf, pos)
+    outputs = []
+    unpack_amount = _I64.unpack_from
+    for _ in range(count):
+        (amount,) = unpack_amount(buf, pos)
+        pos += 8
+        address = buf[pos]
+        if address < 0x80:
+            pos += 1
+        else:
+            address, pos = read_varint(buf, pos)
+        outputs.append({"amount": amount, "address": strings[address]})
+    tx = Transaction(sender=strings[sender], recipient=strings[recipient],
+                     inputs=inputs, outputs=outputs, nonce=nonce)
+    return tx, pos
+
+
+def _decode_tx_record(buf, pos):
+    strings, pos = _read_table(buf, pos)
+    return _decode_tx_body(buf, pos, strings)
+
+
+def _decoding(decode, data, versions=(WIRE_VERSION,)):
+    """Runs a decoder over a view of `data`, turning malformed input into WireError."""
+    with memoryview(data) as buf:
+        if buf.ndim != 1 or buf.itemsize != 1:
+            raise WireError("Wire data must be a flat byte buffer.")
+        if not len(buf):
+            raise WireError("Wire data is empty.")
+        if buf[0] not in versions:
+            raise WireError(f"Unsupported wire version {buf[0]}.")
+        try:
+            result, pos = decode(buf, 1)
+        except (IndexError, struct.error) as e:
+            raise WireError(f"Wire data is truncated or corrupt: {e}") from e
+        except UnicodeDecodeError as e:
+            raise WireError(f"Wire data holds invalid UTF-8: {e}") from e
+        if pos != len(buf):
+            raise WireError(f"{len(buf) - pos} unexpected bytes after the record.")
+        return result
+
+
+def decode_transaction(data):
+    """Decodes a record from encode_transaction (bytes, bytearray or memoryview)."""
+    return _decoding(_decode_tx_record, data)
+
+
+def decode_block(data):
+    """Decodes a record from encode_block back into a Block."""
+    def decode(buf, pos):
+        height, pos = _read_varint(buf, pos)
+        end = pos + _HASH_BYTES
+        if end > len(buf):
+            raise IndexError("block header runs past the end of the data")
+        prev_hash = buf[pos:end].hex()
+        (fees,) = _I64.unpack_from(buf, end)
+        pos = end + 8
+        utxo_commitment = None
+        if buf[0] >= 2: # Version 1 blocks were written before blocks carried one
+            flag, pos = buf[pos], pos + 1
+            if flag:
+                end = pos + _HASH_BYTES
+                if end > len(buf):
+                    raise IndexError("block commitment runs past the end of the data")
+                utxo_commitment = buf[pos:end].hex()
+                pos = end
+        strings, pos = _read_table(buf, pos)
+
+        count, pos = _read_varint(buf, pos)
+        transactions = []
+        for _ in range(count):
+            tx, pos = _decode_tx_body(buf, pos, strings)
+            transactions.append(tx)
+        undo = []
+        for _ in range(max(0, count - 1)):
+            n_spent, pos = _read_varint(buf, pos)
+            spent = []
+            for _ in range(n_spent):
+                tx_id, pos = _read_varint(buf, pos)
+                index, pos = _read_varint(buf, pos)
+                (amount,) = _I64.unpack_from(buf, pos)
+                owner, pos = _read_varint(buf, pos + 8)
+                spent.append((strings[tx_id], index, amount, strings[owner]))
+            undo.append(spent)
+        return Block(height, prev_hash, transactions, undo, fees, utxo_commitment), pos
+    return _decoding(decode, data, _BLOCK_VERSIONS)
+
+
+# --- Transaction files and block logs ---
+
+def _dump_records(records, f, magic, version, encode):
+    f.write(_FILE_HEADER.pack(magic, version))
+    count = 0
+    prefix = bytearray()
+    for item in records:
+        record = encode(item)
+        prefix.clear()
+        _varint(len(record), prefix)
+        f.write(prefix)
+        f.write(record)
+        count += 1
+    return count
+
+
+def _iter_records(f, chunk_size, magic, versions, decode, kind):
+    header = f.read(_FILE_HEADER.size)
+    if len(header) < _FILE_HEADER.size:
+        raise WireError(f"{kind} is truncated.")
+    file_magic, version = _FILE_HEADER.unpack(header)
+    if file_magic != magic:
+        raise WireError(f"Not a {kind.lower()}.")
+    if version not in versions:
+        raise WireError(f"Unsupported {kind.lower()} version {version}.")
+
+    pending = bytearray()
+    eof = False
+    while not eof:
+        chunk = f.read(chunk_size)
+        if chunk:
+            pending += chunk
+        else:
+            eof = True
+
+        pos, decoded = 0, []
+        # The view must be released before `pending` can be resized
+        with memoryview(pending) as buf:
+            while pos < len(buf):
+                try:
+                    length, start = _read_varint(buf, pos)
+                except IndexError:
+                    break # Length prefix split across reads
+                if start + length > len(buf):
+                    break
+                with buf[start:start + length] as record:
+                    decoded.append(decode(record))
+                pos = start + length
+        del pending[:pos]
+        yield from decoded
+
+    if pending:
+        raise WireError(f"{kind} ends with {len(pending)} bytes of a partial record.")
+
+
+def dump_transactions(txs, f):
+    """Writes a transaction file to the binary file object `f`; returns the count written."""
+    return _dump_records(txs, f, WIRE_MAGIC, WIRE_VERSION, encode_transaction)
+
+
+def iter_transactions(f, chunk_size=1 << 16):
+    """
+    Yields the transactions in a file written by dump_transactions, reading
+    `chunk_size` bytes at a time, so memory use does not depend on file size.
+    """
+    return _iter_records(f, chunk_size, WIRE_MAGIC, (WIRE_VERSION,), decode_transaction,
+                         "Transaction file")
+
+
+def dump_blocks(blocks, f):
+    """Writes a block log (blocks in chain order) to `f`; returns the count written."""
+    return _dump_records(blocks, f, BLOCK_LOG_MAGIC, BLOCK_VERSION, encode_block)
+
+
+def iter_blocks(f, chunk_size=1 << 16):
+    """Yields the blocks in a log written by dump_blocks, `chunk_size` bytes at a time."""
+    return _iter_records(f, chunk_size, BLOCK_LOG_MAGIC, _BLOCK_VERSIONS, decode_block, "Block log")
@@ -1,8 +1,14 @@
 from src.transaction import Transaction
-from src.block import mine_block
+from src.block import Block, mine_block, disconnect_block
 from src.utxo_manager import UTXOManager
+from src.compact_utxo import CompactUTXOManager
 from src.mempool import Mempool
-from decimal import Decimal
+from src.utxo_view import UTXOView
+from src.validate import Validator
+from src.coin_selection import bump_fee
+from src.amount import to_satoshis, format_btc
+from src import wire
+import io
 
 # --- Helper Functions for Formatting ---
 def print_header(title):
@@ -41,7 +47,7 @@ def test_1_basic_valid(mempool, utxo_manager):
 
     tx = Transaction(sender="Alice", recipient="Bob",
                      inputs=[{"prev_tx": "genesis", "index": 0, "owner": "Alice"}], # 50 BTC
-                     outputs=[{"amount": 10.0, "address": "Bob"}, {"amount": 39.999, "address": "Alice"}])
+                     outputs=[{"amount": to_satoshis("10.0"), "address": "Bob"}, {"amount": to_satoshis("39.999"), "address": "Alice"}])
     
     res, msg = mempool.add_transaction(tx, utxo_manager)
     print_result(res, msg)
@@ -63,7 +69,7 @@ def test_2_multi_input(mempool, utxo_manager):
 
     tx_setup = Transaction(sender="Charlie", recipient="Alice",
                            inputs=[{"prev_tx": "genesis", "index": 2, "owner": "Charlie"}],
-                           outputs=[{"amount": 20.0, "address": "Alice"}])
+                           outputs=[{"amount": to_satoshis("20.0"), "address": "Alice"}])
     res_s, msg_s = mempool.add_transaction(tx_setup, utxo_manager)
     print(f"    -> Setup TX (Charlie->Alice): {msg_s}")
 
@@ -93,14 +99,14 @@ def test_2_multi_input(mempool, utxo_manager):
     input1 = alice_utxos[0] 
     input2 = alice_utxos[1]
 
-    print(f"    -> Inputs selected: {input1['amount']} BTC & {input2['amount']} BTC")
+    print(f"    -> Inputs selected: {format_btc(input1['amount'])} BTC & {format_btc(input2['amount'])} BTC")
 
     tx2 = Transaction(sender="Alice", recipient="Bob",
                       inputs=[
                           {"prev_tx": input1['tx_id'], "index": input1['index'], "owner": "Alice"},
                           {"prev_tx": input2['tx_id'], "index": input2['index'], "owner": "Alice"}
                       ],
-                      outputs=[{"amount": 50.0, "address": "Bob"}, {"amount": 9.998, "address": "Alice"}])
+                      outputs=[{"amount": to_satoshis("50.0"), "address": "Bob"}, {"amount": to_satoshis("9.998"), "address": "Alice"}])
     
     res2, msg2 = mempool.add_transaction(tx2, utxo_manager)
     print_result(res2, msg2)
@@ -119,7 +125,7 @@ def test_3_double_spend_same_tx(mempool, utxo_manager):
     tx3 = Transaction(sender="Bob", recipient="Eve",
                       inputs=[{"prev_tx": "genesis", "index": 1, "owner": "Bob"},
                               {"prev_tx": "genesis", "index": 1, "owner": "Bob"}],
-                      outputs=[{"amount": 10.0, "address": "Eve"}])
+                      outputs=[{"amount": to_satoshis("10.0"), "address": "Eve"}])
     
     res3, msg3 = mempool.add_transaction(tx3, utxo_manager)
     print_result(res3, msg3)
@@ -132,7 +138,7 @@ def test_4_mempool_double_spend(mempool, utxo_manager):
     
     tx4 = Transaction(sender="Alice", recipient="Charlie",
                       inputs=[{"prev_tx": "genesis", "index": 0, "owner": "Alice"}],
-                      outputs=[{"amount": 5.0, "address": "Charlie"}])
+                      outputs=[{"amount": to_satoshis("5.0"), "address": "Charlie"}])
     
     res4, msg4 = mempool.add_transaction(tx4, utxo_manager)
     print_result(res4, msg4)
@@ -145,7 +151,7 @@ def test_5_insufficient_funds(mempool, utxo_manager):
 
     tx5 = Transaction(sender="Bob", recipient="Alice",
                       inputs=[{"prev_tx": "genesis", "index": 1, "owner": "Bob"}],
-                      outputs=[{"amount": 35.0, "address": "Alice"}])
+                      outputs=[{"amount": to_satoshis("35.0"), "address": "Alice"}])
     
     res5, msg5 = mempool.add_transaction(tx5, utxo_manager)
     print_result(res5, msg5)
@@ -158,7 +164,7 @@ def test_6_negative_amount(mempool, utxo_manager):
 
     tx6 = Transaction(sender="David", recipient="Alice",
                       inputs=[{"prev_tx": "genesis", "index": 3, "owner": "David"}],
-                      outputs=[{"amount": -5.0, "address": "Alice"}])
+                      outputs=[{"amount": to_satoshis("-5.0"), "address": "Alice"}])
     
     res6, msg6 = mempool.add_transaction(tx6, utxo_manager)
     print_result(res6, msg6)
@@ -176,7 +182,7 @@ def test_7_zero_fee(mempool, utxo_manager):
 
     tx7 = Transaction(sender="David", recipient="Eve",
                       inputs=[{"prev_tx": "genesis", "index": 3, "owner": "David"}],
-                      outputs=[{"amount": 10.0, "address": "Eve"}])
+                      outputs=[{"amount": to_satoshis("10.0"), "address": "Eve"}])
     
     res7, msg7 = mempool.add_transaction(tx7, utxo_manager)
     print_result(res7, msg7)
@@ -189,7 +195,7 @@ def test_8_race_attack(mempool, utxo_manager):
 
     tx8 = Transaction(sender="Alice", recipient="Eve",
                       inputs=[{"prev_tx": "genesis", "index": 0, "owner": "Alice"}],
-                      outputs=[{"amount": 10.0, "address": "Eve"}, {"amount": 30.0, "address": "Alice"}]) 
+                      outputs=[{"amount": to_satoshis("10.0"), "address": "Eve"}, {"amount": to_satoshis("30.0"), "address": "Alice"}]) 
     
     res8, msg8 = mempool.add_transaction(tx8, utxo_manager)
     print_result(res8, msg8)
@@ -209,7 +215,7 @@ def test_9_mining_flow(mempool, utxo_manager):
     post_balance = utxo_manager.get_balance(miner_name)
     
     if success:
-        print(f"    -> Block Mined! Miner Reward: {post_balance - pre_balance} BTC")
+        print(f"    -> Block Mined! Miner Reward: {format_btc(post_balance - pre_balance)} BTC")
         print_status(True)
         return True
     else:
@@ -219,8 +225,8 @@ def test_9_mining_flow(mempool, utxo_manager):
 
 def test_10_unconfirmed_chain(mempool, utxo_manager):
     print_header("Test 10: Unconfirmed Chain")
-    print_action("Create Parent TX -> Try to spend Parent Output immediately", 
-                 "Child TX REJECTED (Must wait for mining)")
+    print_action("Create Parent TX -> Spend Parent Output immediately -> Mine",
+                 "Child TX ACCEPTED, then mined together with its parent (CPFP)")
 
     # 1. Create Parent (Bob -> Alice)
     # We check if Bob has money. If genesis:1 was spent, we might fail here.
@@ -233,7 +239,7 @@ def test_10_unconfirmed_chain(mempool, utxo_manager):
 
     tx_parent = Transaction(sender="Bob", recipient="Alice",
                             inputs=[{"prev_tx": "genesis", "index": 1, "owner": "Bob"}], 
-                            outputs=[{"amount": 5.0, "address": "Alice"}, {"amount": 24.999, "address": "Bob"}])
+                            outputs=[{"amount": to_satoshis("5.0"), "address": "Alice"}, {"amount": to_satoshis("24.999"), "address": "Bob"}])
     res_p, msg_p = mempool.add_transaction(tx_parent, utxo_manager)
     print(f"    -> Parent TX Result: {msg_p}")
 
@@ -243,17 +249,275 @@ def test_10_unconfirmed_chain(mempool, utxo_manager):
         
         tx_child = Transaction(sender="Alice", recipient="Frank",
                                inputs=[{"prev_tx": parent_txid, "index": 0, "owner": "Alice"}],
-                               outputs=[{"amount": 2.0, "address": "Frank"}])
+                               outputs=[{"amount": to_satoshis("2.0"), "address": "Frank"}])
                                
         res10, msg10 = mempool.add_transaction(tx_child, utxo_manager)
         print_result(res10, msg10)
-        print("    -> Design Decision: Simulator requires mined UTXOs.")
-        print_status(not res10)
-        return not res10
+        if not res10:
+            print_status(False)
+            return False
+
+        # 3. The child's fee pulls the parent into the block; parent is applied first
+        pre_frank = utxo_manager.get_balance("Frank")
+        mine_block("Miner_1", mempool, utxo_manager)
+        confirmed = (tx_child.tx_id not in mempool.entries
+                     and utxo_manager.get_balance("Frank") - pre_frank == to_satoshis("2.0"))
+        print(f"    -> Parent and child confirmed in one block: {confirmed}")
+        print_status(confirmed)
+        return confirmed
     else:
         print_status(False)
         return False
 
+def test_11_block_disconnect(mempool, utxo_manager):
+    print_header("Test 11: Block Disconnect (Reorg)")
+    print_action("Mine a block, then disconnect it", "UTXO set restored, transactions back in mempool")
+
+    # Spend any available UTXO so the block is never empty
+    (prev_tx, index), data = next(iter(utxo_manager.utxo_set.items()))
+    if (prev_tx, index) in mempool.spent_utxos:
+        print("    -> Error: No unspent UTXO free of pending spends (mine a block first).")
+        print_status(False)
+        return False
+    tx = Transaction(sender=data['owner'], recipient="Grace",
+                     inputs=[{"prev_tx": prev_tx, "index": index, "owner": data['owner']}],
+                     outputs=[{"amount": data['amount'] - to_satoshis("0.001"), "address": "Grace"}])
+    res, msg = mempool.add_transaction(tx, utxo_manager)
+    print_result(res, msg)
+    if not res:
+        print_status(False)
+        return False
+
+    utxos_before = dict(utxo_manager.utxo_set)
+    block = mine_block("Miner_Reorg", mempool, utxo_manager)
+    dropped = disconnect_block(block, mempool, utxo_manager)
+
+    restored = (not dropped
+                and dict(utxo_manager.utxo_set) == utxos_before
+                and all(t.tx_id in mempool.entries for t in block.transactions[1:]))
+    print(f"    -> UTXO set restored and block transactions back in mempool: {restored}")
+    print_status(restored)
+    return restored
+
+def test_12_speculative_block(mempool, utxo_manager):
+    print_header("Test 12: Speculative Block Validation (UTXO View)")
+    print_action("Validate a parent+child block, then a double-spending block, on a view",
+                 "First valid, second rejected, real UTXO set untouched")
+
+    (prev_tx, index), data = next(iter(utxo_manager.utxo_set.items()))
+    owner, amount = data['owner'], data['amount']
+    parent = Transaction(sender=owner, recipient="Heidi",
+                         inputs=[{"prev_tx": prev_tx, "index": index, "owner": owner}],
+                         outputs=[{"amount": amount, "address": "Heidi"}])
+    child = Transaction(sender="Heidi", recipient="Ivan",
+                        inputs=[{"prev_tx": parent.tx_id, "index": 0, "owner": "Heidi"}],
+                        outputs=[{"amount": amount, "address": "Ivan"}])
+    rival = Transaction(sender=owner, recipient="Judy",
+                        inputs=[{"prev_tx": prev_tx, "index": index, "owner": owner}],
+                        outputs=[{"amount": amount, "address": "Judy"}])
+
+    utxos_before = dict(utxo_manager.utxo_set)
+    ok_good, msg_good, view = Validator.check_block([parent, child], utxo_manager)
+    print_result(ok_good, msg_good)
+    ok_bad, msg_bad, _ = Validator.check_block([parent, rival], utxo_manager)
+    print_result(ok_bad, msg_bad)
+
+    passed = (ok_good and not ok_bad
+              and view.get_balance("Ivan") - utxo_manager.get_balance("Ivan") == amount
+              and dict(utxo_manager.utxo_set) == utxos_before)
+    print_status(passed)
+    return passed
+
+def test_13_mempool_limits(mempool, utxo_manager):
+    print_header("Test 13: Mempool Byte Budget and Expiry")
+    print_action("Fill a 2-transaction byte budget, send a low then a high fee rate tx, then let time pass",
+                 "Low rate rejected, high rate evicts the cheapest, old entries expire")
+
+    # A private pool with a fake clock, so the shared test pool is not touched
+    spendable = [(key, data) for key, data in utxo_manager.utxo_set.items()
+                 if key not in mempool.spent_utxos][:4]
+    if len(spendable) < 4:
+        print("    -> Error: Need 4 unspent UTXOs free of pending spends.")
+        print_status(False)
+        return False
+
+    def spend(n, fee):
+        (prev_tx, index), data = spendable[n]
+        return Transaction(sender=data['owner'], recipient="Karl",
+                           inputs=[{"prev_tx": prev_tx, "index": index, "owner": data['owner']}],
+                           outputs=[{"amount": data['amount'] - fee, "address": "Karl"}])
+
+    clock = [0.0]
+    txs = [spend(n, fee) for n, fee in enumerate([to_satoshis("0.002"), to_satoshis("0.001"),
+                                                  to_satoshis("0.0005"), to_satoshis("0.003")])]
+    pool = Mempool(max_bytes=2 * txs[0].size(), expiry=3600, clock=lambda: clock[0])
+    pool.add_transaction(txs[0], utxo_manager)
+    pool.add_transaction(txs[1], utxo_manager)
+    low_ok, msg = pool.add_transaction(txs[2], utxo_manager)
+    print_result(low_ok, msg)
+    clock[0] = 1800.0
+    high_ok, msg = pool.add_transaction(txs[3], utxo_manager)
+    print_result(high_ok, msg)
+    evicted = txs[1].tx_id not in pool.entries
+    clock[0] = 3601.0
+    expired = pool.expire()
+    print(f"    -> Expired after an hour: {len(expired)} transaction(s), {len(pool)} left")
+
+    passed = (not low_ok and high_ok and evicted
+              and expired == [txs[0].tx_id] and txs[3].tx_id in pool.entries
+              and pool.total_bytes == txs[3].size())
+    print_status(passed)
+    return passed
+
+def test_14_replace_by_fee(mempool, utxo_manager):
+    print_header("Test 14: Replace-By-Fee")
+    print_action("Send with a low fee, re-send at the same fee, then bump the fee;\n"
+                 "              in a full pool, replace a cheap tx with a bigger one that does not fit",
+                 "Same-fee double-spend REJECTED, bump ACCEPTED, oversized replacement REJECTED with originals kept")
+
+    # Private pools that allow replacements, so the shared test pool is not touched
+    spendable = [(key, data) for key, data in utxo_manager.utxo_set.items()
+                 if key not in mempool.spent_utxos and data['amount'] >= to_satoshis("0.01")][:2]
+    if len(spendable) < 2:
+        print("    -> Error: Need 2 unspent UTXOs of at least 0.01 BTC free of pending spends.")
+        print_status(False)
+        return False
+
+    def pay(n, recipient, fee, split=True):
+        (prev_tx, index), data = spendable[n]
+        owner = data['owner']
+        if not split:
+            outputs = [{"amount": data['amount'] - fee, "address": recipient}]
+        else:
+            half = data['amount'] // 2
+            outputs = [{"amount": half, "address": recipient},
+                       {"amount": data['amount'] - half - fee, "address": owner}]
+        return Transaction(sender=owner, recipient=recipient,
+                           inputs=[{"prev_tx": prev_tx, "index": index, "owner": owner}],
+                           outputs=outputs)
+
+    pool = Mempool(replace_by_fee=True)
+    original = pay(0, "Lena", to_satoshis("0.00001"))
+    pool.add_transaction(original, utxo_manager)
+    same_ok, msg = pool.add_transaction(pay(0, "Mallory", to_satoshis("0.00001")), utxo_manager)
+    print_result(same_ok, msg)
+    bumped = bump_fee(pool, original.tx_id, fee_rate=to_satoshis("0.0001"))
+    bump_ok, msg = pool.add_transaction(bumped, utxo_manager)
+    print_result(bump_ok, msg)
+    replaced = (original.tx_id not in pool.entries
+                and pool.spent_utxos[spendable[0][0]] == bumped.tx_id)
+
+    # Room for exactly two 1-output txs; the 2-output replacement outbids the
+    # cheap one but not the other, so it would be trimmed right after entering
+    cheap = pay(0, "Lena", to_satoshis("0.00001"), split=False)
+    rich = pay(1, "Lena", to_satoshis("0.001"), split=False)
+    full = Mempool(replace_by_fee=True, max_bytes=cheap.size() + rich.size())
+    full.add_transaction(cheap, utxo_manager)
+    full.add_transaction(rich, utxo_manager)
+    big_ok, msg = full.add_transaction(pay(0, "Mallory", to_satoshis("0.0001")), utxo_manager)
+    print_result(big_ok, msg)
+    kept = cheap.tx_id in full.entries and rich.tx_id in full.entries
+
+    passed = not same_ok and bump_ok and replaced and not big_ok and kept
+    print_status(passed)
+    return passed
+
+def test_15_compact_backend(mempool, utxo_manager):
+    print_header("Test 15: Compact UTXO Backend")
+    print_action("Copy the UTXO set into the columnar store, add out-of-range rows, then mine and disconnect",
+                 "Bad rows REJECTED with the set unchanged, block round-trips to the same commitment")
+
+    compact = CompactUTXOManager()
+    for (tx_id, index), data in utxo_manager.utxo_set.items():
+        compact.add_utxo(tx_id, index, data['amount'], data['owner'])
+    same = (compact.commitment() == utxo_manager.commitment()
+            and all(compact.get_balance(data['owner']) == utxo_manager.get_balance(data['owner'])
+                    for data in utxo_manager.utxo_set.values()))
+
+    # Rows the typed columns cannot hold must fail before anything is changed
+    before = (len(compact), compact.commitment())
+    rejected = 0
+    for index, amount in [(-1, 1), (1 << 32, 1), (0, 1 << 63)]:
+        try:
+            compact.add_utxo("bad", index, amount, "Mallory")
+        except ValueError as e:
+            rejected += 1
+            print_result(False, str(e))
+    unchanged = (len(compact), compact.commitment()) == before and compact.get_balance("Mallory") == 0
+
+    # A private pool, so the shared test pool is not touched
+    (prev_tx, index), data = next(item for item in compact.utxo_set.items()
+                                  if item[1]['amount'] >= to_satoshis("0.01"))
+    tx = Transaction(sender=data['owner'], recipient="Nina",
+                     inputs=[{"prev_tx": prev_tx, "index": index, "owner": data['owner']}],
+                     outputs=[{"amount": data['amount'] - to_satoshis("0.001"), "address": "Nina"}])
+    pool = Mempool()
+    ok, msg = pool.add_transaction(tx, compact)
+    print_result(ok, msg)
+    block = mine_block("Miner_Compact", pool, compact, verbose=False)
+    mined = block is not None and compact.get_balance("Nina") == data['amount'] - to_satoshis("0.001")
+    disconnect_block(block, pool, compact, verbose=False)
+    restored = compact.commitment() == before[1] and tx.tx_id in pool.entries
+
+    passed = same and rejected == 3 and unchanged and ok and mined and restored
+    print_status(passed)
+    return passed
+
+def test_16_amount_exponents(mempool, utxo_manager):
+    print_header("Test 16: Amounts With Extreme Exponents")
+    print_action("Parse 1e9999999 and 1e-9999999 BTC, then 1e-8 BTC",
+                 "Both extremes REJECTED as invalid amounts, 1e-8 BTC is 1 satoshi")
+
+    rejected = 0
+    for text in ["1e9999999", "1e-9999999"]:
+        try:
+            to_satoshis(text)
+            print_result(True, f"{text} BTC was accepted")
+        except ValueError as e:
+            rejected += 1
+            print_result(False, str(e))
+    passed = rejected == 2 and to_satoshis("1e-8") == 1
+    print_status(passed)
+    return passed
+
+# Written by the version 1 wire format: a transaction record and file, and a
+# coinbase-only block from before blocks carried a UTXO commitment
+V1_TX_RECORD = bytes.fromhex(
+    "01030b416c69636507426f620f67656e65736973070001010200000200ca9a3b00000000"
+    "0160a169ee0000000000")
+V1_TX_FILE = bytes.fromhex("5554584f5749524501002e") + V1_TX_RECORD
+V1_TX_ID = "3c29db3a615883580126dd65325d4e820ce9983074ac7a59603928bdcaba6059"
+V1_BLOCK_RECORD = bytes.fromhex(
+    "01010000000000000000000000000000000000000000000000000000000000000000a086"
+    "010000000000020d53595354454d0f4d696e65725f31012a00010001a086010000000000"
+    "01")
+V1_BLOCK_HASH = "7881a51c974447cb227cd96391c6ba09fefe39cbf179144bce4090fdf81c5922"
+
+def test_17_wire_versions(mempool, utxo_manager):
+    print_header("Test 17: Wire Format Versions")
+    print_action("Load version 1 transaction and block records, then round-trip a block with a commitment",
+                 "Old records DECODE unchanged, the commitment survives the round trip")
+
+    tx = wire.decode_transaction(V1_TX_RECORD)
+    old_tx = tx.tx_id == V1_TX_ID and wire.encode_transaction(tx) == V1_TX_RECORD
+    old_file = [t.tx_id for t in wire.iter_transactions(io.BytesIO(V1_TX_FILE))] == [V1_TX_ID]
+    block = wire.decode_block(V1_BLOCK_RECORD)
+    old_block = block.block_hash == V1_BLOCK_HASH and block.utxo_commitment is None
+    print_result(old_tx and old_file and old_block, f"Version 1 tx {tx.tx_id[:16]}... and block {block.height} decoded")
+
+    committed = Block(block.height, block.prev_hash, block.transactions, block.undo, block.fees,
+                      utxo_manager.commitment())
+    log = io.BytesIO()
+    wire.dump_blocks([committed], log)
+    log.seek(0)
+    (copy,) = wire.iter_blocks(log)
+    kept = copy.utxo_commitment == committed.utxo_commitment and copy.block_hash == V1_BLOCK_HASH
+    print_result(kept, f"Block commitment after the round trip: {copy.utxo_commitment}")
+
+    passed = old_tx and old_file and old_block and kept
+    print_status(passed)
+    return passed
+
 def print_final_balances(utxo_manager):
     print_header("FINAL BALANCES (TEST ENVIRONMENT)")
     people = ["Alice", "Bob", "Charlie", "David", "Eve", "Frank", "Miner_1", "Miner_Test2"]
@@ -262,7 +526,7 @@ def print_final_balances(utxo_manager):
 
     for person in all_people:
         balance = utxo_manager.get_balance(person)
-        print(f"    {person:<15}: {balance} BTC")
+        print(f"    {person:<15}: {format_btc(balance)} BTC")
     print(f"{'='*60}\n")
 
 # --- Context Manager ---
@@ -271,11 +535,11 @@ def reset_test_environment():
     utxo_manager = UTXOManager()
     mempool = Mempool()
     # Genesis Setup
-    utxo_manager.add_utxo("genesis", 0, 50.0, "Alice")
-    utxo_manager.add_utxo("genesis", 1, 30.0, "Bob")
-    utxo_manager.add_utxo("genesis", 2, 20.0, "Charlie") 
-    utxo_manager.add_utxo("genesis", 3, 10.0, "David")
-    utxo_manager.add_utxo("genesis", 4, 5.0, "Eve")
+    utxo_manager.add_utxo("genesis", 0, to_satoshis("50.0"), "Alice")
+    utxo_manager.add_utxo("genesis", 1, to_satoshis("30.0"), "Bob")
+    utxo_manager.add_utxo("genesis", 2, to_satoshis("20.0"), "Charlie") 
+    utxo_manager.add_utxo("genesis", 3, to_satoshis("10.0"), "David")
+    utxo_manager.add_utxo("genesis", 4, to_satoshis("5.0"), "Eve")
     print("\n[!] Test Environment Reset: Genesis State Restored.")
     return utxo_manager, mempool
 
@@ -294,12 +558,20 @@ def run_tests():
         7: test_7_zero_fee,
         8: test_8_race_attack,
         9: test_9_mining_flow,
-        10: test_10_unconfirmed_chain
+        10: test_10_unconfirmed_chain,
+        11: test_11_block_disconnect,
+        12: test_12_speculative_block,
+        13: test_13_mempool_limits,
+        14: test_14_replace_by_fee,
+        15: test_15_compact_backend,
+        16: test_16_amount_exponents,
+        17: test_17_wire_versions
     }
 
     while True:
         print(f"\n=== TEST SUITE MENU [ISOLATED STATE] ===")
-        print("1-10. Run Specific Test Case")
+        print("1-17. Run Specific Test Case")
+        print("I<n>. Run Test Case n in isolation (test state left untouched)")
         print("A.    Run ALL Test Cases (Sequential)")
         print("B.    Print Current Test Balances")
         print("R.    Reset Test State (Restore Genesis)")
@@ -320,11 +592,21 @@ def run_tests():
             print("\n[Running ALL Tests sequentially...]")
             # Important: We must reset before 'Run All' to ensure sequence validity
             utxo_manager, mempool = reset_test_environment()
-            for i in range(1, 11):
+            for i in range(1, 18):
                 test_cases[i](mempool, utxo_manager)
             print_final_balances(utxo_manager)
             input("\nPress Enter to continue...")
 
+        elif choice.startswith('I') and choice[1:].isdigit():
+            num = int(choice[1:])
+            if num in test_cases:
+                # Runs against a throwaway overlay and pool; nothing reaches the shared state
+                print(f"\n[Running Test Case {num} in isolation...]")
+                test_cases[num](Mempool(), UTXOView(utxo_manager))
+                input("Press Enter to continue...")
+            else:
+                print("Invalid test number.")
+
         elif choice.isdigit():
             num = int(choice)
             if num in test_cases: